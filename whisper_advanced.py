@@ -7,28 +7,48 @@ Advanced features including real-time transcription, language detection, and mor
 import whisper
 import numpy as np
 import soundfile as sf
-import librosa
 import torch
 import threading
 import queue
 import time
 import os
 import sys
+import copy
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
 from typing import Optional, Callable, Dict, Any
+from whisper_cache import AudioCache, EncoderCache, file_digest, get_audio_cache, get_encoder_cache
+from whisper_audio import channel_activity, load_audio_channels, probe_audio, read_window
+from whisper_langid import LanguageIdentifier
+from whisper_batch import BatchManifest, atomic_write, input_root, options_hash, transcript_path
+from whisper_stream import transcribe_windowed
+from whisper_watch import FolderWatcher
+from whisper_decoding import BEST_OF, DRAFT_TOKENS, batched_fallback, fallback_temperatures, speculative
+from whisper_router import DEFAULT_DEADLINE, ModelRouter
+from whisper_cancel import CancellationToken
+from whisper_fingerprint import FingerprintIndex, fingerprint, slice_result
+from whisper_index import TranscriptIndex
+from whisper_sink import TranscriptSink
 
 class AdvancedWhisperTranscriber:
-    def __init__(self, model_name="base", device=None):
+    def __init__(self, model_name="base", device=None, audio_cache: Optional[AudioCache] = None,
+                 encoder_cache: Optional[EncoderCache] = None):
         """
         Initialize advanced Whisper transcriber.
         
         Args:
             model_name (str): Whisper model size
             device (str): Device to use ('cpu', 'cuda', 'mps')
+            audio_cache (AudioCache): Decoded audio cache (default: shared cache)
+            encoder_cache (EncoderCache): Encoder output cache (default: shared cache)
         """
         self.model_name = model_name
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
         self.model = None
+        self.models = {}  # model name -> loaded model, for cascades
+        self.audio_cache = audio_cache or get_audio_cache()
+        self.encoder_cache = encoder_cache or get_encoder_cache()
         self.audio_queue = queue.Queue()
         self.is_recording = False
         self.transcription_callback = None
@@ -39,11 +59,50 @@ class AdvancedWhisperTranscriber:
         print(f"Loading {self.model_name} model on {self.device}...")
         try:
             self.model = whisper.load_model(self.model_name).to(self.device)
+            self.models[self.model_name] = self.model
             print(f"✅ {self.model_name} model loaded successfully on {self.device}!")
         except Exception as e:
             print(f"❌ Error loading model: {e}")
             sys.exit(1)
     
+    def get_model(self, model_name: str):
+        """
+        Return a loaded model, loading it on first use.
+        
+        Args:
+            model_name (str): Whisper model size
+            
+        Returns:
+            Loaded Whisper model
+        """
+        if model_name not in self.models:
+            print(f"Loading {model_name} model on {self.device}...")
+            self.models[model_name] = whisper.load_model(model_name).to(self.device)
+            print(f"✅ {model_name} model loaded successfully on {self.device}!")
+        return self.models[model_name]
+    
+    def use_model(self, model_name: str):
+        """
+        Switch the transcription methods to another model, loading it on first use.
+        
+        Args:
+            model_name (str): Whisper model size
+        """
+        self.model = self.get_model(model_name)
+        self.model_name = model_name
+    
+    def load_audio(self, audio_path: str) -> np.ndarray:
+        """
+        Load an audio file as 16 kHz mono PCM through the decoded audio cache.
+        
+        Args:
+            audio_path (str): Path to audio file
+            
+        Returns:
+            np.ndarray: Audio waveform
+        """
+        return self.audio_cache.load(audio_path)
+    
     def detect_language(self, audio_path: str) -> str:
         """
         Detect the language of an audio file.
@@ -56,8 +115,8 @@ class AdvancedWhisperTranscriber:
         """
         print(f"Detecting language for: {audio_path}")
         
-        # Load audio
-        audio = whisper.load_audio(audio_path)
+        # Load the first 30 seconds only
+        audio = read_window(audio_path, 0.0, whisper.audio.CHUNK_LENGTH)
         audio = whisper.pad_or_trim(audio)
         
         # Log mel spectrogram
@@ -70,12 +129,49 @@ class AdvancedWhisperTranscriber:
         print(f"Detected language: {detected_lang} (confidence: {probs[detected_lang]:.2f})")
         return detected_lang
     
-    def transcribe_with_options(self, audio_path: str, **options) -> Dict[str, Any]:
+    def detect_languages(self, audio_files: list, batch_size: int = 16, windows: int = 3,
+                         threshold: float = 0.9) -> Dict[str, Dict[str, Any]]:
+        """
+        Identify the language of many audio files.
+        
+        A few windows per file are decoded in-process, windows from many files
+        share batched encoder passes, and each file stops being sampled once
+        its vote is confident enough. Results are cached per file.
+        
+        Args:
+            audio_files (list): List of audio file paths
+            batch_size (int): Number of windows per encoder pass
+            windows (int): Maximum number of windows sampled per file
+            threshold (float): Confidence at which voting stops early
+            
+        Returns:
+            dict: Language, confidence and windows used for each file (or error)
+        """
+        identifier = LanguageIdentifier(
+            self.model, self.model_name, device=self.device,
+            windows=windows, threshold=threshold, batch_size=batch_size
+        )
+        return identifier.identify(audio_files)
+    
+    def transcribe_with_options(self, audio_path: str, batch_fallback: bool = False,
+                                cancel: Optional[CancellationToken] = None, **options) -> Dict[str, Any]:
         """
         Transcribe audio with advanced options.
         
+        With `batch_fallback`, the temperature becomes a fallback schedule
+        (steps of 0.2 up to 1.0) and, for windows failing the compression ratio
+        or log probability thresholds, all remaining temperatures are sampled
+        (best_of candidates each) in one batched decoder pass instead of one
+        pass per temperature.
+        
+        With a `cancel` token, the audio is transcribed window by window and
+        the segments decoded before the token fired are returned, with
+        "cancelled" set to its reason.
+        
         Args:
             audio_path (str): Path to audio file
+            batch_fallback (bool): Decode fallback candidates in one batched pass
+            cancel (CancellationToken): Token checked between 30-second windows
             **options: Transcription options
             
         Returns:
@@ -86,7 +182,328 @@ class AdvancedWhisperTranscriber:
         
         print(f"Transcribing with options: {options}")
         
-        # Default options
+        default_options = self._default_options(**options)
+        if batch_fallback:
+            default_options["temperature"] = fallback_temperatures(default_options["temperature"])
+            default_options.setdefault("best_of", BEST_OF)
+        
+        # Transcribe, reusing cached encoder outputs when only decoder options changed
+        audio = self.load_audio(audio_path)
+        with self.encoder_cache.attach(self.model, self.model_name, file_digest(audio_path)) as model:
+            if batch_fallback:
+                model = batched_fallback(model, default_options["temperature"], default_options["best_of"])
+            if cancel is not None:
+                result = transcribe_windowed(model, audio, cancel=cancel, **default_options)
+            else:
+                result = model.transcribe(audio, **default_options)
+        
+        return result
+    
+    def transcribe_cascade(self, audio_path: str, escalate_model: str = "large",
+                           logprob_threshold: float = -0.7, compression_ratio_threshold: float = 2.4,
+                           no_speech_threshold: float = 0.6, padding: float = 0.3,
+                           **options) -> Dict[str, Any]:
+        """
+        Transcribe with the loaded model, then re-transcribe only the
+        low-confidence segments with a larger model.
+        
+        A segment is escalated when its average log probability is below
+        `logprob_threshold` or its compression ratio is above
+        `compression_ratio_threshold` (repetitions), unless it is silence
+        (no speech probability above `no_speech_threshold`). Consecutive
+        escalated segments are merged into one span, which is cut from the
+        audio, transcribed by the larger model and put back in place of the
+        segments it replaces.
+        
+        Args:
+            audio_path (str): Path to audio file
+            escalate_model (str): Model used for escalated spans
+            logprob_threshold (float): Minimum average log probability of an accepted segment
+            compression_ratio_threshold (float): Maximum compression ratio of an accepted segment
+            no_speech_threshold (float): No speech probability above which a segment is silence
+            padding (float): Seconds of context added around each span (never into accepted segments)
+            **options: Transcription options
+            
+        Returns:
+            dict: Transcription result, with escalation statistics in "cascade"
+        """
+        result = self.transcribe_with_options(audio_path, **options)
+        segments = result["segments"]
+        audio = self.load_audio(audio_path)
+        duration = len(audio) / whisper.audio.SAMPLE_RATE
+        
+        def escalate(segment):
+            if segment["no_speech_prob"] > no_speech_threshold:
+                return False
+            return (segment["avg_logprob"] < logprob_threshold
+                    or segment["compression_ratio"] > compression_ratio_threshold)
+        
+        # Group consecutive escalated segments into spans of segment indices
+        spans = []
+        for i, segment in enumerate(segments):
+            if escalate(segment):
+                if spans and spans[-1][1] == i:
+                    spans[-1][1] = i + 1
+                else:
+                    spans.append([i, i + 1])
+        
+        stats = {
+            "fast_model": self.model_name,
+            "escalate_model": escalate_model,
+            "segments": len(segments),
+            "escalated_segments": sum(end - begin for begin, end in spans),
+            "escalated_seconds": 0.0,
+            "escalated_fraction": 0.0
+        }
+        if not spans:
+            result["cascade"] = stats
+            return result
+        
+        print(f"Escalating {stats['escalated_segments']}/{len(segments)} segments to {escalate_model}...")
+        model = self.get_model(escalate_model)
+        escalate_options = self._default_options(**{**options, "language": result["language"]})
+        escalate_options.pop("initial_prompt", None)
+        digest = file_digest(audio_path)
+        
+        merged = []
+        previous = 0
+        for begin, end in spans:
+            merged.extend(segments[previous:begin])
+            previous = end
+            
+            # Pad into the gaps around the span, but not into accepted segments
+            lower = segments[begin - 1]["end"] if begin > 0 else 0.0
+            upper = segments[end]["start"] if end < len(segments) else duration
+            start = max(lower, segments[begin]["start"] - padding)
+            stop = min(upper, segments[end - 1]["end"] + padding)
+            
+            # Condition on the accepted text before the span
+            prompt = "".join(segment["text"] for segment in merged)[-200:].strip() or None
+            piece = audio[int(start * whisper.audio.SAMPLE_RATE):int(stop * whisper.audio.SAMPLE_RATE)]
+            with self.encoder_cache.attach(model, escalate_model, f"{digest}_{start:.3f}") as cached:
+                rerun = cached.transcribe(piece, initial_prompt=prompt, **escalate_options)
+            
+            for segment in rerun["segments"]:
+                if segment["start"] >= stop - start:
+                    continue  # decoded from the padding past the span
+                segment["start"] = round(segment["start"] + start, 3)
+                segment["end"] = round(min(segment["end"] + start, stop), 3)
+                if "words" in segment:
+                    segment["words"] = [
+                        {**word, "start": round(word["start"] + start, 3), "end": round(word["end"] + start, 3)}
+                        for word in segment["words"]
+                    ]
+                segment["escalated"] = True
+                merged.append(segment)
+            stats["escalated_seconds"] += stop - start
+        merged.extend(segments[previous:])
+        
+        for i, segment in enumerate(merged):
+            segment["id"] = i
+        stats["escalated_seconds"] = round(stats["escalated_seconds"], 3)
+        stats["escalated_fraction"] = round(stats["escalated_seconds"] / duration, 4) if duration else 0.0
+        
+        result["segments"] = merged
+        result["text"] = "".join(segment["text"] for segment in merged)
+        result["cascade"] = stats
+        print(f"✅ Escalated {stats['escalated_fraction']:.1%} of the audio to {escalate_model}")
+        return result
+    
+    def transcribe_speculative(self, audio_path: str, draft_model: str = "tiny",
+                               num_draft_tokens: int = DRAFT_TOKENS, compare: bool = False,
+                               **options) -> Dict[str, Any]:
+        """
+        Transcribe with speculative decoding: a small draft model proposes
+        tokens and the loaded model verifies several of them per forward pass.
+        
+        Greedy passes give the same tokens as the loaded model decoding alone;
+        beam search and temperature fallback use the regular decoder.
+        
+        Args:
+            audio_path (str): Path to audio file
+            draft_model (str): Draft model size (same vocabulary and mel bins as the loaded model)
+            num_draft_tokens (int): Tokens proposed per verification pass
+            compare (bool): Also transcribe without a draft model and report the measured speedup
+            **options: Transcription options
+            
+        Returns:
+            dict: Transcription result, with decoding statistics in "speculative"
+        """
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        
+        draft = self.get_model(draft_model)
+        audio = self.load_audio(audio_path)
+        default_options = self._default_options(**options)
+        digest = file_digest(audio_path)
+        
+        print(f"Transcribing with {draft_model} as draft model...")
+        start = time.perf_counter()
+        with self.encoder_cache.attach(self.model, self.model_name, digest) as model, \
+                self.encoder_cache.attach(draft, draft_model, digest) as draft:
+            model = speculative(model, draft, num_draft_tokens)
+            result = model.transcribe(audio, **default_options)
+        elapsed = time.perf_counter() - start
+        stats = model.stats
+        
+        stats["acceptance_rate"] = round(stats["accepted"] / stats["proposed"], 4) if stats["proposed"] else 0.0
+        stats["tokens_per_target_pass"] = round(stats["tokens"] / stats["target_passes"], 2) if stats["target_passes"] else 0.0
+        stats["seconds"] = round(elapsed, 3)
+        stats["decode_seconds"] = round(stats["decode_seconds"], 3)
+        print(f"✅ Acceptance rate: {stats['acceptance_rate']:.1%}, "
+              f"{stats['tokens_per_target_pass']:.2f} tokens per target pass")
+        
+        if compare:
+            start = time.perf_counter()
+            with self.encoder_cache.attach(self.model, self.model_name, digest) as model:
+                baseline = model.transcribe(audio, **default_options)
+            stats["baseline_seconds"] = round(time.perf_counter() - start, 3)
+            stats["speedup"] = round(stats["baseline_seconds"] / elapsed, 2)
+            stats["identical"] = baseline["text"] == result["text"]
+            print(f"⏱️ Speedup: {stats['speedup']:.2f}x (identical output: {stats['identical']})")
+        
+        result["speculative"] = stats
+        return result
+    
+    def transcribe_stream(self, audio_path: str, **options) -> Dict[str, Any]:
+        """
+        Transcribe a long recording window by window with bounded memory.
+        
+        Audio is read in 30-second pieces straight from the file and never
+        decoded as a whole, so multi-hour recordings use the same peak memory
+        as a short clip.
+        
+        Args:
+            audio_path (str): Path to audio file
+            **options: Transcription options
+        
+        Returns:
+            dict: Transcription result
+        """
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        
+        print(f"Streaming transcription with options: {options}")
+        
+        return transcribe_windowed(self.model, audio_path, **self._default_options(**options))
+    
+    def get_replicas(self, count: int) -> list:
+        """
+        Return up to `count` independent instances of the current model.
+        
+        A Whisper model cannot decode two inputs at once from two threads, so
+        parallel work needs one copy per worker. Each copy costs the full size
+        of the model (about 150 MB for base, 3 GB for large in fp32) on its
+        device, so copies are only made while memory remains (keeping a fifth
+        of it free for activations), and they are not kept: they are freed
+        once the caller drops the list.
+        
+        Args:
+            count (int): Number of instances wanted
+            
+        Returns:
+            list: The current model followed by at most count - 1 copies
+        """
+        model_bytes = sum(
+            tensor.numel() * tensor.element_size()
+            for tensor in list(self.model.parameters()) + list(self.model.buffers())
+        )
+        if self.model.device.type == "cuda":
+            available = torch.cuda.mem_get_info(self.model.device)[0]
+        elif hasattr(os, "sysconf") and "SC_AVPHYS_PAGES" in os.sysconf_names:
+            available = os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+        else:
+            available = None
+        if available is not None:
+            affordable = int(available * 0.8 // max(model_bytes, 1))
+            if affordable < count - 1:
+                print(f"⚠️ Memory for {affordable} model copies only, using {affordable + 1} worker(s)")
+                count = affordable + 1
+        return [self.model] + [copy.deepcopy(self.model) for _ in range(count - 1)]
+    
+    def transcribe_multichannel(self, audio_path: str, labels: Optional[list] = None,
+                                min_activity: float = 0.01, workers: Optional[int] = None,
+                                **options) -> Dict[str, Any]:
+        """
+        Transcribe each channel of a recording separately (e.g. agent left, customer right).
+        
+        All channels are decoded in one pass. Channels that are silent (less
+        than `min_activity` of their 30 ms frames above -45 dBFS) or copies of
+        an earlier channel are skipped, and the remaining ones are transcribed
+        in parallel, each by its own model instance, so the file takes about
+        as long as its longest channel. Each extra instance is a copy of the
+        model made for this call (as many as memory allows) and freed when it
+        returns. Each channel detects its own language.
+        Segments are merged into one timeline, labeled by channel.
+        
+        Args:
+            audio_path (str): Path to audio file
+            labels (list): Speaker label per channel (default: ch0, ch1, ...)
+            min_activity (float): Fraction of active frames under which a channel is skipped
+            workers (int): Channels transcribed at once (default: all active channels)
+            **options: Transcription options
+            
+        Returns:
+            dict: Transcription result whose segments carry "channel" and "speaker",
+                with a "channels" summary (label, activity, language, skipped reason)
+        """
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        
+        channels = load_audio_channels(audio_path)
+        labels = list(labels or []) + [f"ch{i}" for i in range(len(labels or []), len(channels))]
+        activity = channel_activity(channels)
+        digest = file_digest(audio_path)
+        
+        summary, active = [], []
+        for i, channel in enumerate(channels):
+            entry = {"channel": i, "speaker": labels[i], "activity": round(float(activity[i]), 4)}
+            duplicate = next((j for j in active if np.allclose(channels[j], channel, atol=1e-3)), None)
+            if activity[i] < min_activity:
+                entry["skipped"] = "silent"
+            elif duplicate is not None:
+                entry["skipped"] = f"same as channel {duplicate}"
+            else:
+                active.append(i)
+            summary.append(entry)
+        print(f"Transcribing {len(active)} of {len(channels)} channel(s): {', '.join(labels[i] for i in active)}")
+        
+        # Quiet per-window output: channels would interleave on the console
+        default_options = self._default_options(**{"verbose": None, **options})
+        models = queue.Queue()
+        for model in self.get_replicas(min(workers or len(active), len(active)) or 1):
+            models.put(model)
+        
+        def transcribe(i):
+            model = models.get()
+            try:
+                with self.encoder_cache.attach(model, self.model_name, f"{digest}_ch{i}") as cached:
+                    return cached.transcribe(channels[i], **default_options)
+            finally:
+                models.put(model)
+        
+        # Inference releases the GIL, so threads run the channels in parallel
+        with ThreadPoolExecutor(max_workers=models.qsize()) as executor:
+            results = dict(zip(active, executor.map(transcribe, active)))
+        
+        segments = []
+        for i, result in results.items():
+            summary[i]["language"] = result["language"]
+            for segment in result["segments"]:
+                segments.append({**segment, "channel": i, "speaker": labels[i]})
+        segments.sort(key=lambda segment: (segment["start"], segment["channel"]))
+        for segment_id, segment in enumerate(segments):
+            segment["id"] = segment_id
+        
+        return {
+            "text": "\n".join(f"[{segment['speaker']}] {segment['text'].strip()}" for segment in segments),
+            "segments": segments,
+            "language": results[active[0]]["language"] if active else None,
+            "channels": summary
+        }
+    
+    def _default_options(self, **options) -> Dict[str, Any]:
+        """Return the default transcription options updated with the given ones."""
         default_options = {
             "language": None,  # Auto-detect
             "task": "transcribe",  # or "translate"
@@ -106,43 +523,168 @@ class AdvancedWhisperTranscriber:
         # Update with provided options
         default_options.update(options)
         
-        # Transcribe
-        result = self.model.transcribe(audio_path, **default_options)
-        
-        return result
+        return default_options
     
-    def batch_transcribe(self, audio_files: list, output_dir: str = "transcriptions") -> Dict[str, Any]:
+    def batch_transcribe(self, audio_files: list, output_dir: str = "transcriptions",
+                         batch_size: int = 16, manifest_path: Optional[str] = None,
+                         timeout: Optional[float] = None, dedupe: bool = False,
+                         fingerprint_dir: Optional[str] = None, index_path: Optional[str] = None,
+                         sink: Optional[TranscriptSink] = None, **options) -> Dict[str, Any]:
         """
         Transcribe multiple audio files in batch.
         
+        Completed files are recorded in an append-only manifest, so a run that
+        is killed partway through skips finished files when restarted with the
+        same options. Transcripts are written atomically, mirroring the input
+        directories below their common parent.
+        
+        With `dedupe`, every pending file is fingerprinted from a cheap
+        5.5 kHz decode first. Re-encoded or trimmed copies of a recording
+        (in the batch or transcribed by an earlier run with the same options)
+        reuse its transcript, cut to the copy and shifted by the detected offset.
+        
+        With a `sink`, transcripts (text, segments, language) are appended to
+        its shards instead of one text file per input.
+        
         Args:
             audio_files (list): List of audio file paths
             output_dir (str): Output directory for transcriptions
+            batch_size (int): Number of files per batched language detection pass
+            manifest_path (str): Checkpoint manifest (default: <output_dir>/batch_manifest.jsonl)
+            timeout (float): Seconds allowed per file; files running over it fail
+                with their partial transcript and are retried on the next run
+            dedupe (bool): Reuse transcripts across near-duplicate recordings
+            fingerprint_dir (str): Fingerprint index (default: $WHISPER_CACHE_DIR/fingerprints)
+            index_path (str): Transcript search index updated as each file completes
+            sink (TranscriptSink): Sharded output sink (default: one text file per input)
+            **options: Transcription options
             
         Returns:
             dict: Results for all files
         """
         os.makedirs(output_dir, exist_ok=True)
+        root = input_root(audio_files)  # transcripts mirror the input directories below it
         results = {}
         
+        manifest = BatchManifest(manifest_path or os.path.join(output_dir, "batch_manifest.jsonl"))
+        transcript_index = TranscriptIndex(index_path) if index_path else None
+        opts_hash = options_hash(self.model_name, self._default_options(**options))
+        
+        pending = []
+        for audio_file in audio_files:
+            entry = manifest.get(audio_file, opts_hash)
+            if entry is None:
+                pending.append(audio_file)
+                continue
+            # A sink record is only read back through a sink, a text file only
+            # when this run writes text files; otherwise the file is done again.
+            # Entries from before the kind was recorded are told apart by name.
+            output = entry.get("output") or (
+                "sink" if os.path.basename(entry["output_path"]).startswith("shard-") else "file"
+            )
+            text = None
+            try:
+                if output == "sink" and sink is not None:
+                    record = sink.get(audio_file)
+                    text = record["text"] if record is not None else None
+                elif output == "file" and sink is None:
+                    with open(entry["output_path"], 'r', encoding='utf-8') as f:
+                        text = f.read()
+            except Exception as e:
+                # An unreadable output only costs this file a new transcription
+                print(f"❌ Cannot read the previous output of {audio_file}, transcribing it again: {e}")
+            if text is None:
+                pending.append(audio_file)
+                continue
+            results[audio_file] = {
+                "success": True,
+                "text": text,
+                "language": entry.get("language"),
+                "output_path": entry["output_path"],
+                "resumed": True
+            }
+        
         print(f"Starting batch transcription of {len(audio_files)} files...")
+        if results:
+            print(f"⏭️ Skipping {len(results)} files already completed with the same options")
+        
+        # Group near-duplicates: only the longest recording of each group is transcribed
+        index, fingerprints, duplicates = None, {}, {}
+        if dedupe:
+            index = FingerprintIndex(fingerprint_dir)
+            for audio_file in pending:
+                try:
+                    fingerprints[audio_file] = fingerprint(audio_file)
+                except Exception as e:
+                    print(f"❌ Error fingerprinting {audio_file}: {e}")
+            duplicates = index.group(fingerprints, opts_hash)
+            pending = [audio_file for audio_file in pending if audio_file not in duplicates]
+            if duplicates:
+                print(f"🔁 {len(duplicates)} near-duplicate files will reuse the transcript of their original")
+        
+        # Identify all languages up front in batched passes, so that each
+        # transcription skips its own batch-1 language detection pass
+        languages = {}
+        if options.get("language") is None and self.model.is_multilingual:
+            languages = {
+                path: lid["language"]
+                for path, lid in self.detect_languages(pending, batch_size).items()
+                if "language" in lid
+            }
         
-        for i, audio_file in enumerate(audio_files, 1):
-            print(f"\n[{i}/{len(audio_files)}] Processing: {audio_file}")
+        # Duplicates come last, once their representatives are transcribed
+        to_process = pending + list(duplicates)
+        for i, audio_file in enumerate(to_process, 1):
+            print(f"\n[{i}/{len(to_process)}] Processing: {audio_file}")
             
             try:
-                result = self.transcribe_with_options(audio_file)
+                match = duplicates.get(audio_file)
+                source = index.result(match["audio_file"], opts_hash) if match else None
+                if source is not None:
+                    result = slice_result(source, match["offset"], probe_audio(audio_file)["duration"])
+                    print(f"🔁 Same recording as {match['audio_file']} from {match['offset']:.2f}s")
+                else:
+                    result = self.transcribe_with_options(
+                        audio_file,
+                        cancel=CancellationToken(timeout) if timeout is not None else None,
+                        **{**options, "language": options.get("language") or languages.get(audio_file)}
+                    )
+                if result.get("cancelled"):
+                    print(f"⏹️ Stopped after {timeout:.0f}s: {audio_file}")
+                    results[audio_file] = {
+                        "success": False,
+                        "error": result["cancelled"],
+                        "partial_text": result["text"]
+                    }
+                    continue
                 
-                # Save result
-                output_path = os.path.join(output_dir, f"{Path(audio_file).stem}_transcription.txt")
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    f.write(result["text"])
+                # Save result atomically, then checkpoint it
+                extra = {"duplicate_of": match["audio_file"], "offset": match["offset"]} if source is not None else {}
+                if sink is not None:
+                    output_path = sink.write(audio_file, result, model=self.model_name, options_hash=opts_hash, **extra)
+                else:
+                    output_path = transcript_path(output_dir, audio_file, root=root)
+                    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                    atomic_write(output_path, result["text"])
+                manifest.record(
+                    audio_file, opts_hash, output_path, output="sink" if sink is not None else "file",
+                    language=result["language"], **extra
+                )
+                if transcript_index is not None:
+                    transcript_index.add(audio_file, result)
+                if source is None and audio_file in fingerprints:
+                    index.add(audio_file, fingerprints[audio_file], opts_hash, {
+                        "text": result["text"],
+                        "segments": result["segments"],
+                        "language": result["language"]
+                    })
                 
                 results[audio_file] = {
                     "success": True,
                     "text": result["text"],
                     "language": result["language"],
-                    "output_path": output_path
+                    "output_path": output_path,
+                    **extra
                 }
                 
                 print(f"✅ Completed: {output_path}")
@@ -154,7 +696,29 @@ class AdvancedWhisperTranscriber:
                     "error": str(e)
                 }
         
-        return results
+        # Keep the input order, resumed files included
+        return {audio_file: results[audio_file] for audio_file in audio_files}
+    
+    def watch_folder(self, watch_dir: str, output_dir: str = "transcriptions",
+                     poll_interval: float = 1.0, stable_seconds: float = 2.0,
+                     num_workers: int = 2, sink: Optional[TranscriptSink] = None, **options):
+        """
+        Transcribe new audio files dropped into a directory until interrupted.
+        
+        Args:
+            watch_dir (str): Drop directory to watch (recursively)
+            output_dir (str): Output directory for transcriptions
+            poll_interval (float): Seconds between polls
+            stable_seconds (float): Seconds a file must stop growing before it is processed
+            num_workers (int): Decoding workers feeding the model
+            sink (TranscriptSink): Sharded output sink (default: one text file per input)
+            **options: Transcription options
+        """
+        watcher = FolderWatcher(
+            self, watch_dir, output_dir, poll_interval=poll_interval,
+            stable_seconds=stable_seconds, num_workers=num_workers, sink=sink, **options
+        )
+        watcher.run()
     
     def start_realtime_transcription(self, callback: Callable[[str], None]):
         """
@@ -233,19 +797,16 @@ class AdvancedWhisperTranscriber:
             dict: Audio information
         """
         try:
-            # Load audio with librosa
-            y, sr = librosa.load(audio_path, sr=None)
-            
-            # Get duration
-            duration = librosa.get_duration(y=y, sr=sr)
+            # Read the file header only, the audio itself is never decoded
+            probe = probe_audio(audio_path)
             
             # Get basic stats
             info = {
                 "file_path": audio_path,
-                "sample_rate": sr,
-                "duration": duration,
-                "channels": 1 if len(y.shape) == 1 else y.shape[1],
-                "samples": len(y),
+                "sample_rate": probe["sample_rate"],
+                "duration": probe["duration"],
+                "channels": probe["channels"],
+                "samples": probe["frames"],
                 "file_size": os.path.getsize(audio_path)
             }
             
@@ -255,15 +816,91 @@ class AdvancedWhisperTranscriber:
             print(f"Error getting audio info: {e}")
             return {"error": str(e)}
 
+def process_file(transcriber: AdvancedWhisperTranscriber, audio_file: str, args,
+                 router: Optional[ModelRouter] = None, duration: float = 0.0):
+    """Show info, detect the language and transcribe or translate one file (timed by the router, if any)."""
+    # Show audio info if requested
+    if args.info:
+        info = transcriber.get_audio_info(audio_file)
+        print("\n📊 Audio Information:")
+        for key, value in info.items():
+            print(f"  {key}: {value}")
+        print()
+    
+    # Detect language, unless given (streaming mode detects it on its first window,
+    # multichannel mode on each channel)
+    detected_lang = None
+    if not args.language and not args.stream and not args.multichannel and args.task != "translate":
+        detected_lang = transcriber.detect_language(audio_file)
+    
+    # Transcribe or translate (window by window when a timeout is set, so it can stop early)
+    cancel = CancellationToken(args.timeout) if args.timeout is not None else None
+    tracking = router.track(transcriber.model_name, duration, cancel=cancel) if router is not None else nullcontext()
+    try:
+        with tracking:
+            if args.task == "translate":
+                result = transcriber.translate_audio(audio_file, args.language or "en")
+                print(f"\n🌐 Translation completed!")
+            elif args.stream:
+                result = transcriber.transcribe_stream(audio_file, language=args.language, cancel=cancel)
+                print(f"\n📝 Transcription completed!")
+            elif args.multichannel:
+                result = transcriber.transcribe_multichannel(
+                    audio_file, labels=args.channel_labels.split(",") if args.channel_labels else None,
+                    language=args.language
+                )
+                print(f"\n📝 Transcription completed!")
+                for channel in result["channels"]:
+                    status = f"skipped ({channel['skipped']})" if channel.get("skipped") else channel["language"]
+                    print(f"  {channel['speaker']}: {channel['activity']:.0%} active, {status}")
+            elif args.draft:
+                result = transcriber.transcribe_speculative(
+                    audio_file, args.draft, num_draft_tokens=args.draft_tokens,
+                    compare=args.compare, language=args.language or detected_lang
+                )
+                print(f"\n📝 Transcription completed!")
+            elif args.cascade:
+                result = transcriber.transcribe_cascade(
+                    audio_file, args.cascade,
+                    language=args.language or detected_lang
+                )
+                print(f"\n📝 Transcription completed!")
+            else:
+                result = transcriber.transcribe_with_options(
+                    audio_file,
+                    batch_fallback=args.batch_fallback,
+                    cancel=cancel,
+                    language=args.language or detected_lang
+                )
+                print(f"\n📝 Transcription completed!")
+        
+        if result.get("cancelled"):
+            print(f"⏹️ Stopped after {args.timeout:.0f}s, partial result kept")
+        
+        print(f"Text: {result['text'][:200]}...")
+        print(f"Language: {result['language']}")
+        print(f"Duration: {result['segments'][-1]['end']:.2f} seconds")
+        
+        # Save result
+        output_path = f"{Path(audio_file).stem}_{args.task}.txt"
+        atomic_write(output_path, result["text"])
+        print(f"✅ Result saved to: {output_path}")
+        
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
 def main():
     """Main function to demonstrate advanced Whisper features."""
     import argparse
     
     parser = argparse.ArgumentParser(description="Advanced Whisper transcription")
-    parser.add_argument("audio_file", help="Path to the audio file")
+    parser.add_argument("audio_files", nargs="*", metavar="audio_file",
+                       help="Path to the audio file(s)")
     parser.add_argument("--model", default="base", 
-                       choices=["tiny", "base", "small", "medium", "large"],
-                       help="Whisper model size")
+                       choices=["auto", "tiny", "base", "small", "medium", "large"],
+                       help="Whisper model size (auto: largest model meeting --deadline for each file)")
+    parser.add_argument("--deadline", type=float, default=DEFAULT_DEADLINE,
+                       help="Latency target in seconds per file for --model auto")
     parser.add_argument("--device", default=None,
                        choices=["cpu", "cuda", "mps"],
                        help="Device to use")
@@ -274,50 +911,108 @@ def main():
                        help="Language code (auto-detect if not specified)")
     parser.add_argument("--info", action="store_true",
                        help="Show audio file information")
+    parser.add_argument("--stream", action="store_true",
+                       help="Transcribe window by window with bounded memory (for multi-hour recordings)")
+    parser.add_argument("--multichannel", action="store_true",
+                       help="Transcribe each channel separately in parallel (e.g. stereo call recordings)")
+    parser.add_argument("--channel-labels", metavar="LABELS", default=None,
+                       help="With --multichannel, comma-separated speaker label per channel (e.g. agent,customer)")
+    parser.add_argument("--cascade", metavar="MODEL", default=None,
+                       choices=["tiny", "base", "small", "medium", "large"],
+                       help="Re-transcribe low-confidence segments with this larger model")
+    parser.add_argument("--draft", metavar="MODEL", default=None,
+                       choices=["tiny", "base", "small", "medium"],
+                       help="Speculative decoding with this smaller draft model")
+    parser.add_argument("--draft-tokens", type=int, default=DRAFT_TOKENS,
+                       help="Tokens proposed by the draft model per verification pass")
+    parser.add_argument("--compare", action="store_true",
+                       help="With --draft, also decode without the draft model and report the speedup")
+    parser.add_argument("--batch-fallback", action="store_true",
+                       help="Decode all temperature fallback candidates of a difficult window in one batched pass")
+    parser.add_argument("--timeout", type=float, default=None,
+                       help="Seconds allowed per file; keep the partial transcript when it runs over")
+    parser.add_argument("--langid", action="store_true",
+                       help="Only identify the language of each file (batched, cached)")
+    parser.add_argument("--batch-size", type=int, default=16,
+                       help="Windows per encoder pass for language identification")
+    parser.add_argument("--batch", action="store_true",
+                       help="Resumable batch transcription: finished files are skipped on restart")
+    parser.add_argument("--dedupe", action="store_true",
+                       help="With --batch, reuse transcripts across re-encoded or trimmed copies of a recording")
+    parser.add_argument("--index", metavar="DB", default=None,
+                       help="With --batch, add each transcript to this search index (see whisper_index.py)")
+    parser.add_argument("--output-dir", default="transcriptions",
+                       help="Output directory for --batch and --watch")
+    parser.add_argument("--sink", metavar="DIR", default=None,
+                       help="With --batch or --watch, append transcripts to sharded files in DIR instead of one file per input")
+    parser.add_argument("--sink-compress", action="store_true",
+                       help="Gzip the shards of --sink")
+    parser.add_argument("--watch", metavar="DIR", default=None,
+                       help="Watch a drop directory and transcribe new files as they arrive")
+    parser.add_argument("--poll-interval", type=float, default=1.0,
+                       help="Seconds between polls of the watched directory")
     
     args = parser.parse_args()
+    if not args.audio_files and not args.watch:
+        parser.error("at least one audio file is required unless --watch is given")
+    
+    # Pick the first model from the first file when routing automatically
+    router = None
+    model_name = args.model
+    if args.model == "auto":
+        router = ModelRouter(deadline=args.deadline, device=args.device)
+        model_name = router.choose(args.audio_files[0])["model"] if args.audio_files else "base"
     
     # Initialize transcriber
     transcriber = AdvancedWhisperTranscriber(
-        model_name=args.model,
+        model_name=model_name,
         device=args.device
     )
     
-    # Show audio info if requested
-    if args.info:
-        info = transcriber.get_audio_info(args.audio_file)
-        print("\n📊 Audio Information:")
-        for key, value in info.items():
-            print(f"  {key}: {value}")
-        print()
+    sink = TranscriptSink(args.sink, compress=args.sink_compress) if args.sink else None
     
-    # Detect language
-    detected_lang = transcriber.detect_language(args.audio_file)
+    # Watch-folder ingestion
+    if args.watch:
+        transcriber.watch_folder(
+            args.watch, args.output_dir, poll_interval=args.poll_interval,
+            sink=sink, task=args.task, language=args.language
+        )
+        return
     
-    # Transcribe or translate
-    try:
-        if args.task == "translate":
-            result = transcriber.translate_audio(args.audio_file, args.language or "en")
-            print(f"\n🌐 Translation completed!")
-        else:
-            result = transcriber.transcribe_with_options(
-                args.audio_file,
-                language=args.language or detected_lang
-            )
-            print(f"\n📝 Transcription completed!")
-        
-        print(f"Text: {result['text'][:200]}...")
-        print(f"Language: {result['language']}")
-        print(f"Duration: {result['segments'][-1]['end']:.2f} seconds")
-        
-        # Save result
-        output_path = f"{Path(args.audio_file).stem}_{args.task}.txt"
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(result["text"])
-        print(f"✅ Result saved to: {output_path}")
+    # Bulk language identification only
+    if args.langid:
+        results = transcriber.detect_languages(args.audio_files, batch_size=args.batch_size)
+        for audio_file, lid in results.items():
+            if "error" in lid:
+                print(f"{audio_file}\terror\t{lid['error']}")
+            else:
+                print(f"{audio_file}\t{lid['language']}\t{lid['confidence']:.2f}")
+        return
+    
+    # Resumable batch transcription
+    if args.batch:
+        results = transcriber.batch_transcribe(
+            args.audio_files, args.output_dir, batch_size=args.batch_size,
+            timeout=args.timeout, dedupe=args.dedupe, index_path=args.index,
+            sink=sink, task=args.task, language=args.language
+        )
+        failed = [path for path, result in results.items() if not result["success"]]
+        print(f"\n📦 Batch completed: {len(results) - len(failed)} succeeded, {len(failed)} failed")
+        return
+    
+    for audio_file in args.audio_files:
+        if router is None:
+            process_file(transcriber, audio_file, args)
+            continue
         
-    except Exception as e:
-        print(f"❌ Error: {e}")
+        try:
+            routing = router.choose(audio_file, loaded=transcriber.models)
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            continue
+        print(f"🤖 {routing['model']} selected for {audio_file} (estimated {routing['estimate']:.0f}s)")
+        transcriber.use_model(routing["model"])
+        process_file(transcriber, audio_file, args, router=router, duration=routing["duration"])
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
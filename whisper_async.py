@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Whisper Asyncio API
+Awaitable facade over the transcriber classes for event-loop-based services.
+"""
+
+import asyncio
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Optional, Dict, Any, AsyncIterator
+import numpy as np
+import whisper
+from whisper_audio import (
+    SAMPLE_RATE, ffmpeg_command, ffprobe_command, parse_probe, probe_header, read_window
+)
+from whisper_batch import atomic_write, input_root, transcript_path
+from whisper_cache import file_digest, get_audio_cache
+from whisper_cancel import CancellationToken
+from whisper_stream import iter_transcribe
+
+_DONE = object()
+
+
+class AsyncWhisperTranscriber:
+    def __init__(self, transcriber, decode_concurrency: int = 2, prefetch: int = 2):
+        """
+        Initialize the asyncio facade.
+
+        Model work (inference, language detection) runs on a single dedicated
+        thread, since one Whisper model cannot serve two requests at once; use
+        one facade per model instance to scale out. Whole files are decoded
+        through the transcriber's audio cache on a small I/O pool, and windows
+        through libsndfile on that pool or ffmpeg asyncio subprocesses, all
+        limited to `decode_concurrency` at a time, so the event loop is never
+        blocked and decoding does not compete with inference for every core.
+
+        Args:
+            transcriber: WhisperTranscriber or AdvancedWhisperTranscriber with a loaded model
+            decode_concurrency (int): Files decoded at once
+            prefetch (int): Files decoded ahead of the model in batch()
+        """
+        self.transcriber = transcriber
+        self.prefetch = prefetch
+        self.audio_cache = getattr(transcriber, "audio_cache", None) or get_audio_cache()
+        self._model_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper-model")
+        self._io_executor = ThreadPoolExecutor(max_workers=decode_concurrency, thread_name_prefix="whisper-io")
+        self._decode_slots = asyncio.Semaphore(decode_concurrency)
+
+    @property
+    def model(self):
+        return self.transcriber.model
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        """Wait for running work and shut the executors down."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._model_executor.shutdown)
+        await loop.run_in_executor(None, self._io_executor.shutdown)
+
+    async def _run_model(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._model_executor, fn, *args)
+
+    async def _run_io(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._io_executor, fn, *args)
+
+    def _options(self, **options) -> Dict[str, Any]:
+        """Apply the transcriber's default options, without console output unless asked."""
+        options = {"verbose": None, **options}
+        if hasattr(self.transcriber, "_default_options"):
+            return self.transcriber._default_options(**options)
+        return options
+
+    async def _ffmpeg(self, cmd) -> bytes:
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            out, err = await process.communicate()
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+        if process.returncode != 0:
+            raise RuntimeError(f"Failed to load audio: {err.decode()}")
+        return out
+
+    async def load_audio(self, audio_path: str, offset: Optional[float] = None,
+                         duration: Optional[float] = None) -> np.ndarray:
+        """
+        Decode an audio file (or a window of it) to 16 kHz mono float32 without blocking the loop.
+
+        Whole files go through the decoded audio cache, like every other entry
+        point; windows are decoded directly.
+
+        Args:
+            audio_path (str): Path to audio file
+            offset (float): Window start in seconds
+            duration (float): Window duration in seconds
+
+        Returns:
+            np.ndarray: Audio waveform
+        """
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+
+        async with self._decode_slots:
+            if offset is None and duration is None:
+                return await self._run_io(self.audio_cache.load, audio_path)
+            probe = await self._run_io(probe_header, audio_path)
+            if probe is not None:
+                duration = probe["duration"] if duration is None else duration
+                return await self._run_io(read_window, audio_path, offset or 0.0, duration)
+            out = await self._ffmpeg(ffmpeg_command(audio_path, SAMPLE_RATE, offset=offset, duration=duration))
+            return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+    async def info(self, audio_path: str) -> Dict[str, Any]:
+        """
+        Read sample rate, channels, frames and duration from the file header.
+
+        Args:
+            audio_path (str): Path to audio file
+
+        Returns:
+            dict: Audio information
+        """
+        probe = await self._run_io(probe_header, audio_path)
+        if probe is None:
+            probe = parse_probe(await self._ffmpeg(ffprobe_command(audio_path)))
+        return {"file_path": audio_path, **probe, "file_size": os.path.getsize(audio_path)}
+
+    def _detect_language(self, audio: np.ndarray) -> Dict[str, float]:
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), self.model.dims.n_mels).to(self.model.device)
+        _, probs = self.model.detect_language(mel)
+        return probs
+
+    async def detect_language(self, audio_path: str) -> Dict[str, Any]:
+        """
+        Detect the language from the first 30 seconds of a file.
+
+        Args:
+            audio_path (str): Path to audio file
+
+        Returns:
+            dict: Detected language code and its probability
+        """
+        audio = await self.load_audio(audio_path, 0.0, whisper.audio.CHUNK_LENGTH)
+        probs = await self._run_model(self._detect_language, audio)
+        language = max(probs, key=probs.get)
+        return {"language": language, "confidence": probs[language]}
+
+    def _transcribe(self, audio: np.ndarray, audio_path: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        """Run model.transcribe on the model thread, with the encoder cache when the transcriber has one."""
+        encoder_cache = getattr(self.transcriber, "encoder_cache", None)
+        cache = nullcontext(self.model)
+        if encoder_cache is not None:
+            cache = encoder_cache.attach(self.model, self.transcriber.model_name, file_digest(audio_path))
+        with cache as model:
+            return model.transcribe(audio, **options)
+
+    async def transcribe(self, audio_path: str, **options) -> Dict[str, Any]:
+        """
+        Transcribe an audio file.
+
+        Args:
+            audio_path (str): Path to audio file
+            **options: Transcription options
+
+        Returns:
+            dict: Transcription result
+        """
+        audio = await self.load_audio(audio_path)
+        return await self._run_model(self._transcribe, audio, audio_path, self._options(**options))
+
+    async def iter_segments(self, audio_path: str, **options) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Transcribe an audio file window by window, yielding segments as they are decoded.
+
+        Leaving the loop early (break, exception, task cancellation) stops the
+        transcription at the next 30-second window boundary.
+
+        Args:
+            audio_path (str): Path to audio file
+            **options: Transcription options
+
+        Yields:
+            dict: Segment with absolute timestamps (language in the "language" key)
+        """
+        audio = await self.load_audio(audio_path)
+        loop = asyncio.get_running_loop()
+        segments: asyncio.Queue = asyncio.Queue()
+        token = CancellationToken()
+        options = self._options(**options)
+
+        def produce():
+            try:
+                for segment in iter_transcribe(self.model, audio, cancel=token, **options):
+                    loop.call_soon_threadsafe(segments.put_nowait, segment)
+            except Exception as e:
+                loop.call_soon_threadsafe(segments.put_nowait, e)
+            else:
+                loop.call_soon_threadsafe(segments.put_nowait, _DONE)
+
+        loop.run_in_executor(self._model_executor, produce)
+        try:
+            while True:
+                item = await segments.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            token.cancel()
+
+    async def batch(self, audio_files: list, output_dir: str = "transcriptions", **options) -> Dict[str, Any]:
+        """
+        Transcribe multiple audio files, decoding the next files while the model works.
+
+        At most `prefetch` decoded files wait for the model, so memory stays
+        bounded whatever the size of the batch. Transcripts are written
+        atomically off the event loop, mirroring the input directories below
+        their common parent.
+
+        Args:
+            audio_files (list): List of audio file paths
+            output_dir (str): Output directory for transcriptions
+            **options: Transcription options
+
+        Returns:
+            dict: Results for all files, in input order
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        options = self._options(**options)
+        root = input_root(audio_files)
+        results = {}
+        files = iter(audio_files)
+        decoding = deque()
+
+        def schedule():
+            audio_file = next(files, None)
+            if audio_file is not None:
+                decoding.append((audio_file, asyncio.ensure_future(self.load_audio(audio_file))))
+
+        for _ in range(max(1, self.prefetch)):
+            schedule()
+
+        try:
+            while decoding:
+                audio_file, decoded = decoding.popleft()
+                schedule()
+                try:
+                    audio = await decoded
+                    result = await self._run_model(self._transcribe, audio, audio_file, options)
+                    output_path = transcript_path(output_dir, audio_file, root=root)
+                    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                    await self._run_io(atomic_write, output_path, result["text"])
+                    results[audio_file] = {
+                        "success": True,
+                        "text": result["text"],
+                        "language": result["language"],
+                        "output_path": output_path
+                    }
+                except Exception as e:
+                    results[audio_file] = {"success": False, "error": str(e)}
+        finally:
+            for _, decoded in decoding:
+                decoded.cancel()
+
+        return {audio_file: results[audio_file] for audio_file in audio_files}
+
+
+async def _main(args):
+    from whisper_advanced import AdvancedWhisperTranscriber
+    transcriber = AdvancedWhisperTranscriber(model_name=args.model, device=args.device)
+    async with AsyncWhisperTranscriber(transcriber) as async_transcriber:
+        for audio_file in args.audio_files:
+            async for segment in async_transcriber.iter_segments(audio_file, language=args.language):
+                print(f"[{segment['start']:.2f} --> {segment['end']:.2f}] {segment['text'].strip()}")
+
+
+def main():
+    """Transcribe files through the asyncio API, printing segments as they arrive."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Asyncio Whisper transcription")
+    parser.add_argument("audio_files", nargs="+", metavar="audio_file", help="Path to the audio file(s)")
+    parser.add_argument("--model", default="base", choices=["tiny", "base", "small", "medium", "large"],
+                        help="Whisper model size")
+    parser.add_argument("--device", default=None, choices=["cpu", "cuda", "mps"], help="Device to use")
+    parser.add_argument("--language", default=None, help="Language code (auto-detect if not specified)")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
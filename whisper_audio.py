@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Whisper Audio Frontend
+In-process audio decoding and resampling, with ffmpeg only for formats that need it.
+"""
+
+import json
+import math
+import os
+import subprocess
+import numpy as np
+import soundfile as sf
+import torch
+import whisper
+from scipy.signal import resample_poly
+from typing import Optional, Dict, Any, Iterator, List
+
+SAMPLE_RATE = whisper.audio.SAMPLE_RATE
+
+
+def _sf_info(audio_path: str):
+    """Return the libsndfile header of a file, or None if libsndfile cannot read it."""
+    try:
+        return sf.info(audio_path)
+    except (RuntimeError, TypeError):
+        return None
+
+
+def ffmpeg_command(audio_path: str, sr: int = SAMPLE_RATE, offset: Optional[float] = None,
+                   duration: Optional[float] = None, channels: int = 1) -> List[str]:
+    """
+    Build the ffmpeg command decoding a file (or a window of it) to s16le PCM on stdout.
+
+    Args:
+        audio_path (str): Path to audio file
+        sr (int): Target sample rate
+        offset (float): Window start in seconds (input seeking, nothing before it is decoded)
+        duration (float): Window duration in seconds
+        channels (int): Output channels (1 downmixes, more are interleaved)
+
+    Returns:
+        list: Command line
+    """
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0"]
+    if offset is not None:
+        cmd += ["-ss", f"{offset:.3f}"]
+    if duration is not None:
+        cmd += ["-t", f"{duration:.3f}"]
+    # fmt: off
+    return cmd + [
+        "-i", audio_path,
+        "-f", "s16le",
+        "-ac", str(channels),
+        "-acodec", "pcm_s16le",
+        "-ar", str(sr),
+        "-"
+    ]
+    # fmt: on
+
+
+def ffprobe_command(audio_path: str) -> List[str]:
+    """Build the ffprobe command reading the first audio stream's header as JSON."""
+    # fmt: off
+    return [
+        "ffprobe", "-v", "error",
+        "-select_streams", "a:0",
+        "-show_entries", "stream=sample_rate,channels,duration:format=duration",
+        "-of", "json",
+        audio_path
+    ]
+    # fmt: on
+
+
+def parse_probe(out: bytes) -> Dict[str, Any]:
+    """Turn ffprobe's JSON output into sample_rate, channels, frames and duration."""
+    probe = json.loads(out)
+    stream = probe["streams"][0]
+    sample_rate = int(stream["sample_rate"])
+    duration = float(stream.get("duration") or probe["format"]["duration"])
+    return {
+        "sample_rate": sample_rate,
+        "channels": int(stream["channels"]),
+        "frames": int(round(duration * sample_rate)),
+        "duration": duration
+    }
+
+
+def is_native(audio_path: str, sr: int = SAMPLE_RATE) -> bool:
+    """
+    Check whether a file is already mono PCM at the target sample rate.
+
+    Such files are read with zero conversion, so caching them is pointless.
+
+    Args:
+        audio_path (str): Path to audio file
+        sr (int): Target sample rate
+
+    Returns:
+        bool: True if no downmix or resampling is needed
+    """
+    info = _sf_info(audio_path)
+    return info is not None and info.samplerate == sr and info.channels == 1
+
+
+def resample(audio: np.ndarray, orig_sr: int, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Resample audio with a vectorized polyphase filter.
+
+    Args:
+        audio (np.ndarray): Waveform, samples along the first axis
+        orig_sr (int): Sample rate of the input
+        sr (int): Target sample rate
+
+    Returns:
+        np.ndarray: Resampled float32 waveform
+    """
+    if orig_sr == sr:
+        return audio.astype(np.float32, copy=False)
+    g = math.gcd(orig_sr, sr)
+    return resample_poly(audio, sr // g, orig_sr // g, axis=0).astype(np.float32)
+
+
+def load_audio(audio_path: str, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Open an audio file and read it as a mono float32 waveform at the target sample rate.
+
+    Formats libsndfile can read (WAV, FLAC, OGG, and MP3 with libsndfile >= 1.1)
+    are decoded in-process: audio already at the target rate in mono is used as
+    is, anything else is downmixed and resampled with a polyphase filter. Other
+    formats (M4A, video containers, ...) go through whisper's ffmpeg decoder.
+
+    Args:
+        audio_path (str): Path to audio file
+        sr (int): Target sample rate
+
+    Returns:
+        np.ndarray: Audio waveform
+    """
+    info = _sf_info(audio_path)
+    if info is None:
+        return whisper.load_audio(audio_path, sr=sr)
+
+    if info.channels == 1:
+        audio, _ = sf.read(audio_path, dtype="float32")
+    else:
+        audio, _ = sf.read(audio_path, dtype="float32", always_2d=True)
+        audio = audio.mean(axis=1, dtype=np.float32)
+
+    return resample(audio, info.samplerate, sr)
+
+
+def load_audio_channels(audio_path: str, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Decode every channel of an audio file in a single pass, without downmixing.
+
+    Args:
+        audio_path (str): Path to audio file
+        sr (int): Target sample rate
+
+    Returns:
+        np.ndarray: float32 waveforms, shape (channels, samples)
+    """
+    info = _sf_info(audio_path)
+    if info is None:
+        channels = probe_audio(audio_path)["channels"]
+        try:
+            cmd = ffmpeg_command(audio_path, sr, channels=channels)
+            out = subprocess.run(cmd, capture_output=True, check=True).stdout
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Failed to load audio: {e.stderr.decode()}") from e
+        audio = np.frombuffer(out, np.int16).reshape(-1, channels).astype(np.float32) / 32768.0
+        return np.ascontiguousarray(audio.T)
+
+    audio, _ = sf.read(audio_path, dtype="float32", always_2d=True)
+    return np.ascontiguousarray(resample(audio, info.samplerate, sr).T)
+
+
+def channel_activity(channels: np.ndarray, threshold_db: float = -45.0, frame_seconds: float = 0.03,
+                     sr: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Measure how much of each channel carries signal.
+
+    Args:
+        channels (np.ndarray): Waveforms, shape (channels, samples)
+        threshold_db (float): Frame level (dBFS RMS) above which a frame counts as active
+        frame_seconds (float): Frame length in seconds
+        sr (int): Sample rate
+
+    Returns:
+        np.ndarray: Fraction of active frames per channel
+    """
+    frame = int(frame_seconds * sr)
+    n_frames = channels.shape[1] // frame
+    if n_frames == 0:
+        return np.zeros(len(channels))
+    frames = channels[:, :n_frames * frame].reshape(len(channels), n_frames, frame)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=2))
+    return (rms > 10 ** (threshold_db / 20)).mean(axis=1)
+
+
+def read_window(audio_path: str, offset: float, duration: float = 30.0, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Decode only a window of an audio file as a mono float32 waveform.
+
+    libsndfile seeks directly to the window; other formats use ffmpeg's input
+    seeking, so neither path decodes the audio before the window.
+
+    Args:
+        audio_path (str): Path to audio file
+        offset (float): Window start in seconds
+        duration (float): Window duration in seconds
+        sr (int): Target sample rate
+
+    Returns:
+        np.ndarray: Audio waveform of the window (shorter at the end of the file)
+    """
+    info = _sf_info(audio_path)
+    if info is None:
+        cmd = ffmpeg_command(audio_path, sr, offset=offset, duration=duration)
+        try:
+            out = subprocess.run(cmd, capture_output=True, check=True).stdout
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Failed to load audio: {e.stderr.decode()}") from e
+        return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+    with sf.SoundFile(audio_path) as f:
+        f.seek(min(int(offset * f.samplerate), f.frames))
+        audio = f.read(int(duration * f.samplerate), dtype="float32", always_2d=True)
+    audio = audio.mean(axis=1, dtype=np.float32) if audio.shape[1] > 1 else audio[:, 0]
+    return resample(audio, info.samplerate, sr)
+
+
+def probe_header(audio_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Read sample rate, channel count and duration through libsndfile only, without a subprocess.
+
+    Args:
+        audio_path (str): Path to audio file
+
+    Returns:
+        dict: sample_rate, channels, frames and duration (seconds),
+            or None if libsndfile cannot read the file (ffprobe is needed)
+    """
+    info = _sf_info(audio_path)
+    if info is None:
+        return None
+    return {
+        "sample_rate": info.samplerate,
+        "channels": info.channels,
+        "frames": info.frames,
+        "duration": info.frames / info.samplerate
+    }
+
+
+def probe_audio(audio_path: str) -> Dict[str, Any]:
+    """
+    Read sample rate, channel count and duration from the file header without decoding it.
+
+    Args:
+        audio_path (str): Path to audio file
+
+    Returns:
+        dict: sample_rate, channels, frames and duration (seconds)
+    """
+    probe = probe_header(audio_path)
+    if probe is not None:
+        return probe
+
+    try:
+        out = subprocess.run(ffprobe_command(audio_path), capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to probe audio: {e.stderr.decode()}") from e
+    return parse_probe(out)
+
+
+def _stream_soundfile(audio_path: str, info, block_size: int, sr: int) -> Iterator[np.ndarray]:
+    """Yield mono blocks read through libsndfile, resampling each block with enough context."""
+    g = math.gcd(info.samplerate, sr)
+    up, down = sr // g, info.samplerate // g
+
+    # Block boundaries fall on multiples of `down` input samples so that every
+    # block maps to a whole number of output samples, and each block is read
+    # with more context than the polyphase filter's half-length on both sides.
+    # The concatenated output is then identical to resampling the whole file.
+    in_block = max(down, (block_size * down // up) // down * down)
+    half_len = 10 * max(up, down) // up + 1
+    context = math.ceil(half_len / down) * down if up != down else 0
+
+    with sf.SoundFile(audio_path) as f:
+        total = f.frames
+        for start in range(0, total, in_block):
+            left = min(context, start)
+            stop = min(start + in_block, total)
+            right = min(context, total - stop)
+
+            f.seek(start - left)
+            chunk = f.read(left + (stop - start) + right, dtype="float32", always_2d=True)
+            chunk = chunk.mean(axis=1, dtype=np.float32) if chunk.shape[1] > 1 else chunk[:, 0]
+
+            if up == down:
+                yield chunk
+                continue
+
+            out = resample_poly(chunk, up, down).astype(np.float32)
+            first = left * up // down
+            yield out[first:first + math.ceil((stop - start) * up / down)]
+
+
+def _stream_ffmpeg(audio_path: str, block_size: int, sr: int) -> Iterator[np.ndarray]:
+    """Yield mono blocks from an ffmpeg decoding pipe."""
+    process = subprocess.Popen(ffmpeg_command(audio_path, sr), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            data = process.stdout.read(block_size * 2)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) // 2 * 2], np.int16).astype(np.float32) / 32768.0
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+
+
+def stream_audio(audio_path: str, block_seconds: float = 30.0, sr: int = SAMPLE_RATE) -> Iterator[np.ndarray]:
+    """
+    Read an audio file as consecutive mono float32 blocks at the target sample rate.
+
+    Only one block (plus a few samples of filter context) is held in memory at a
+    time, so peak memory does not depend on the duration of the recording.
+
+    Args:
+        audio_path (str): Path to audio file
+        block_seconds (float): Approximate block duration in seconds
+        sr (int): Target sample rate
+
+    Yields:
+        np.ndarray: Audio block
+    """
+    if not os.path.exists(audio_path):
+        raise FileNotFoundError(f"Audio file not found: {audio_path}")
+
+    block_size = int(block_seconds * sr)
+    info = _sf_info(audio_path)
+    if info is not None:
+        yield from _stream_soundfile(audio_path, info, block_size, sr)
+    else:
+        yield from _stream_ffmpeg(audio_path, block_size, sr)
+
+
+class BatchedLogMel:
+    def __init__(self, n_mels: int = 80, n_samples: int = whisper.audio.N_SAMPLES, device=None):
+        """
+        Initialize a batched log-mel feature extractor for language identification.
+
+        The Hann window and mel filterbank are built once, and the padded audio
+        and output buffers are allocated once and reused across calls, so a
+        whole batch of files costs one STFT and one mel projection. It only
+        feeds the batched encoder passes of LanguageIdentifier; transcription
+        still computes the spectrogram of each file inside model.transcribe.
+
+        Args:
+            n_mels (int): Number of mel bins (80, or 128 for large-v3)
+            n_samples (int): Samples per item; shorter audio is zero-padded, longer audio trimmed
+            device (str): Device to compute on (default: cpu)
+        """
+        self.n_mels = n_mels
+        self.n_samples = n_samples
+        self.n_frames = n_samples // whisper.audio.HOP_LENGTH
+        self.device = torch.device(device or "cpu")
+        self.window = torch.hann_window(whisper.audio.N_FFT, device=self.device)
+        self.filters = whisper.audio.mel_filters(self.device, n_mels)
+        self._audio = torch.zeros(0, n_samples, device=self.device)
+        self._mel = torch.zeros(0, n_mels, self.n_frames, device=self.device)
+
+    def _reserve(self, batch_size: int):
+        """Grow the preallocated buffers to hold at least batch_size items."""
+        if self._audio.shape[0] < batch_size:
+            self._audio = torch.zeros(batch_size, self.n_samples, device=self.device)
+            self._mel = torch.zeros(batch_size, self.n_mels, self.n_frames, device=self.device)
+
+    def __call__(self, audios: List[np.ndarray]) -> torch.Tensor:
+        """
+        Compute the log-mel spectrograms of several waveforms in one vectorized pass.
+
+        The result matches whisper.log_mel_spectrogram(whisper.pad_or_trim(audio))
+        for each item and can be passed straight to model.embed_audio.
+
+        Args:
+            audios (list): 16 kHz mono float32 waveforms
+
+        Returns:
+            torch.Tensor: Log-mel spectrograms, shape (len(audios), n_mels, n_frames).
+                This is a view of an internal buffer, overwritten by the next call.
+        """
+        batch_size = len(audios)
+        self._reserve(batch_size)
+        audio = self._audio[:batch_size]
+        audio.zero_()
+        for row, samples in zip(audio, audios):
+            samples = torch.as_tensor(np.asarray(samples[:self.n_samples], dtype=np.float32))
+            row[:len(samples)].copy_(samples)
+
+        stft = torch.stft(audio, whisper.audio.N_FFT, whisper.audio.HOP_LENGTH,
+                          window=self.window, return_complex=True)
+        magnitudes = stft[..., :-1].abs() ** 2
+
+        mel = self._mel[:batch_size]
+        torch.matmul(self.filters, magnitudes, out=mel)
+        mel.clamp_(min=1e-10).log10_()
+        # Dynamic range is normalized per item, as whisper does per file
+        floor = mel.amax(dim=(1, 2), keepdim=True) - 8.0
+        torch.maximum(mel, floor, out=mel)
+        mel.add_(4.0).div_(4.0)
+        return mel
@@ -8,17 +8,21 @@ import whisper
 import os
 import sys
 from pathlib import Path
+from whisper_cache import get_audio_cache
 
 class WhisperTranscriber:
-    def __init__(self, model_name="base"):
+    def __init__(self, model_name="base", sink=None):
         """
         Initialize Whisper transcriber with specified model.
         
         Args:
             model_name (str): Whisper model size ('tiny', 'base', 'small', 'medium', 'large')
+            sink (TranscriptSink): Sharded output sink used instead of one file per input
         """
         self.model_name = model_name
         self.model = None
+        self.sink = sink
+        self.audio_cache = get_audio_cache()
         self.load_model()
     
     def load_model(self):
@@ -47,8 +51,8 @@ class WhisperTranscriber:
         
         print(f"Transcribing: {audio_path}")
         
-        # Transcribe the audio
-        result = self.model.transcribe(audio_path)
+        # Transcribe the audio (decoded PCM is reused across runs)
+        result = self.model.transcribe(self.audio_cache.load(audio_path))
         
         # Save transcription
         self._save_transcription(result, audio_path, output_format)
@@ -56,7 +60,12 @@ class WhisperTranscriber:
         return result
     
     def _save_transcription(self, result, audio_path, output_format):
-        """Save transcription to file."""
+        """Save transcription to file (or append it to the sink, if any)."""
+        if self.sink is not None:
+            shard = self.sink.write(audio_path, result, model=self.model_name)
+            print(f"✅ Transcription appended to: {shard}")
+            return
+        
         base_path = Path(audio_path).stem
         output_path = f"{base_path}_transcription.{output_format}"
         
@@ -70,31 +79,34 @@ class WhisperTranscriber:
         
         print(f"✅ Transcription saved to: {output_path}")
     
-    def _format_srt(self, result):
+    @classmethod
+    def _format_srt(cls, result):
         """Format transcription as SRT subtitles."""
         srt_content = ""
         for i, segment in enumerate(result["segments"], 1):
-            start_time = self._format_time(segment["start"])
-            end_time = self._format_time(segment["end"])
+            start_time = cls._format_time(segment["start"])
+            end_time = cls._format_time(segment["end"])
             text = segment["text"].strip()
             
             srt_content += f"{i}\n{start_time} --> {end_time}\n{text}\n\n"
         
         return srt_content
     
-    def _format_vtt(self, result):
+    @classmethod
+    def _format_vtt(cls, result):
         """Format transcription as VTT subtitles."""
         vtt_content = "WEBVTT\n\n"
         for segment in result["segments"]:
-            start_time = self._format_time(segment["start"], vtt=True)
-            end_time = self._format_time(segment["end"], vtt=True)
+            start_time = cls._format_time(segment["start"], vtt=True)
+            end_time = cls._format_time(segment["end"], vtt=True)
             text = segment["text"].strip()
             
             vtt_content += f"{start_time} --> {end_time}\n{text}\n\n"
         
         return vtt_content
     
-    def _format_time(self, seconds, vtt=False):
+    @staticmethod
+    def _format_time(seconds, vtt=False):
         """Format seconds to timestamp."""
         hours = int(seconds // 3600)
         minutes = int((seconds % 3600) // 60)
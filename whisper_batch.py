@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Whisper Batch Utilities
+Checkpoint manifest and atomic output writes for resumable batch runs.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+
+def atomic_write(path: str, text: str):
+    """
+    Write a text file atomically.
+
+    The content goes to a temporary file in the same directory, is flushed to
+    disk, and is then renamed over the destination, so a crash never leaves a
+    truncated file that looks complete.
+
+    Args:
+        path (str): Destination path
+        text (str): File content
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def input_root(audio_files: list) -> Optional[str]:
+    """Return the deepest directory containing every input file (None for no files)."""
+    if not audio_files:
+        return None
+    return os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in audio_files])
+
+
+def transcript_path(output_dir: str, audio_file: str, root: Optional[str] = None) -> str:
+    """
+    Return the transcript path of an input file, mirroring its directory under the output directory.
+
+    Inputs with the same name in different directories (day1/call.wav and
+    day2/call.wav) then get different transcripts instead of overwriting
+    each other.
+
+    Args:
+        output_dir (str): Output directory
+        audio_file (str): Path to the audio file
+        root (str): Input directory mirrored from (default: the whole absolute path is mirrored)
+
+    Returns:
+        str: Path of the <stem>_transcription.txt file (its directory may not exist yet)
+    """
+    path = os.path.abspath(audio_file)
+    if root is not None:
+        relative = os.path.relpath(path, os.path.abspath(root))
+    else:
+        relative = os.path.splitdrive(path)[1].lstrip(os.sep + (os.altsep or ""))
+    directory, name = os.path.split(relative)
+    return os.path.normpath(os.path.join(output_dir, directory, f"{Path(name).stem}_transcription.txt"))
+
+
+def options_hash(model_name: str, options: Dict[str, Any]) -> str:
+    """
+    Hash the model name and the transcription options that affect the output.
+
+    Args:
+        model_name (str): Whisper model name
+        options (dict): Transcription options
+
+    Returns:
+        str: Short hex digest
+    """
+    relevant = {k: v for k, v in options.items() if k != "verbose"}
+    payload = json.dumps({"model": model_name, **relevant}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class BatchManifest:
+    def __init__(self, path: str):
+        """
+        Initialize an append-only JSONL manifest of completed batch items.
+
+        One line is appended (and fsynced) per completed file, so the manifest
+        survives the process being killed at any point; a truncated last line
+        is ignored on reload.
+
+        Args:
+            path (str): Manifest file path
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.entries[entry["audio_file"]] = entry
+
+    @staticmethod
+    def _key(audio_file: str) -> str:
+        return os.path.abspath(audio_file)
+
+    def get(self, audio_file: str, opts_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the completed entry for a file if it was produced with the same
+        options and its output still exists.
+        """
+        entry = self.entries.get(self._key(audio_file))
+        if entry is None or entry.get("options_hash") != opts_hash:
+            return None
+        if not os.path.exists(entry.get("output_path", "")):
+            return None
+        return entry
+
+    def record(self, audio_file: str, opts_hash: str, output_path: str, **fields):
+        """Append a completed file to the manifest."""
+        entry = {
+            "audio_file": self._key(audio_file),
+            "options_hash": opts_hash,
+            "output_path": output_path,
+            "completed_at": time.time(),
+            **fields
+        }
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries[entry["audio_file"]] = entry
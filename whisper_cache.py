@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Whisper Cache
+Persistent memory-mapped caches shared by the command-line tools and the web applications.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import numpy as np
+import torch
+import whisper_audio
+from contextlib import contextmanager
+from whisper_decoding import ModelView
+from typing import Optional, Callable, Dict, Tuple
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "WHISPER_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "whisper_project")
+)
+DEFAULT_AUDIO_CACHE_MB = float(os.environ.get("WHISPER_AUDIO_CACHE_MB", "2048"))
+DEFAULT_ENCODER_CACHE_MB = float(os.environ.get("WHISPER_ENCODER_CACHE_MB", "2048"))
+
+_digest_memo: Dict[Tuple[str, int, int], str] = {}
+_digest_lock = threading.Lock()
+
+
+def file_digest(path: str, block_size: int = 1 << 20) -> str:
+    """
+    Compute the content hash of a file.
+
+    Hashes are memoized per (path, size, mtime) so that repeated calls within
+    one process (e.g. language detection followed by transcription) read the
+    file only once.
+
+    Args:
+        path (str): Path to the file
+        block_size (int): Read size in bytes
+
+    Returns:
+        str: Hex digest of the file content
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _digest_lock:
+        if memo_key in _digest_memo:
+            return _digest_memo[memo_key]
+
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    digest = h.hexdigest()
+
+    with _digest_lock:
+        _digest_memo[memo_key] = digest
+    return digest
+
+
+class MmapCache:
+    def __init__(self, cache_dir: str, max_bytes: int):
+        """
+        Initialize a directory of memory-mapped .npy arrays.
+
+        Entries are evicted least-recently-used first once the directory grows
+        past max_bytes. Access time is tracked through the file mtime, which is
+        refreshed on every hit, so several processes can share one cache.
+
+        Args:
+            cache_dir (str): Directory holding the cached arrays
+            max_bytes (int): Size cap in bytes (0 disables the cache)
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        if self.enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Return the cached array for key as a memory map, or None on a miss."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            # Copy-on-write mapping: no read into memory and writable for torch.from_numpy
+            array = np.load(path, mmap_mode="c")
+            os.utime(path)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        return array
+
+    def put(self, key: str, array: np.ndarray) -> np.ndarray:
+        """
+        Store an array under key and return it memory-mapped from the cache.
+
+        The file is written to a temporary name and renamed into place so that
+        concurrent readers never see a partial entry.
+        """
+        if not self.enabled:
+            return array
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        self.evict()
+        cached = self.get(key)
+        return array if cached is None else cached
+
+    def evict(self):
+        """Remove least-recently-used entries until the cache fits max_bytes."""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if not entry.name.endswith(".npy"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total += stat.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    # Open memory maps stay valid after unlink on POSIX
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def size(self) -> int:
+        """Return the current size of the cache in bytes."""
+        if not self.enabled:
+            return 0
+        return sum(e.stat().st_size for e in os.scandir(self.cache_dir) if e.name.endswith(".npy"))
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        if not self.enabled:
+            return
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".npy"):
+                os.unlink(entry.path)
+
+
+class AudioCache(MmapCache):
+    def __init__(self, cache_dir: Optional[str] = None, max_mb: Optional[float] = None,
+                 dtype: str = "float32", decoder: Optional[Callable[[str], np.ndarray]] = None):
+        """
+        Initialize the decoded audio cache.
+
+        Audio is stored as normalized 16 kHz mono PCM keyed by the content hash
+        of the source file, so re-transcribing the same upload with another
+        model or other options skips decoding entirely.
+
+        Args:
+            cache_dir (str): Cache directory (default: $WHISPER_CACHE_DIR/pcm)
+            max_mb (float): Size cap in MB (default: $WHISPER_AUDIO_CACHE_MB, 0 disables)
+            dtype (str): Storage type, 'float32' (zero-copy reads) or 'int16' (half the disk)
+            decoder (callable): Function decoding a path to 16 kHz mono float32 PCM
+                (default: whisper_audio.load_audio)
+        """
+        if dtype not in ("float32", "int16"):
+            raise ValueError(f"Unsupported cache dtype: {dtype}")
+
+        max_mb = DEFAULT_AUDIO_CACHE_MB if max_mb is None else max_mb
+        super().__init__(
+            cache_dir or os.path.join(DEFAULT_CACHE_DIR, "pcm"),
+            int(max_mb * 1024 * 1024)
+        )
+        self.dtype = dtype
+        self.decoder = decoder or whisper_audio.load_audio
+
+    def load(self, audio_path: str) -> np.ndarray:
+        """
+        Load an audio file as 16 kHz mono float32 PCM, decoding it only on a cache miss.
+
+        Args:
+            audio_path (str): Path to audio file
+
+        Returns:
+            np.ndarray: Audio waveform (memory-mapped when stored as float32)
+        """
+        if not self.enabled or whisper_audio.is_native(audio_path):
+            # 16 kHz mono files are read with zero conversion, no need to duplicate them
+            return self.decoder(audio_path)
+
+        key = f"{file_digest(audio_path)}_{self.dtype}"
+        audio = self.get(key)
+
+        if audio is None:
+            audio = self.decoder(audio_path)
+            if self.dtype == "int16":
+                stored = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+            else:
+                stored = audio.astype(np.float32, copy=False)
+            audio = self.put(key, stored)
+
+        if audio.dtype == np.int16:
+            return audio.astype(np.float32) / 32768.0
+        return audio
+
+
+class _CachedEncoder(torch.nn.Module):
+    """Drop-in replacement for model.encoder that serves windows from an EncoderCache."""
+
+    def __init__(self, encoder: torch.nn.Module, cache: "EncoderCache", prefix: str):
+        super().__init__()
+        self.encoder = encoder
+        self.cache = cache
+        self.prefix = prefix
+
+    def forward(self, mel: torch.Tensor) -> torch.Tensor:
+        keys = [f"{self.prefix}_{self.cache.window_digest(window)}" for window in mel]
+        outputs = [self.cache.get(key) for key in keys]
+
+        missing = [i for i, output in enumerate(outputs) if output is None]
+        if missing:
+            # Encode all missing windows of the batch in one pass
+            encoded = self.encoder(mel[missing])
+            for i, features in zip(missing, encoded):
+                self.cache.put(keys[i], features.detach().cpu().numpy())
+                outputs[i] = features
+            self.cache.misses += len(missing)
+        self.cache.hits += len(keys) - len(missing)
+
+        return torch.stack([
+            output if torch.is_tensor(output) else torch.from_numpy(output).to(mel.device)
+            for output in outputs
+        ])
+
+
+class EncoderCache(MmapCache):
+    def __init__(self, cache_dir: Optional[str] = None, max_mb: Optional[float] = None):
+        """
+        Initialize the encoder output cache.
+
+        Each 30-second window's audio features are stored under the audio hash,
+        the model name and a digest of the window's mel spectrogram. The window
+        digest stands in for the window index: whisper moves its seek position
+        according to the decoded timestamps, so two runs only share a window
+        when they encode exactly the same frames.
+
+        Args:
+            cache_dir (str): Cache directory (default: $WHISPER_CACHE_DIR/encoder)
+            max_mb (float): Size cap in MB (default: $WHISPER_ENCODER_CACHE_MB, 0 disables)
+        """
+        max_mb = DEFAULT_ENCODER_CACHE_MB if max_mb is None else max_mb
+        super().__init__(
+            cache_dir or os.path.join(DEFAULT_CACHE_DIR, "encoder"),
+            int(max_mb * 1024 * 1024)
+        )
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def window_digest(mel: torch.Tensor) -> str:
+        """Return a digest identifying one mel spectrogram window."""
+        data = mel.detach().cpu().contiguous().numpy()
+        return hashlib.blake2b(data.tobytes(), digest_size=12).hexdigest()
+
+    @contextmanager
+    def attach(self, model, model_name: str, audio_key: str):
+        """
+        Serve the model's encoder passes from the cache inside the context.
+
+        Decoding and language detection call model.encoder, so re-running a
+        file with different decoder-side options (temperature, initial_prompt,
+        task, word_timestamps) skips the encoder for every window already seen.
+
+        The cached encoder is set on a view of the model, which is yielded:
+        transcribe with it. The shared model itself is left untouched, so jobs
+        paused inside this context by the scheduler and other jobs on the same
+        model each keep their own cache key.
+
+        Args:
+            model: Loaded Whisper model (or view)
+            model_name (str): Model name, part of the cache key
+            audio_key (str): Content hash of the audio file
+
+        Yields:
+            ModelView: The model with a caching encoder (the model itself when the cache is disabled)
+        """
+        if not self.enabled:
+            yield model
+            return
+
+        encoder = model.encoder
+        if isinstance(encoder, _CachedEncoder):
+            encoder = encoder.encoder
+        yield ModelView(model, encoder=_CachedEncoder(encoder, self, f"{model_name}_{audio_key}"))
+
+
+_audio_cache: Optional[AudioCache] = None
+_encoder_cache: Optional[EncoderCache] = None
+_audio_cache_lock = threading.Lock()
+
+
+def get_audio_cache() -> AudioCache:
+    """Return the process-wide audio cache configured from the environment."""
+    global _audio_cache
+    with _audio_cache_lock:
+        if _audio_cache is None:
+            _audio_cache = AudioCache()
+        return _audio_cache
+
+
+def get_encoder_cache() -> EncoderCache:
+    """Return the process-wide encoder output cache configured from the environment."""
+    global _encoder_cache
+    with _audio_cache_lock:
+        if _encoder_cache is None:
+            _encoder_cache = EncoderCache()
+        return _encoder_cache
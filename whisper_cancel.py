@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Whisper Cancellation
+Cancellation tokens checked between transcription windows.
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+
+class TranscriptionCancelled(Exception):
+    """Raised when a cancelled job is still waiting for the model."""
+
+
+class CancellationToken:
+    def __init__(self, timeout: Optional[float] = None, predicate: Optional[Callable[[], bool]] = None):
+        """
+        Initialize a cancellation token.
+
+        The token fires when cancel() is called, when the timeout has elapsed,
+        or when the predicate returns True (for instance once the client
+        session is gone). Window-by-window transcription checks it between
+        windows and returns the segments decoded so far.
+
+        Args:
+            timeout (float): Seconds from now after which the token fires
+            predicate (callable): Polled on each check, fires the token when it returns True
+        """
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self.predicate = predicate
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+
+    def cancel(self, reason: str = "cancelled"):
+        """Fire the token (the first reason is kept)."""
+        if self.reason is None:
+            self.reason = reason
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the token has fired."""
+        if not self._event.is_set():
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                self.cancel("timeout")
+            elif self.predicate is not None and self.predicate():
+                self.cancel("abandoned")
+        return self._event.is_set()
+
+    def check(self):
+        """Raise TranscriptionCancelled if the token has fired."""
+        if self.cancelled:
+            raise TranscriptionCancelled(self.reason)
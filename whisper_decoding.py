@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Whisper Decoding Strategies
+Speculative decoding with a draft model and batched temperature fallback.
+"""
+
+import functools
+import time
+import torch
+import torch.nn.functional as F
+from dataclasses import replace
+from torch.distributions import Categorical
+from typing import Optional, Dict, Any, List, Sequence
+from whisper.decoding import DecodingOptions, DecodingResult, DecodingTask, GreedyDecoder
+from whisper.decoding import decode as decode_function, detect_language as detect_language_function
+from whisper.transcribe import transcribe as transcribe_function
+from whisper.utils import compression_ratio
+
+DRAFT_TOKENS = 4
+FALLBACK_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+BEST_OF = 5
+
+
+class ModelView:
+    def __init__(self, model, **overrides):
+        """
+        Wrap a Whisper model with some attributes replaced for one caller.
+
+        Models are cached and shared by concurrent requests, and the scheduler
+        pauses a request between windows while another one uses the same
+        model, so per-request changes (cached encoder, decoding strategy) are
+        never set on the model itself. Everything not overridden is read from
+        the model. decode, detect_language and transcribe are bound to the view
+        unless overridden, so the model's own code goes through the overrides.
+
+        Wrapping a view merges the overrides into a single view of the model.
+
+        Args:
+            model: Whisper model or ModelView
+            **overrides: Replaced attributes (e.g. encoder, decode)
+        """
+        if isinstance(model, ModelView):
+            overrides = {**model._overrides, **overrides}
+            model = model._model
+        self.__dict__["_model"] = model
+        self.__dict__["_overrides"] = overrides
+        self.__dict__.update(overrides)
+        for name, function in (("decode", decode_function), ("detect_language", detect_language_function),
+                               ("transcribe", transcribe_function)):
+            if name not in overrides:
+                self.__dict__[name] = functools.partial(function, self)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+    def __call__(self, *args, **kwargs):
+        return self._model(*args, **kwargs)
+
+
+class _DecoderState:
+    """Text decoder run step by step with its own key/value cache, which can be rolled back."""
+
+    def __init__(self, decoder, audio_features: torch.Tensor):
+        self.decoder = decoder
+        self.tokens: List[int] = []
+        self.keys: List[Optional[torch.Tensor]] = [None] * len(decoder.blocks)
+        self.values: List[Optional[torch.Tensor]] = [None] * len(decoder.blocks)
+        self.dtype = audio_features.dtype
+        # Cross-attention keys and values only depend on the audio
+        self.cross = [
+            (block.cross_attn.key(audio_features), block.cross_attn.value(audio_features))
+            for block in decoder.blocks
+        ]
+
+    @staticmethod
+    def _attention(attn, q, k, v, mask=None):
+        n_head = attn.n_head
+        q = q.view(*q.shape[:2], n_head, -1).permute(0, 2, 1, 3)
+        k = k.view(*k.shape[:2], n_head, -1).permute(0, 2, 1, 3)
+        v = v.view(*v.shape[:2], n_head, -1).permute(0, 2, 1, 3)
+        out = F.scaled_dot_product_attention(q, k, v, attn_mask=mask)
+        return attn.out(out.permute(0, 2, 1, 3).flatten(start_dim=2))
+
+    def feed(self, tokens: List[int]) -> torch.Tensor:
+        """
+        Run the decoder on tokens following the cached ones.
+
+        Args:
+            tokens (list): New token ids
+
+        Returns:
+            torch.Tensor: Logits for each new position, shape (len(tokens), n_vocab)
+        """
+        offset = len(self.tokens)
+        n = len(tokens)
+        device = self.decoder.token_embedding.weight.device
+        x = torch.tensor([tokens], device=device)
+        x = self.decoder.token_embedding(x) + self.decoder.positional_embedding[offset:offset + n]
+        x = x.to(self.dtype)
+
+        # Causal mask shifted by the cached length: new position j sees keys 0..offset+j
+        mask = torch.ones(n, offset + n, dtype=torch.bool, device=device).tril(offset)
+
+        for i, block in enumerate(self.decoder.blocks):
+            h = block.attn_ln(x)
+            k, v = block.attn.key(h), block.attn.value(h)
+            if offset:
+                k = torch.cat([self.keys[i][:, :offset], k], dim=1)
+                v = torch.cat([self.values[i][:, :offset], v], dim=1)
+            self.keys[i], self.values[i] = k, v
+            x = x + self._attention(block.attn, block.attn.query(h), k, v, mask)
+
+            h = block.cross_attn_ln(x)
+            x = x + self._attention(block.cross_attn, block.cross_attn.query(h), *self.cross[i])
+            x = x + block.mlp(block.mlp_ln(x))
+
+        x = self.decoder.ln(x)
+        logits = (x @ torch.transpose(self.decoder.token_embedding.weight.to(x.dtype), 0, 1)).float()
+        self.tokens.extend(tokens)
+        return logits[0]
+
+    def sync(self, tokens: List[int]):
+        """Keep the cache for the longest prefix shared with `tokens`, leaving at least one token to feed."""
+        n = 0
+        limit = min(len(self.tokens), len(tokens) - 1)
+        while n < limit and self.tokens[n] == tokens[n]:
+            n += 1
+        del self.tokens[n:]
+
+
+class SpeculativeDecodingTask(DecodingTask):
+    def __init__(self, model, options: DecodingOptions, draft_model, num_draft_tokens: int = DRAFT_TOKENS,
+                 stats: Optional[Dict[str, Any]] = None):
+        """
+        Initialize a greedy decoding task verified against draft model proposals.
+
+        The draft model proposes `num_draft_tokens` tokens one at a time; the
+        target model scores all of them in one forward pass and keeps the
+        longest prefix matching its own argmax, plus its own next token. The
+        target's logit filters are applied at every position, so the tokens
+        are the ones greedy decoding with the target model picks.
+
+        Args:
+            model: Target Whisper model
+            options (DecodingOptions): Greedy decoding options (temperature 0, no beam search)
+            draft_model: Smaller Whisper model with the same vocabulary and mel bins
+            num_draft_tokens (int): Tokens proposed per verification pass
+            stats (dict): Counters updated in place (proposed, accepted, target_passes, tokens)
+        """
+        super().__init__(model, options)
+        self.draft_model = draft_model
+        self.num_draft_tokens = max(1, num_draft_tokens)
+        self.stats = stats if stats is not None else {}
+        self._draft_features = None
+
+    def _get_audio_features(self, mel: torch.Tensor):
+        audio_features = super()._get_audio_features(mel)
+        if self.options.fp16:
+            mel = mel.half()
+        self._draft_features = self.draft_model.encoder(mel)
+        return audio_features
+
+    def _next_token(self, logits: torch.Tensor, tokens: List[int]):
+        """Apply the logit filters to one position and return the greedy token and its log probability."""
+        logits = logits[None].clone()
+        context = torch.tensor([tokens], device=logits.device)
+        for logit_filter in self.logit_filters:
+            logit_filter.apply(logits, context)
+        token = logits.argmax(dim=-1)
+        return int(token), float(F.log_softmax(logits.float(), dim=-1)[0, token])
+
+    def _main_loop(self, audio_features: torch.Tensor, tokens: torch.Tensor):
+        if tokens.shape[0] != 1:
+            return super()._main_loop(audio_features, tokens)
+
+        eot = self.tokenizer.eot
+        target = _DecoderState(self.model.decoder, audio_features)
+        draft = _DecoderState(self.draft_model.decoder, self._draft_features)
+        committed = tokens[0].tolist()
+        sum_logprob = 0.0
+        no_speech_probs = [float("nan")]
+        sampled = 0
+
+        while True:
+            # Never go past the context window or the sample budget
+            budget = min(self.num_draft_tokens, self.sample_len - sampled - 1, self.n_ctx - len(committed))
+
+            # Draft proposals, greedy with the same filters
+            proposals: List[int] = []
+            if budget > 0:
+                draft.sync(committed)
+                logits = draft.feed(committed[len(draft.tokens):])[-1]
+                for _ in range(budget):
+                    token, _ = self._next_token(logits, committed + proposals)
+                    proposals.append(token)
+                    if token == eot or len(proposals) == budget:
+                        break
+                    logits = draft.feed([token])[-1]
+
+            # One target pass scores the pending tokens and every proposal
+            target.sync(committed)
+            first = len(target.tokens)
+            logits = target.feed(committed[first:] + proposals)
+            if sampled == 0 and self.tokenizer.no_speech is not None:
+                probs_at_sot = logits[self.sot_index - first].float().softmax(dim=-1)
+                no_speech_probs = [probs_at_sot[self.tokenizer.no_speech].item()]
+
+            base = len(committed) - 1 - first
+            accepted = 0
+            done = False
+            for j in range(len(proposals) + 1):
+                token, logprob = self._next_token(logits[base + j], committed)
+                committed.append(token)
+                sum_logprob += logprob
+                sampled += 1
+                done = token == eot or sampled >= self.sample_len or len(committed) > self.n_ctx
+                if done or j == len(proposals) or token != proposals[j]:
+                    break
+                accepted += 1
+
+            self.stats["proposed"] = self.stats.get("proposed", 0) + len(proposals)
+            self.stats["accepted"] = self.stats.get("accepted", 0) + accepted
+            self.stats["target_passes"] = self.stats.get("target_passes", 0) + 1
+            if done:
+                break
+
+        self.stats["tokens"] = self.stats.get("tokens", 0) + sampled
+        device = audio_features.device
+        return (
+            torch.tensor([committed], device=device),
+            torch.tensor([sum_logprob], device=device),
+            no_speech_probs
+        )
+
+
+def check_compatible(model, draft_model):
+    """Raise ValueError if the draft model can't propose tokens for the target model."""
+    if model.dims.n_vocab != draft_model.dims.n_vocab:
+        raise ValueError(
+            f"Draft and target vocabularies differ ({draft_model.dims.n_vocab} vs {model.dims.n_vocab} tokens)"
+        )
+    if model.dims.n_mels != draft_model.dims.n_mels:
+        raise ValueError(
+            f"Draft and target mel bins differ ({draft_model.dims.n_mels} vs {model.dims.n_mels})"
+        )
+
+
+def speculative(model, draft_model, num_draft_tokens: int = DRAFT_TOKENS) -> ModelView:
+    """
+    Return a view of the model whose decode uses speculative decoding for greedy passes.
+
+    Beam search and sampling (temperature fallback) use the regular decoder.
+    Wrap the models with the encoder cache first, so the view keeps it.
+
+    Args:
+        model: Target Whisper model (or view)
+        draft_model: Smaller Whisper model with the same vocabulary and mel bins
+        num_draft_tokens (int): Tokens proposed per verification pass
+
+    Returns:
+        ModelView: Model to transcribe with; its `stats` attribute holds the
+            counters (proposed, accepted, target_passes, tokens, decode_seconds)
+    """
+    check_compatible(model, draft_model)
+    stats = {"proposed": 0, "accepted": 0, "target_passes": 0, "tokens": 0, "decode_seconds": 0.0}
+    original = model.decode
+
+    def decode(mel, options: DecodingOptions = DecodingOptions(), **kwargs):
+        if kwargs:
+            options = replace(options, **kwargs)
+        if options.temperature > 0 or options.beam_size is not None or options.task == "lang_id":
+            return original(mel, options)
+
+        single = mel.ndim == 2
+        if single:
+            mel = mel.unsqueeze(0)
+        start = time.perf_counter()
+        result = SpeculativeDecodingTask(model, options, draft_model, num_draft_tokens, stats).run(mel)
+        stats["decode_seconds"] += time.perf_counter() - start
+        return result[0] if single else result
+
+    view = ModelView(model, decode=decode)
+    view.stats = stats
+    return view
+
+
+def fallback_temperatures(temperature) -> tuple:
+    """
+    Return a fallback schedule: the given temperatures, or steps of 0.2 from a single value up to 1.0.
+
+    Args:
+        temperature: Starting temperature, or a schedule
+
+    Returns:
+        tuple: Temperatures tried in order
+    """
+    if isinstance(temperature, (list, tuple)):
+        return tuple(temperature)
+    steps = int(round((1.0 - temperature) / 0.2))
+    return tuple(round(temperature + 0.2 * i, 2) for i in range(max(0, steps) + 1))
+
+
+class _RowTemperatureDecoder(GreedyDecoder):
+    """Sampling decoder with one temperature per batch row."""
+
+    def __init__(self, temperatures: torch.Tensor, eot: int):
+        super().__init__(1.0, eot)
+        self.temperatures = temperatures
+
+    def update(self, tokens: torch.Tensor, logits: torch.Tensor, sum_logprobs: torch.Tensor):
+        next_tokens = Categorical(logits=logits / self.temperatures[:, None]).sample()
+
+        logprobs = F.log_softmax(logits.float(), dim=-1)
+        current_logprobs = logprobs[torch.arange(logprobs.shape[0]), next_tokens]
+        sum_logprobs += current_logprobs * (tokens[:, -1] != self.eot)
+
+        next_tokens[tokens[:, -1] == self.eot] = self.eot
+        tokens = torch.cat([tokens, next_tokens[:, None]], dim=-1)
+        return tokens, (tokens[:, -1] == self.eot).all()
+
+
+@torch.no_grad()
+def decode_candidates(model, audio_features: torch.Tensor, options: DecodingOptions,
+                      temperatures: Sequence[float], best_of: int = BEST_OF) -> Dict[float, DecodingResult]:
+    """
+    Sample `best_of` candidates at every temperature in one batched decoder pass.
+
+    Args:
+        model: Whisper model
+        audio_features (torch.Tensor): Encoder output of one window, shape (n_audio_ctx, n_audio_state)
+        options (DecodingOptions): Decoding options, with the language set
+        temperatures (list): Sampling temperatures, all above zero
+        best_of (int): Candidates per temperature
+
+    Returns:
+        dict: Best candidate (highest ranked, as with best_of) for each temperature
+    """
+    rows = len(temperatures) * best_of
+    options = replace(options, temperature=temperatures[0], best_of=rows, beam_size=None, patience=None)
+    task = DecodingTask(model, options)
+    device = audio_features.device
+    task.decoder = _RowTemperatureDecoder(
+        torch.tensor(temperatures, device=device).repeat_interleave(best_of), task.tokenizer.eot
+    )
+
+    # The encoder output is shared by every row (attention broadcasts over the batch)
+    audio_features = audio_features.unsqueeze(0)
+    tokens = torch.tensor([task.initial_tokens], device=device).repeat(rows, 1)
+    tokens, sum_logprobs, no_speech_probs = task._main_loop(audio_features, tokens)
+    tokens, sum_logprobs = task.decoder.finalize(tokens, sum_logprobs)
+    eot = task.tokenizer.eot
+    tokens = [t[task.sample_begin:(t == eot).nonzero()[0, 0]] for t in tokens]
+
+    results = {}
+    for i, temperature in enumerate(temperatures):
+        group = slice(i * best_of, (i + 1) * best_of)
+        selected = task.sequence_ranker.rank([tokens[group]], [sum_logprobs[group]])[0]
+        row = i * best_of + selected
+        row_tokens = tokens[row].tolist()
+        text = task.tokenizer.decode(row_tokens).strip()
+        results[temperature] = DecodingResult(
+            audio_features=audio_features[0],
+            language=options.language,
+            tokens=row_tokens,
+            text=text,
+            avg_logprob=sum_logprobs[row] / (len(row_tokens) + 1),
+            no_speech_prob=no_speech_probs[row],
+            temperature=temperature,
+            compression_ratio=compression_ratio(text)
+        )
+    return results
+
+
+def batched_fallback(model, temperatures: Sequence[float] = FALLBACK_TEMPERATURES,
+                     best_of: int = BEST_OF) -> ModelView:
+    """
+    Return a view of the model whose decode samples every fallback temperature at once.
+
+    model.transcribe first decodes a window at the lowest temperature. When
+    that result fails the compression ratio or log probability thresholds and
+    transcribe asks for the next temperature, all the remaining temperatures
+    are sampled together, `best_of` candidates each, in one batched pass over
+    the already computed encoder output. Later fallback calls for the same
+    window are answered from that pass, so transcribe still picks the first
+    temperature that passes its thresholds.
+
+    Wrap the model with the encoder cache first, so the view keeps it.
+
+    Args:
+        model: Whisper model (or view)
+        temperatures (list): Fallback schedule, as passed to transcribe
+        best_of (int): Candidates per temperature when the options don't set best_of
+
+    Returns:
+        ModelView: Model to transcribe with; its `stats` attribute holds the
+            counters (windows, fallbacks, candidates)
+    """
+    stats = {"windows": 0, "fallbacks": 0, "candidates": 0}
+    original = model.decode
+    state = {"mel": None, "first": None, "results": {}}
+
+    def decode(mel, options: DecodingOptions = DecodingOptions(), **kwargs):
+        if kwargs:
+            options = replace(options, **kwargs)
+        if mel.ndim != 2:
+            return original(mel, options)
+
+        if mel is not state["mel"]:
+            # First attempt on a new window
+            result = original(mel, options)
+            state.update(mel=mel, first=result, results={})
+            stats["windows"] += 1
+            return result
+
+        if options.temperature not in state["results"]:
+            remaining = [t for t in temperatures if t >= options.temperature]
+            if not remaining or remaining[0] <= 0:
+                return original(mel, options)
+            first = state["first"]
+            n = options.best_of or best_of
+            state["results"].update(decode_candidates(
+                model, first.audio_features, replace(options, language=first.language), remaining, n
+            ))
+            stats["fallbacks"] += 1
+            stats["candidates"] += len(remaining) * n
+        return state["results"][options.temperature]
+
+    view = ModelView(model, decode=decode)
+    view.stats = stats
+    return view
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Whisper Audio Fingerprints
+Band-energy-difference fingerprints to find re-encoded or trimmed copies of recordings.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+from typing import Optional, Dict, Any, List
+from whisper_audio import load_audio
+from whisper_batch import atomic_write
+from whisper_cache import DEFAULT_CACHE_DIR
+
+FP_SAMPLE_RATE = 5512
+FRAME_SIZE = 2048  # 0.37 s
+HOP_SIZE = 256  # 46 ms between sub-fingerprints
+N_BANDS = 33  # 32 bits per sub-fingerprint
+MIN_FREQ, MAX_FREQ = 300.0, 2000.0
+MAX_BIT_ERROR_RATE = 0.35
+MIN_COVERAGE = 0.95
+CHUNK_FRAMES = 4096
+MAX_POSTINGS = 100
+
+_BANDS: Optional[np.ndarray] = None
+
+
+def _band_matrix() -> np.ndarray:
+    """Return the (frequency bin, band) matrix summing FFT power into log-spaced bands."""
+    global _BANDS
+    if _BANDS is None:
+        freqs = np.fft.rfftfreq(FRAME_SIZE, 1.0 / FP_SAMPLE_RATE)
+        edges = np.geomspace(MIN_FREQ, MAX_FREQ, N_BANDS + 1)
+        band = np.searchsorted(edges, freqs, side="right") - 1
+        matrix = np.zeros((len(freqs), N_BANDS), dtype=np.float32)
+        inside = (band >= 0) & (band < N_BANDS)
+        matrix[np.nonzero(inside)[0], band[inside]] = 1.0
+        _BANDS = matrix
+    return _BANDS
+
+
+def fingerprint(audio) -> np.ndarray:
+    """
+    Compute the fingerprint of a recording.
+
+    Audio is decoded at 5512 Hz mono. For each 0.37 s frame (every 46 ms),
+    the energy in 33 log-spaced bands between 300 and 2000 Hz is computed,
+    and each of the 32 bits of the sub-fingerprint is the sign of the energy
+    difference between adjacent bands, minus the same difference in the
+    previous frame. These signs survive re-encoding, resampling and volume
+    changes, and a trimmed copy gives the same sub-fingerprints shifted in time.
+
+    Args:
+        audio: Audio file path, or waveform at FP_SAMPLE_RATE
+
+    Returns:
+        np.ndarray: uint32 sub-fingerprints, one per hop
+    """
+    if isinstance(audio, str):
+        audio = load_audio(audio, sr=FP_SAMPLE_RATE)
+    audio = np.asarray(audio, dtype=np.float32)
+    if len(audio) < FRAME_SIZE + HOP_SIZE:
+        return np.zeros(0, dtype=np.uint32)
+
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(audio, FRAME_SIZE)[::HOP_SIZE]
+    energy = np.concatenate([
+        (np.abs(np.fft.rfft(frames[i:i + CHUNK_FRAMES] * window, axis=1)) ** 2).astype(np.float32) @ _band_matrix()
+        for i in range(0, len(frames), CHUNK_FRAMES)
+    ])
+
+    band_diff = energy[:, :-1] - energy[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    weights = (1 << np.arange(N_BANDS - 1, dtype=np.uint64)).astype(np.uint32)
+    return (bits.astype(np.uint32) * weights).sum(axis=1, dtype=np.uint32)
+
+
+def bit_error_rate(a: np.ndarray, b: np.ndarray) -> float:
+    """Return the fraction of differing bits between two aligned fingerprints."""
+    if len(a) == 0:
+        return 1.0
+    return float(np.unpackbits(np.bitwise_xor(a, b).view(np.uint8)).mean())
+
+
+def slice_result(result: Dict[str, Any], offset: float, duration: float) -> Dict[str, Any]:
+    """
+    Cut the part of a transcription covering [offset, offset + duration] and move it to 0.
+
+    Args:
+        result (dict): Transcription result of the representative recording
+        offset (float): Start of the copy in the representative, in seconds
+        duration (float): Duration of the copy in seconds
+
+    Returns:
+        dict: Transcription result with text, segments and language
+    """
+    segments = []
+    for segment in result["segments"]:
+        if segment["end"] <= offset or segment["start"] >= offset + duration:
+            continue
+        shifted = dict(segment)
+        shifted["id"] = len(segments)
+        shifted["start"] = round(max(0.0, segment["start"] - offset), 3)
+        shifted["end"] = round(min(duration, segment["end"] - offset), 3)
+        if "words" in segment:
+            shifted["words"] = [
+                {**word, "start": round(max(0.0, word["start"] - offset), 3),
+                 "end": round(min(duration, word["end"] - offset), 3)}
+                for word in segment["words"]
+                if offset <= word["start"] < offset + duration
+            ]
+        segments.append(shifted)
+
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": result.get("language")
+    }
+
+
+class FingerprintIndex:
+    def __init__(self, index_dir: Optional[str] = None, max_bit_error_rate: float = MAX_BIT_ERROR_RATE,
+                 min_coverage: float = MIN_COVERAGE):
+        """
+        Initialize a persistent index of representative recordings.
+
+        Each representative is stored as its fingerprint (.npy) and its
+        transcription (.json), per transcription options. A query looks up
+        its sub-fingerprints exactly in a sorted table of all representatives,
+        votes for (representative, time offset) pairs, and checks the best
+        candidates by bit error rate over the aligned frames.
+
+        Args:
+            index_dir (str): Index directory (default: $WHISPER_CACHE_DIR/fingerprints)
+            max_bit_error_rate (float): Bit error rate under which two aligned fingerprints match
+            min_coverage (float): Fraction of the query that must lie inside the representative
+        """
+        self.index_dir = index_dir or os.path.join(DEFAULT_CACHE_DIR, "fingerprints")
+        self.max_bit_error_rate = max_bit_error_rate
+        self.min_coverage = min_coverage
+        self._lock = threading.Lock()
+        self.entries: List[Dict[str, Any]] = []  # audio_file, options_hash, fingerprint, result
+        self._table = None  # (values, entry ids, frames) sorted by value
+
+        if os.path.isdir(self.index_dir):
+            for name in sorted(os.listdir(self.index_dir)):
+                if not name.endswith(".json"):
+                    continue
+                key = name[:-len(".json")]
+                try:
+                    with open(os.path.join(self.index_dir, name), 'r', encoding='utf-8') as f:
+                        meta = json.load(f)
+                    fp = np.load(os.path.join(self.index_dir, f"{key}.npy"))
+                except (OSError, ValueError):
+                    continue
+                self.entries.append({**meta, "fingerprint": fp})
+
+    @staticmethod
+    def _key(audio_file: str, opts_hash: str) -> str:
+        return hashlib.sha1(f"{os.path.abspath(audio_file)}|{opts_hash}".encode('utf-8')).hexdigest()[:16]
+
+    def _build_table(self):
+        """Sort the sub-fingerprints of all representatives for vectorized lookups."""
+        values, ids, frames = [], [], []
+        for i, entry in enumerate(self.entries):
+            fp = entry["fingerprint"]
+            values.append(fp)
+            ids.append(np.full(len(fp), i, dtype=np.int32))
+            frames.append(np.arange(len(fp), dtype=np.int32))
+        if not values:
+            self._table = (np.zeros(0, np.uint32), np.zeros(0, np.int32), np.zeros(0, np.int32))
+            return
+        values = np.concatenate(values)
+        order = np.argsort(values, kind="stable")
+        self._table = (values[order], np.concatenate(ids)[order], np.concatenate(frames)[order])
+
+    def add(self, audio_file: str, fp: np.ndarray, opts_hash: str, result: Optional[Dict[str, Any]] = None):
+        """
+        Add a representative recording, with its transcription once known.
+
+        Only representatives with a transcription are persisted.
+        """
+        with self._lock:
+            for entry in self.entries:
+                if entry["audio_file"] == os.path.abspath(audio_file) and entry["options_hash"] == opts_hash:
+                    entry["result"] = result
+                    break
+            else:
+                self.entries.append({
+                    "audio_file": os.path.abspath(audio_file),
+                    "options_hash": opts_hash,
+                    "fingerprint": fp,
+                    "result": result
+                })
+                self._table = None
+
+            if result is not None:
+                key = self._key(audio_file, opts_hash)
+                os.makedirs(self.index_dir, exist_ok=True)
+                np.save(os.path.join(self.index_dir, f"{key}.npy"), fp)
+                atomic_write(os.path.join(self.index_dir, f"{key}.json"), json.dumps({
+                    "audio_file": os.path.abspath(audio_file),
+                    "options_hash": opts_hash,
+                    "result": result
+                }, ensure_ascii=False))
+
+    def match(self, fp: np.ndarray, opts_hash: str, candidates: int = 5) -> Optional[Dict[str, Any]]:
+        """
+        Find a representative containing the query recording.
+
+        Args:
+            fp (np.ndarray): Query fingerprint
+            opts_hash (str): Transcription options the representative must have been processed with
+            candidates (int): (representative, offset) pairs checked by bit error rate
+
+        Returns:
+            dict: Representative audio_file, its result (None while it is not
+                transcribed yet), offset in seconds and bit error rate, or None
+        """
+        with self._lock:
+            if len(fp) == 0:
+                return None
+            if self._table is None:
+                self._build_table()
+            values, ids, frames = self._table
+
+            # Exact lookups of every sub-fingerprint (silence gives 0, skip it)
+            query_frames = np.nonzero(fp)[0]
+            lo = np.searchsorted(values, fp[query_frames], side="left")
+            hi = np.searchsorted(values, fp[query_frames], side="right")
+            counts = np.where(hi - lo <= MAX_POSTINGS, hi - lo, 0)  # too common to be informative
+            total = int(counts.sum())
+            if total == 0:
+                return None
+            hits = np.repeat(lo - (np.cumsum(counts) - counts), counts) + np.arange(total)
+            hit_query_frames = np.repeat(query_frames, counts)
+
+            # Vote for (representative, offset) pairs
+            offsets = frames[hits].astype(np.int64) - hit_query_frames
+            pairs = ids[hits].astype(np.int64) * (1 << 32) + (offsets + (1 << 31))
+            pairs, votes = np.unique(pairs, return_counts=True)
+
+            for pair in pairs[np.argsort(-votes)[:candidates]]:
+                entry = self.entries[int(pair >> 32)]
+                if entry["options_hash"] != opts_hash:
+                    continue
+                offset = int(pair & 0xFFFFFFFF) - (1 << 31)
+                ref = entry["fingerprint"]
+                start, end = max(0, offset), min(len(ref), offset + len(fp))
+                if end - start < self.min_coverage * len(fp):
+                    continue
+                ber = bit_error_rate(fp[start - offset:end - offset], ref[start:end])
+                if ber <= self.max_bit_error_rate:
+                    return {
+                        "audio_file": entry["audio_file"],
+                        "result": entry["result"],
+                        "offset": round(max(0, offset) * HOP_SIZE / FP_SAMPLE_RATE, 3),
+                        "bit_error_rate": round(ber, 3)
+                    }
+            return None
+
+    def group(self, fingerprints: Dict[str, np.ndarray], opts_hash: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Group a batch into representatives and near-duplicates.
+
+        Recordings are visited longest first, so a full recording becomes the
+        representative of its trimmed copies. Each recording either matches a
+        representative (previously processed or earlier in the batch) or is
+        added as a new one.
+
+        Args:
+            fingerprints (dict): Fingerprint per audio file
+            opts_hash (str): Transcription options hash
+
+        Returns:
+            dict: Match (see match()) for each near-duplicate
+        """
+        duplicates = {}
+        for audio_file in sorted(fingerprints, key=lambda path: -len(fingerprints[path])):
+            fp = fingerprints[audio_file]
+            match = self.match(fp, opts_hash)
+            if match is not None and match["audio_file"] != os.path.abspath(audio_file):
+                duplicates[audio_file] = match
+            elif match is None:
+                self.add(audio_file, fp, opts_hash)
+        return duplicates
+
+    def result(self, audio_file: str, opts_hash: str) -> Optional[Dict[str, Any]]:
+        """Return the stored transcription of a representative."""
+        with self._lock:
+            for entry in self.entries:
+                if entry["audio_file"] == os.path.abspath(audio_file) and entry["options_hash"] == opts_hash:
+                    return entry["result"]
+            return None
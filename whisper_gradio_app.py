@@ -9,77 +9,207 @@ import whisper
 import tempfile
 import os
 import json
+import threading
+import time
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Set
+from whisper_cancel import CancellationToken, TranscriptionCancelled
+from whisper_cache import file_digest, get_audio_cache, get_encoder_cache
+from whisper_decoding import BEST_OF, batched_fallback, fallback_temperatures
+from whisper_router import ModelRouter
+from whisper_scheduler import AdmissionError, Scheduler
+from whisper_stream import build_result, iter_transcribe
+from whisper_warmup import WARMUP_MODELS, ExampleCache, Warmup
+
+LANGUAGE_CODES = {
+    "Français": "fr",
+    "Anglais": "en",
+    "Espagnol": "es",
+    "Allemand": "de",
+    "Italien": "it",
+    "Portugais": "pt",
+    "Russe": "ru",
+    "Japonais": "ja",
+    "Coréen": "ko",
+    "Chinois": "zh"
+}
+
+# Exemples (fichier, modèle, tâche, langue, température, horodatage des mots, repli par lots)
+EXAMPLES = [
+    ["exemple_audio.wav", "base", "transcribe", "Détection automatique", 0.0, False, False],
+]
 
 class WhisperGradioApp:
     def __init__(self):
         """Initialiser l'application Gradio."""
         self.model = None
         self.current_model_name = None
+        self.models = {}  # nom -> modèle chargé (préchargés au démarrage ou chargés à la demande)
+        self._load_lock = threading.Lock()
+        self.audio_cache = get_audio_cache()
+        self.encoder_cache = get_encoder_cache()
+        self.scheduler = Scheduler()
+        self.router = ModelRouter(scheduler=self.scheduler)
+        self.cancel_tokens: Dict[str, Set[CancellationToken]] = {}  # session -> jobs en cours
+        
+        # Préchauffage en arrière-plan, démarré une fois le serveur à l'écoute
+        self.example_cache = ExampleCache()
+        self.warmup = Warmup(
+            self.get_model, WARMUP_MODELS, scheduler=self.scheduler,
+            examples=[
+                (audio_path, model_name, self.build_options(task, language, temperature, word_timestamps))
+                for audio_path, model_name, task, language, temperature, word_timestamps, _ in EXAMPLES
+            ],
+            example_cache=self.example_cache
+        )
+    
+    def get_model(self, model_name: str):
+        """Retourner un modèle Whisper, chargé à la première utilisation."""
+        with self._load_lock:
+            if model_name not in self.models:
+                print(f"Chargement du modèle {model_name}...")
+                start = time.perf_counter()
+                self.models[model_name] = whisper.load_model(model_name)
+                self.router.record_load(model_name, time.perf_counter() - start)
+                print(f"✅ Modèle {model_name} chargé !")
+            return self.models[model_name]
     
     def load_model(self, model_name: str):
         """Charger le modèle Whisper."""
-        if self.current_model_name != model_name:
-            print(f"Chargement du modèle {model_name}...")
-            self.model = whisper.load_model(model_name)
-            self.current_model_name = model_name
-            print(f"✅ Modèle {model_name} chargé !")
+        self.model = self.get_model(model_name)
+        self.current_model_name = model_name
         return f"✅ Modèle {model_name} chargé !"
     
-    def transcribe_audio(self, audio_file, model_name, task, language, temperature, word_timestamps):
-        """Transcrire un fichier audio."""
+    @staticmethod
+    def build_options(task, language, temperature, word_timestamps) -> Dict[str, Any]:
+        """Options de transcription à partir des valeurs de l'interface."""
+        options = {
+            "task": task,
+            "temperature": temperature,
+            "word_timestamps": word_timestamps
+        }
+        if language and language != "Détection automatique":
+            # Convertir les noms de langues en codes
+            options["language"] = LANGUAGE_CODES.get(language, language)
+        return options
+    
+    @staticmethod
+    def format_result(result: Dict[str, Any], model_name: str):
+        """Texte, informations et JSON affichés pour un résultat."""
+        output = {
+            "text": result["text"],
+            "language": result.get("language", "Inconnue"),
+            "segments": len(result.get("segments", [])),
+            "duration": result["segments"][-1]["end"] if result.get("segments") else 0
+        }
+        
+        # Créer le texte formaté pour l'affichage
+        info_text = f"🌍 Langue détectée : {output['language']}\n"
+        info_text += f"📊 Nombre de segments : {output['segments']}\n"
+        info_text += f"⏱️ Durée : {output['duration']:.2f} secondes\n"
+        info_text += f"🤖 Modèle : {model_name}"
+        if result.get("cancelled"):
+            info_text = f"⏹️ Transcription interrompue, résultat partiel\n{info_text}"
+        
+        return (
+            result["text"],
+            info_text,
+            json.dumps(result, indent=2, ensure_ascii=False)
+        )
+    
+    def transcribe_audio(self, audio_file, model_name, task, language, temperature, word_timestamps,
+                         batch_fallback=False, request: gr.Request = None):
+        """
+        Transcrire un fichier audio.
+        
+        Générateur : le texte est mis à jour à chaque fenêtre de 30 secondes
+        décodée, sans attendre la fin du fichier.
+        """
+        user, token = None, None
         try:
-            # Charger le modèle si nécessaire
-            self.load_model(model_name)
+            audio_path = getattr(audio_file, "name", audio_file)
+            
+            # Mode automatique : le plus grand modèle qui respecte le délai cible,
+            # compte tenu de la durée du fichier et de la charge actuelle
+            routing = self.router.choose(audio_path, loaded=list(self.models))
+            if model_name == "auto":
+                model_name = routing["model"]
             
             # Préparer les options
-            options = {
-                "task": task,
-                "temperature": temperature,
-                "word_timestamps": word_timestamps
-            }
-            
-            if language and language != "Détection automatique":
-                # Convertir les noms de langues en codes
-                language_codes = {
-                    "Français": "fr",
-                    "Anglais": "en",
-                    "Espagnol": "es",
-                    "Allemand": "de",
-                    "Italien": "it",
-                    "Portugais": "pt",
-                    "Russe": "ru",
-                    "Japonais": "ja",
-                    "Coréen": "ko",
-                    "Chinois": "zh"
-                }
-                options["language"] = language_codes.get(language, language)
-            
-            # Transcrire
-            result = self.model.transcribe(audio_file.name, **options)
+            options = self.build_options(task, language, temperature, word_timestamps)
+            
+            # Exemple déjà transcrit (au démarrage ou lors d'un lancement précédent)
+            cached = None if batch_fallback else self.example_cache.get(audio_path, model_name, options)
+            if cached is not None:
+                yield self.format_result(cached, model_name)
+                return
+            
+            # Ordonnancement : les requêtes courtes passent avant les longues, qui
+            # cèdent le modèle entre deux fenêtres de 30 secondes
+            user = getattr(request, "session_hash", None) or "anonyme"
+            cost = self.router.rtf(model_name) * routing["duration"]
+            
+            # Jeton d'annulation (bouton Annuler ou fermeture de l'onglet)
+            token = CancellationToken()
+            self.cancel_tokens.setdefault(user, set()).add(token)
+            yield "", "⏳ En attente du modèle...", ""
+            with self.scheduler.job(user, cost, cancel=token) as job:
+                # Charger le modèle si nécessaire
+                self.load_model(model_name)
+                
+                # Repli par lots : toutes les températures de repli d'un segment difficile
+                # sont échantillonnées en une seule passe du décodeur
+                if batch_fallback:
+                    options["temperature"] = fallback_temperatures(temperature)
+                    options["best_of"] = BEST_OF
+                
+                # Transcrire fenêtre par fenêtre en affichant les segments au fil de l'eau
+                # (l'audio décodé est réutilisé d'un modèle à l'autre, et les sorties
+                # de l'encodeur lorsque seules les options de décodage changent)
+                audio = self.audio_cache.load(audio_path)
+                segments, detected = [], options.get("language")
+                with self.router.track(model_name, routing["duration"], cancel=token, job=job), \
+                        self.encoder_cache.attach(self.model, model_name, file_digest(audio_path)) as model:
+                    if batch_fallback:
+                        model = batched_fallback(model, options["temperature"], BEST_OF)
+                    for segment in iter_transcribe(
+                        model, audio, cancel=token,
+                        checkpoint=job.checkpoint if job.preemptible else None, **options
+                    ):
+                        detected = segment.pop("language")
+                        segments.append(segment)
+                        progress = min(1.0, segment["end"] / routing["duration"]) if routing["duration"] else 1.0
+                        yield (
+                            "".join(s["text"] for s in segments).strip(),
+                            f"⏳ Transcription : {progress:.0%} ({segment['end']:.0f} / {routing['duration']:.0f} s)",
+                            ""
+                        )
+                result = build_result(segments, detected, token)
             
             # Formater la sortie
-            output = {
-                "text": result["text"],
-                "language": result.get("language", "Inconnue"),
-                "segments": len(result.get("segments", [])),
-                "duration": result["segments"][-1]["end"] if result.get("segments") else 0
-            }
-            
-            # Créer le texte formaté pour l'affichage
-            info_text = f"🌍 Langue détectée : {output['language']}\n"
-            info_text += f"📊 Nombre de segments : {output['segments']}\n"
-            info_text += f"⏱️ Durée : {output['duration']:.2f} secondes"
-            
-            return (
-                result["text"],
-                info_text,
-                json.dumps(result, indent=2, ensure_ascii=False)
-            )
+            yield self.format_result(result, model_name)
             
+        except AdmissionError as e:
+            yield f"⏳ Requête refusée, réessayez plus tard : {e}", "", ""
+        except TranscriptionCancelled:
+            yield "⏹️ Transcription annulée avant son démarrage", "", ""
         except Exception as e:
-            return f"Erreur : {str(e)}", "", ""
+            yield f"Erreur : {str(e)}", "", ""
+        finally:
+            if token is not None:
+                self.cancel_tokens.get(user, set()).discard(token)
+    
+    def cancel_session(self, request: gr.Request = None):
+        """Annuler les transcriptions en cours de la session (entre deux fenêtres de 30 secondes)."""
+        user = getattr(request, "session_hash", None) or "anonyme"
+        tokens = self.cancel_tokens.pop(user, set())
+        for token in tokens:
+            token.cancel()
+        return f"⏹️ {len(tokens)} transcription(s) annulée(s)"
+    
+    def queue_metrics(self):
+        """Retourner les métriques de la file d'attente et l'état du préchauffage."""
+        return json.dumps({**self.scheduler.metrics(), "warmup": self.warmup.status()}, indent=2)
     
     def create_interface(self):
         """Créer l'interface Gradio."""
@@ -101,10 +231,10 @@ class WhisperGradioApp:
                     
                     with gr.Row():
                         model_dropdown = gr.Dropdown(
-                            choices=["tiny", "base", "small", "medium", "large"],
+                            choices=["auto", "tiny", "base", "small", "medium", "large"],
                             value="base",
                             label="🤖 Modèle",
-                            info="Les modèles plus grands sont plus précis mais plus lents"
+                            info="Les modèles plus grands sont plus précis mais plus lents ; auto choisit selon la durée et la charge"
                         )
                         
                         task_dropdown = gr.Dropdown(
@@ -137,7 +267,14 @@ class WhisperGradioApp:
                         info="Inclure les horodatages pour chaque mot"
                     )
                     
+                    batch_fallback_checkbox = gr.Checkbox(
+                        label="🔁 Repli par lots",
+                        value=False,
+                        info="Essayer toutes les températures de repli d'un segment difficile en une seule passe (GPU)"
+                    )
+                    
                     transcribe_button = gr.Button("🎯 Transcrire", variant="primary", size="lg")
+                    cancel_button = gr.Button("⏹️ Annuler", variant="stop")
                 
                 with gr.Column(scale=2):
                     # Composants de sortie
@@ -149,7 +286,7 @@ class WhisperGradioApp:
                     
                     info_output = gr.Textbox(
                         label="ℹ️ Informations",
-                        lines=3,
+                        lines=4,
                         placeholder="Informations supplémentaires..."
                     )
                     
@@ -158,6 +295,10 @@ class WhisperGradioApp:
                         language="json",
                         lines=20
                     )
+                    
+                    with gr.Accordion("📈 File d'attente", open=False):
+                        metrics_output = gr.Code(label="Métriques", language="json")
+                        metrics_button = gr.Button("🔄 Actualiser")
             
             # Gestionnaires d'événements
             transcribe_button.click(
@@ -168,28 +309,38 @@ class WhisperGradioApp:
                     task_dropdown,
                     language_dropdown,
                     temperature_slider,
-                    word_timestamps_checkbox
-                ],
-                outputs=[text_output, info_output, json_output]
-            )
-            
-            # Exemples
-            gr.Examples(
-                examples=[
-                    ["exemple_audio.wav", "base", "transcribe", "Détection automatique", 0.0, False],
-                ],
-                inputs=[
-                    audio_input,
-                    model_dropdown,
-                    task_dropdown,
-                    language_dropdown,
-                    temperature_slider,
-                    word_timestamps_checkbox
+                    word_timestamps_checkbox,
+                    batch_fallback_checkbox
                 ],
                 outputs=[text_output, info_output, json_output],
-                fn=self.transcribe_audio,
-                cache_examples=True
+                concurrency_limit=None  # l'ordonnanceur décide de l'ordre d'exécution
             )
+            cancel_button.click(fn=self.cancel_session, outputs=info_output)
+            metrics_button.click(fn=self.queue_metrics, outputs=metrics_output)
+            
+            # Onglet fermé : arrêter les transcriptions de la session au lieu de les laisser tourner
+            interface.unload(self.cancel_session)
+            
+            # Exemples (fichiers présents uniquement) : leurs résultats sont calculés
+            # par le préchauffage et conservés d'un lancement à l'autre, au lieu
+            # de bloquer le démarrage
+            examples = [example for example in EXAMPLES if os.path.exists(example[0])]
+            if examples:
+                gr.Examples(
+                    examples=examples,
+                    inputs=[
+                        audio_input,
+                        model_dropdown,
+                        task_dropdown,
+                        language_dropdown,
+                        temperature_slider,
+                        word_timestamps_checkbox,
+                        batch_fallback_checkbox
+                    ],
+                    outputs=[text_output, info_output, json_output],
+                    fn=self.transcribe_audio,
+                    cache_examples=False
+                )
             
             # Pied de page
             gr.Markdown("""
@@ -217,13 +368,17 @@ def main():
     app = WhisperGradioApp()
     interface = app.create_interface()
     
-    # Lancer l'application
-    interface.launch(
+    # Lancer l'application, puis précharger les modèles une fois le serveur à l'écoute
+    server, _, _ = interface.launch(
         server_name="0.0.0.0",
         server_port=7860,
         share=True,
-        show_error=True
+        show_error=True,
+        prevent_thread_lock=True
     )
+    app.warmup.add_route(server)
+    app.warmup.start()
+    interface.block_thread()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
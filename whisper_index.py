@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Whisper Transcript Index
+Timestamped inverted index over transcripts, with phrase search returning audio offsets.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    audio_file TEXT NOT NULL UNIQUE,
+    language TEXT,
+    duration_ms INTEGER,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    term TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term_id INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    start_ms INTEGER NOT NULL,
+    end_ms INTEGER NOT NULL,
+    segment INTEGER NOT NULL,
+    PRIMARY KEY (term_id, file_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_file ON postings (file_id);
+CREATE TABLE IF NOT EXISTS segments (
+    file_id INTEGER NOT NULL,
+    segment INTEGER NOT NULL,
+    start_ms INTEGER NOT NULL,
+    end_ms INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (file_id, segment)
+) WITHOUT ROWID;
+"""
+
+TOKEN_PATTERN = re.compile(r"\w+(?:['’]\w+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into case-folded word terms."""
+    return [token.casefold() for token in TOKEN_PATTERN.findall(text)]
+
+
+def _timed_tokens(segment: Dict[str, Any]) -> List[Tuple[str, int, int]]:
+    """
+    Return the terms of a segment with their start and end in milliseconds.
+
+    Word timestamps are used when the segment has them; otherwise each term
+    gets a time interpolated from its character position in the segment.
+    """
+    if segment.get("words"):
+        return [
+            (term, int(word["start"] * 1000), int(word["end"] * 1000))
+            for word in segment["words"]
+            for term in tokenize(word["word"])
+        ]
+
+    text = segment["text"]
+    start, end = segment["start"], segment["end"]
+    per_char = (end - start) / max(1, len(text))
+    return [
+        (match.group().casefold(),
+         int((start + match.start() * per_char) * 1000),
+         int((start + match.end() * per_char) * 1000))
+        for match in TOKEN_PATTERN.finditer(text)
+    ]
+
+
+class TranscriptIndex:
+    def __init__(self, path: str):
+        """
+        Initialize an inverted index stored in a SQLite database.
+
+        Each posting maps a term to a file, its word position in the file and
+        its start and end time in milliseconds. Postings are clustered by term
+        (WITHOUT ROWID table keyed by term, file and position), so a query reads
+        only the postings of its terms, and a phrase is matched by joining the
+        postings of consecutive terms on consecutive positions.
+
+        Files can be added at any time; adding a file again replaces its
+        postings.
+
+        Args:
+            path (str): SQLite database path
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Run statements in a write transaction taken up front."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _term_ids(conn, terms: List[str]) -> Dict[str, int]:
+        """Return the ids of the given terms, creating missing ones."""
+        unique = sorted(set(terms))
+        conn.executemany("INSERT OR IGNORE INTO terms (term) VALUES (?)", [(term,) for term in unique])
+        ids = {}
+        for i in range(0, len(unique), 500):
+            chunk = unique[i:i + 500]
+            rows = conn.execute(
+                f"SELECT id, term FROM terms WHERE term IN ({','.join('?' * len(chunk))})", chunk
+            )
+            ids.update({row["term"]: row["id"] for row in rows})
+        return ids
+
+    def add(self, audio_file: str, result: Dict[str, Any]) -> int:
+        """
+        Index the segments (and word timestamps, if any) of a transcription.
+
+        Args:
+            audio_file (str): Path to the audio file
+            result (dict): Transcription result with segments
+
+        Returns:
+            int: Number of postings written
+        """
+        segments = result.get("segments", [])
+        tokens = [
+            (term, start_ms, end_ms, i)
+            for i, segment in enumerate(segments)
+            for term, start_ms, end_ms in _timed_tokens(segment)
+        ]
+        duration_ms = int(segments[-1]["end"] * 1000) if segments else 0
+
+        with self._transaction() as conn:
+            self._delete(conn, audio_file)
+            file_id = conn.execute(
+                "INSERT INTO files (audio_file, language, duration_ms, indexed_at) VALUES (?, ?, ?, ?)",
+                (os.path.abspath(audio_file), result.get("language"), duration_ms, time.time())
+            ).lastrowid
+            term_ids = self._term_ids(conn, [term for term, _, _, _ in tokens])
+            conn.executemany(
+                "INSERT INTO postings (term_id, file_id, position, start_ms, end_ms, segment) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (term_ids[term], file_id, position, start_ms, end_ms, segment)
+                    for position, (term, start_ms, end_ms, segment) in enumerate(tokens)
+                ]
+            )
+            conn.executemany(
+                "INSERT INTO segments (file_id, segment, start_ms, end_ms, text) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (file_id, i, int(segment["start"] * 1000), int(segment["end"] * 1000), segment["text"].strip())
+                    for i, segment in enumerate(segments)
+                ]
+            )
+        return len(tokens)
+
+    @staticmethod
+    def _delete(conn, audio_file: str):
+        row = conn.execute("SELECT id FROM files WHERE audio_file = ?", (os.path.abspath(audio_file),)).fetchone()
+        if row is None:
+            return
+        conn.execute("DELETE FROM postings WHERE file_id = ?", (row["id"],))
+        conn.execute("DELETE FROM segments WHERE file_id = ?", (row["id"],))
+        conn.execute("DELETE FROM files WHERE id = ?", (row["id"],))
+
+    def remove(self, audio_file: str):
+        """Remove a file and its postings from the index."""
+        with self._transaction() as conn:
+            self._delete(conn, audio_file)
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Find the occurrences of a word or phrase.
+
+        Args:
+            query (str): Word or phrase (matched case-insensitively, punctuation ignored)
+            limit (int): Maximum number of occurrences returned
+
+        Returns:
+            list: Occurrences with audio_file, start_ms, end_ms and the text of the segment
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        # One postings scan per term, joined on consecutive positions within a file
+        joins = "".join(
+            f" JOIN postings p{i} ON p{i}.term_id = (SELECT id FROM terms WHERE term = ?)"
+            f" AND p{i}.file_id = p0.file_id AND p{i}.position = p0.position + {i}"
+            for i in range(1, len(terms))
+        )
+        last = len(terms) - 1
+        sql = (
+            f"SELECT f.audio_file, p0.start_ms, p{last}.end_ms, s.text"
+            f" FROM postings p0{joins}"
+            f" JOIN files f ON f.id = p0.file_id"
+            f" JOIN segments s ON s.file_id = p0.file_id AND s.segment = p0.segment"
+            f" WHERE p0.term_id = (SELECT id FROM terms WHERE term = ?)"
+            f" ORDER BY f.audio_file, p0.start_ms LIMIT ?"
+        )
+        with self._connect() as conn:
+            rows = conn.execute(sql, [*terms[1:], terms[0], limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of files, distinct terms and postings, and the database size."""
+        with self._connect() as conn:
+            counts = {
+                table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("files", "terms", "postings")
+            }
+        return {**counts, "size_bytes": os.path.getsize(self.path)}
+
+
+def _format_ms(ms: int) -> str:
+    seconds, ms = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{ms:03d}"
+
+
+def main():
+    """Command-line interface for the transcript index."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Search Whisper transcripts by word or phrase")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add = subparsers.add_parser("add", help="Index Whisper JSON results")
+    add.add_argument("index", help="Index database path")
+    add.add_argument("results", nargs="+", metavar="result_json",
+                     help="JSON result file(s); the audio path is taken from an 'audio_file' key if present")
+
+    search = subparsers.add_parser("search", help="Find a word or phrase")
+    search.add_argument("index", help="Index database path")
+    search.add_argument("query", help="Word or phrase")
+    search.add_argument("--limit", type=int, default=20, help="Maximum number of occurrences")
+    search.add_argument("--json", action="store_true", help="Print occurrences as JSON")
+
+    stats = subparsers.add_parser("stats", help="Show index size")
+    stats.add_argument("index", help="Index database path")
+
+    args = parser.parse_args()
+
+    if args.command == "add":
+        index = TranscriptIndex(args.index)
+        for path in args.results:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            postings = index.add(result.get("audio_file", path), result)
+            print(f"✅ Indexed {path} ({postings} postings)")
+
+    elif args.command == "search":
+        hits = TranscriptIndex(args.index).search(args.query, limit=args.limit)
+        if args.json:
+            print(json.dumps(hits, indent=2, ensure_ascii=False))
+            return
+        for hit in hits:
+            print(f"{hit['audio_file']}\t{_format_ms(hit['start_ms'])}\t{_format_ms(hit['end_ms'])}\t{hit['text']}")
+
+    elif args.command == "stats":
+        print(json.dumps(TranscriptIndex(args.index).stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
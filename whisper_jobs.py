@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Whisper Background Jobs
+Persistent upload queue processed by a worker pool that outlives web application reruns.
+"""
+
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Callable, Dict, Any, List
+from whisper_basic import WhisperTranscriber
+from whisper_batch import atomic_write
+from whisper_cache import DEFAULT_CACHE_DIR, file_digest, get_audio_cache, get_encoder_cache
+from whisper_cancel import CancellationToken, TranscriptionCancelled
+from whisper_decoding import BEST_OF, batched_fallback, fallback_temperatures
+from whisper_router import ModelRouter
+from whisper_scheduler import AdmissionError, Scheduler
+from whisper_stream import build_result, iter_transcribe
+
+DEFAULT_JOB_WORKERS = int(os.environ.get("WHISPER_JOB_WORKERS", "2"))
+EXPORT_FORMATS = ("txt", "srt", "vtt", "json")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    workspace TEXT NOT NULL,
+    name TEXT NOT NULL,
+    audio_path TEXT NOT NULL,
+    model_name TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    progress REAL NOT NULL DEFAULT 0,
+    duration REAL,
+    result_path TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_workspace ON jobs (workspace, id);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+
+class JobStore:
+    def __init__(self, jobs_dir: Optional[str] = None):
+        """
+        Initialize the job store.
+
+        Jobs live in a SQLite database next to the uploaded files and the
+        JSON results, so they survive reruns, closed tabs and server restarts.
+        Jobs are grouped by workspace (any string shared by the clients that
+        should see the same jobs).
+
+        Args:
+            jobs_dir (str): Store directory (default: $WHISPER_CACHE_DIR/jobs)
+        """
+        self.jobs_dir = jobs_dir or os.path.join(DEFAULT_CACHE_DIR, "jobs")
+        self.path = os.path.join(self.jobs_dir, "jobs.db")
+        self.uploads_dir = os.path.join(self.jobs_dir, "uploads")
+        self.results_dir = os.path.join(self.jobs_dir, "results")
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        os.makedirs(self.results_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Run statements in a write transaction taken up front."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def add(self, workspace: str, name: str, data: bytes, model_name: str, options: Dict[str, Any]) -> int:
+        """
+        Store an uploaded file and queue it.
+
+        Args:
+            workspace (str): Workspace the job belongs to
+            name (str): Original file name
+            data (bytes): File content
+            model_name (str): Model name, or "auto"
+            options (dict): Transcription options (batch_fallback included)
+
+        Returns:
+            int: Job id
+        """
+        with self._transaction() as conn:
+            job_id = conn.execute(
+                "INSERT INTO jobs (workspace, name, audio_path, model_name, options, created_at) "
+                "VALUES (?, ?, '', ?, ?, ?)",
+                (workspace, name, model_name, json.dumps(options, sort_keys=True), time.time())
+            ).lastrowid
+            # Keep the extension so the right decoder is picked
+            audio_path = os.path.join(self.uploads_dir, f"{job_id}{Path(name).suffix}")
+            with open(audio_path, 'wb') as f:
+                f.write(data)
+            conn.execute("UPDATE jobs SET audio_path = ? WHERE id = ?", (audio_path, job_id))
+        return job_id
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Mark the oldest pending job running and return it (None when nothing is pending)."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), row["id"]))
+        return {**dict(row), "options": json.loads(row["options"])}
+
+    def release(self, job_id: int):
+        """Put a running job back in the queue."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'pending', started_at = NULL WHERE id = ? AND status = 'running'",
+                (job_id,)
+            )
+
+    def requeue_running(self) -> int:
+        """Put back in the queue the jobs left running by a stopped server."""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = 'pending', started_at = NULL, progress = 0 WHERE status = 'running'"
+            ).rowcount
+
+    def update(self, job_id: int, **fields):
+        """Update columns of a job (progress, duration, model_name...)."""
+        columns = ", ".join(f"{column} = ?" for column in fields)
+        with self._transaction() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def finish(self, job_id: int, result: Optional[Dict[str, Any]], status: str = "done",
+               error: Optional[str] = None):
+        """
+        Record the outcome of a job.
+
+        Args:
+            job_id (int): Job id
+            result (dict): Transcription result (partial for a cancelled job), if any
+            status (str): 'done', 'failed' or 'cancelled'
+            error (str): Error message
+        """
+        result_path = None
+        if result is not None:
+            result_path = os.path.join(self.results_dir, f"{job_id}.json")
+            atomic_write(result_path, json.dumps(result, ensure_ascii=False))
+        fields = {"progress": 1.0} if status == "done" else {}
+        self.update(job_id, status=status, result_path=result_path, error=error,
+                    finished_at=time.time(), **fields)
+
+    def cancel_pending(self, job_ids: List[int]) -> int:
+        """Cancel jobs that have not started yet; returns the number cancelled."""
+        with self._transaction() as conn:
+            return conn.executemany(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'pending'",
+                [(time.time(), job_id) for job_id in job_ids]
+            ).rowcount
+
+    def jobs(self, workspace: Optional[str] = None) -> List[Dict[str, Any]]:
+        """List the jobs of a workspace (all jobs by default), oldest first."""
+        with self._connect() as conn:
+            if workspace is None:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY id").fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM jobs WHERE workspace = ? ORDER BY id", (workspace,)).fetchall()
+        return [{**dict(row), "options": json.loads(row["options"])} for row in rows]
+
+    def result(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Load the stored result of a job."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT result_path FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or not row["result_path"]:
+            return None
+        with open(row["result_path"], 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def remove(self, job_ids: List[int]):
+        """Delete finished jobs with their uploaded file and result."""
+        with self._transaction() as conn:
+            for job_id in job_ids:
+                row = conn.execute(
+                    "SELECT audio_path, result_path FROM jobs WHERE id = ? AND status NOT IN ('pending', 'running')",
+                    (job_id,)
+                ).fetchone()
+                if row is None:
+                    continue
+                for path in (row["audio_path"], row["result_path"]):
+                    if path and os.path.exists(path):
+                        os.unlink(path)
+                conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def archive(self, job_ids: List[int], formats: List[str]) -> bytes:
+        """
+        Build a zip of the results of the given jobs.
+
+        Args:
+            job_ids (list): Jobs to include (jobs without a result are skipped)
+            formats (list): Any of 'txt', 'srt', 'vtt', 'json'
+
+        Returns:
+            bytes: Zip archive with one file per job and format
+        """
+        buffer = io.BytesIO()
+        names = set()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for job in self.jobs():
+                if job["id"] not in job_ids or not job["result_path"]:
+                    continue
+                result = self.result(job["id"])
+                # Uploads may share a name; suffix the job id on collisions
+                stem = Path(job["name"]).stem
+                if stem in names:
+                    stem = f"{stem}_{job['id']}"
+                names.add(stem)
+                for fmt in formats:
+                    if fmt == "txt":
+                        content = result["text"]
+                    elif fmt == "srt":
+                        content = WhisperTranscriber._format_srt(result)
+                    elif fmt == "vtt":
+                        content = WhisperTranscriber._format_vtt(result)
+                    else:
+                        content = json.dumps(result, indent=2, ensure_ascii=False)
+                    archive.writestr(f"{stem}_transcription.{fmt}", content)
+        return buffer.getvalue()
+
+
+class JobManager:
+    def __init__(self, store: JobStore, load_model: Callable[[str], Any], scheduler: Optional[Scheduler] = None,
+                 router: Optional[ModelRouter] = None, workers: int = DEFAULT_JOB_WORKERS,
+                 poll_interval: float = 2.0):
+        """
+        Initialize the background worker pool.
+
+        Workers are daemon threads of the server process, independent of any
+        client session: a rerun or a closed tab does not interrupt them. Each
+        job goes through the scheduler like an interactive request, window by
+        window, so interactive requests on the same model still get served
+        between the windows of a long background job. With more than one
+        worker, the next file is decoded while the current one holds the model.
+
+        Args:
+            store (JobStore): Job store
+            load_model (callable): Returns the loaded model for a model name
+            scheduler (Scheduler): Scheduler shared with interactive requests
+            router (ModelRouter): Router for the "auto" model and cost estimates
+            workers (int): Worker threads
+            poll_interval (float): Seconds between polls when the queue is empty
+        """
+        self.store = store
+        self.load_model = load_model
+        self.scheduler = scheduler or Scheduler()
+        self.router = router or ModelRouter(scheduler=self.scheduler)
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._tokens: Dict[int, CancellationToken] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        """Requeue jobs interrupted by a restart and start the workers."""
+        requeued = self.store.requeue_running()
+        if requeued:
+            print(f"🔁 {requeued} interrupted job(s) requeued")
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"whisper-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, workspace: str, name: str, data: bytes, model_name: str, **options) -> int:
+        """Queue an uploaded file and wake a worker."""
+        job_id = self.store.add(workspace, name, data, model_name, options)
+        self._wake.set()
+        return job_id
+
+    def cancel(self, job_ids: List[int]):
+        """Cancel jobs: pending ones right away, running ones at the next window boundary."""
+        self.store.cancel_pending(job_ids)
+        with self._lock:
+            for job_id in job_ids:
+                if job_id in self._tokens:
+                    self._tokens[job_id].cancel()
+
+    def _work(self):
+        while True:
+            job = self.store.claim()
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            try:
+                self._run(job)
+            except AdmissionError:
+                # The scheduler is saturated by interactive requests; try again later
+                self.store.release(job["id"])
+                time.sleep(self.poll_interval)
+            except TranscriptionCancelled:
+                self.store.finish(job["id"], None, status="cancelled")
+            except Exception as e:
+                self.store.finish(job["id"], None, status="failed", error=str(e))
+                print(f"❌ Error processing job {job['id']} ({job['name']}): {e}")
+
+    def _run(self, job: Dict[str, Any]):
+        options = dict(job["options"])
+        batch_fallback = options.pop("batch_fallback", False)
+        audio_path = job["audio_path"]
+
+        routing = self.router.choose(audio_path)
+        model_name = routing["model"] if job["model_name"] == "auto" else job["model_name"]
+        duration = routing["duration"]
+        self.store.update(job["id"], model_name=model_name, duration=duration)
+
+        token = CancellationToken()
+        with self._lock:
+            self._tokens[job["id"]] = token
+        try:
+            # Decode before taking the model slot, so decoding overlaps another job's inference
+            audio = get_audio_cache().load(audio_path)
+            cost = self.router.rtf(model_name) * duration
+            with self.scheduler.job(f"jobs:{job['workspace']}", cost, cancel=token) as slot:
+                model = self.load_model(model_name)
+                if batch_fallback:
+                    options["temperature"] = fallback_temperatures(options.get("temperature", 0.0))
+                    options["best_of"] = BEST_OF
+
+                segments, language = [], options.get("language")
+                with self.router.track(model_name, duration, cancel=token, job=slot), \
+                        get_encoder_cache().attach(model, model_name, file_digest(audio_path)) as model:
+                    if batch_fallback:
+                        model = batched_fallback(model, options["temperature"], BEST_OF)
+                    for segment in iter_transcribe(
+                        model, audio, cancel=token,
+                        checkpoint=slot.checkpoint if slot.preemptible else None, **options
+                    ):
+                        language = segment.pop("language")
+                        segments.append(segment)
+                        progress = min(1.0, segment["end"] / duration) if duration else 1.0
+                        self.store.update(job["id"], progress=progress)
+                result = build_result(segments, language, token)
+        finally:
+            with self._lock:
+                self._tokens.pop(job["id"], None)
+
+        self.store.finish(job["id"], result, status="cancelled" if result.get("cancelled") else "done")
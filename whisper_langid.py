@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Whisper Bulk Language Identification
+Corpus-wide language identification with batched encoder passes and early stopping.
+"""
+
+import json
+import os
+import threading
+import torch
+import whisper
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List
+from whisper_audio import BatchedLogMel, probe_audio, read_window
+from whisper_cache import DEFAULT_CACHE_DIR
+
+WINDOW_SECONDS = whisper.audio.CHUNK_LENGTH
+
+
+class LanguageIdentifier:
+    def __init__(self, model, model_name: str, device=None, windows: int = 3,
+                 threshold: float = 0.9, batch_size: int = 16, cache_path: Optional[str] = None,
+                 num_workers: int = 4):
+        """
+        Initialize the bulk language identifier.
+
+        Each file is sampled at up to `windows` positions spread over its
+        duration. Windows from many files are batched into single encoder
+        passes, one round per window position; a file stops being sampled as
+        soon as its averaged language probability reaches `threshold`.
+
+        Args:
+            model: Loaded multilingual Whisper model
+            model_name (str): Model name, part of the cache key
+            device (str): Device the model runs on
+            windows (int): Maximum number of windows sampled per file
+            threshold (float): Confidence at which voting stops early
+            batch_size (int): Windows per encoder pass
+            cache_path (str): JSONL file of cached results (default: $WHISPER_CACHE_DIR/langid.jsonl)
+            num_workers (int): Threads decoding windows ahead of the encoder
+        """
+        if not model.is_multilingual:
+            raise ValueError("English-only models can't perform language identification")
+
+        self.model = model
+        self.model_name = model_name
+        self.windows = max(1, windows)
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.featurizer = BatchedLogMel(model.dims.n_mels, device=device or model.device)
+        self.cache_path = cache_path or os.path.join(DEFAULT_CACHE_DIR, "langid.jsonl")
+        self._cache_lock = threading.Lock()
+        self._cache = self._load_cache()
+
+    def _load_cache(self) -> Dict[str, Dict[str, Any]]:
+        """Read previously identified files from the JSONL cache."""
+        cache = {}
+        if os.path.exists(self.cache_path):
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # truncated last line after a crash
+                    cache[entry.pop("key")] = entry
+        return cache
+
+    def _cache_key(self, audio_path: str) -> str:
+        stat = os.stat(audio_path)
+        return f"{os.path.abspath(audio_path)}:{stat.st_size}:{stat.st_mtime_ns}:{self.model_name}"
+
+    def _store(self, key: str, result: Dict[str, Any]):
+        """Append a result to the JSONL cache."""
+        with self._cache_lock:
+            self._cache[key] = result
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            with open(self.cache_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"key": key, **result}) + "\n")
+
+    def _offsets(self, audio_path: str) -> List[float]:
+        """Return window start times spread evenly over the file."""
+        duration = probe_audio(audio_path)["duration"]
+        if duration <= WINDOW_SECONDS:
+            return [0.0]
+        n = min(self.windows, int(duration // WINDOW_SECONDS))
+        # Window centers at (i + 0.5) / n of the duration, clipped to the file
+        return [
+            min(max(0.0, duration * (i + 0.5) / n - WINDOW_SECONDS / 2), duration - WINDOW_SECONDS)
+            for i in range(n)
+        ]
+
+    def identify(self, audio_files: list) -> Dict[str, Dict[str, Any]]:
+        """
+        Identify the spoken language of many audio files.
+
+        Args:
+            audio_files (list): List of audio file paths
+
+        Returns:
+            dict: For each file, language, confidence and number of windows used
+                (or error when the file could not be read)
+        """
+        results = {}
+        pending = {}
+
+        for audio_path in audio_files:
+            try:
+                key = self._cache_key(audio_path)
+                if key in self._cache:
+                    results[audio_path] = self._cache[key]
+                    continue
+                pending[audio_path] = {"key": key, "offsets": self._offsets(audio_path), "votes": {}, "n": 0}
+            except Exception as e:
+                results[audio_path] = {"error": str(e)}
+
+        with ThreadPoolExecutor(max_workers=self.num_workers) as pool:
+            while pending:
+                jobs = [(path, state["offsets"][state["n"]]) for path, state in pending.items()]
+
+                for start in range(0, len(jobs), self.batch_size):
+                    batch = jobs[start:start + self.batch_size]
+                    windows = list(pool.map(self._read, batch))
+
+                    loaded = [(path, audio) for (path, _), audio in zip(batch, windows) if not isinstance(audio, Exception)]
+                    for (path, _), audio in zip(batch, windows):
+                        if isinstance(audio, Exception):
+                            results[path] = {"error": str(audio)}
+                            del pending[path]
+                    if not loaded:
+                        continue
+
+                    with torch.no_grad():
+                        _, probs = self.model.detect_language(self.featurizer([audio for _, audio in loaded]))
+
+                    for (path, _), lang_probs in zip(loaded, probs):
+                        votes = pending[path]["votes"]
+                        for lang, p in lang_probs.items():
+                            votes[lang] = votes.get(lang, 0.0) + p
+                        pending[path]["n"] += 1
+
+                for path in list(pending):
+                    state = pending[path]
+                    language = max(state["votes"], key=state["votes"].get)
+                    confidence = state["votes"][language] / state["n"]
+                    if confidence >= self.threshold or state["n"] == len(state["offsets"]):
+                        result = {"language": language, "confidence": round(confidence, 4), "windows": state["n"]}
+                        self._store(state["key"], result)
+                        results[path] = result
+                        del pending[path]
+
+        return results
+
+    @staticmethod
+    def _read(job):
+        audio_path, offset = job
+        try:
+            return read_window(audio_path, offset, WINDOW_SECONDS)
+        except Exception as e:
+            return e
@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""
+Whisper Load Test
+Simulated concurrent clients against the web applications' transcription paths, run offline.
+"""
+
+import json
+import os
+import random
+import resource
+import tempfile
+import threading
+import time
+import numpy as np
+import soundfile as sf
+from types import SimpleNamespace
+from typing import Optional, Callable, Dict, Any, List, Tuple
+from whisper_audio import SAMPLE_RATE, load_audio, probe_audio
+from whisper_cache import AudioCache, EncoderCache, file_digest, get_audio_cache, get_encoder_cache
+from whisper_router import ModelRouter
+from whisper_scheduler import AdmissionError, Scheduler
+from whisper_stream import iter_transcribe
+
+TARGETS = ("service", "gradio", "http", "jobs")
+
+
+def parse_mix(spec: str, cast: Callable[[str], Any] = str) -> List[Tuple[Any, float]]:
+    """
+    Parse a weighted mix such as "tiny:3,base:1" into (value, weight) pairs.
+
+    Args:
+        spec (str): Comma-separated values, each optionally followed by ':weight'
+        cast (callable): Conversion applied to each value
+
+    Returns:
+        list: (value, weight) pairs
+    """
+    mix = []
+    for item in spec.split(","):
+        value, _, weight = item.strip().partition(":")
+        mix.append((cast(value), float(weight) if weight else 1.0))
+    return mix
+
+
+def prepare_clips(sources: List[str], durations: List[float], work_dir: str) -> Dict[float, str]:
+    """
+    Write 16 kHz mono clips of the requested durations by looping the source recordings.
+
+    Args:
+        sources (list): Source audio files
+        durations (list): Clip durations in seconds
+        work_dir (str): Directory for the clips
+
+    Returns:
+        dict: Clip path per duration
+    """
+    audio = np.concatenate([load_audio(path) for path in sources])
+    clips = {}
+    for duration in durations:
+        n = int(duration * SAMPLE_RATE)
+        clip = np.tile(audio, n // len(audio) + 1)[:n]
+        path = os.path.join(work_dir, f"clip_{duration:g}s.wav")
+        sf.write(path, clip, SAMPLE_RATE, subtype="PCM_16")
+        clips[duration] = path
+    return clips
+
+
+def rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """Return the resident set size of a process (this one by default), or None if unknown."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if pid is None:
+        # Peak rather than current RSS outside Linux (bytes on macOS, KB elsewhere)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+    return None
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """Return p50, p95, p99, mean and max of a list of seconds."""
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    values = np.asarray(values, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "mean": round(float(values.mean()), 3),
+        "max": round(float(values.max()), 3)
+    }
+
+
+class ServiceTarget:
+    def __init__(self, load_model: Callable[[str], Any], cache: bool = False):
+        """
+        In-process stand-in for the web applications' request path.
+
+        Requests go through the same pieces as in the Gradio and Streamlit
+        apps: one model instance per name shared by all clients, the model
+        router, the scheduler and window-by-window transcription with
+        preemption between windows.
+
+        Args:
+            load_model (callable): Returns a loaded model for a model name
+            cache (bool): Keep the audio and encoder caches (repeated test files would hit them)
+        """
+        self.load_model = load_model
+        self.scheduler = Scheduler()
+        self.router = ModelRouter(scheduler=self.scheduler)
+        self.audio_cache = get_audio_cache() if cache else AudioCache(max_mb=0)
+        self.encoder_cache = get_encoder_cache() if cache else EncoderCache(max_mb=0)
+        self.models = {}
+        self._lock = threading.Lock()
+
+    def _model(self, model_name: str):
+        with self._lock:
+            if model_name not in self.models:
+                start = time.perf_counter()
+                self.models[model_name] = self.load_model(model_name)
+                self.router.record_load(model_name, time.perf_counter() - start)
+            return self.models[model_name]
+
+    def request(self, client: str, audio_path: str, model_name: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        routing = self.router.choose(audio_path, loaded=list(self.models))
+        if model_name == "auto":
+            model_name = routing["model"]
+        cost = self.router.rtf(model_name) * routing["duration"]
+
+        first_output = None
+        with self.scheduler.job(client, cost) as job:
+            queue_wait = time.perf_counter() - start
+            model = self._model(model_name)
+            audio = self.audio_cache.load(audio_path)
+            with self.router.track(model_name, routing["duration"], job=job), \
+                    self.encoder_cache.attach(model, model_name, file_digest(audio_path)) as model:
+                for _ in iter_transcribe(model, audio, checkpoint=job.checkpoint if job.preemptible else None):
+                    if first_output is None:
+                        first_output = time.perf_counter() - start
+        return {"model": model_name, "queue_wait": queue_wait, "first_output": first_output}
+
+    def metrics(self) -> Dict[str, Any]:
+        return self.scheduler.metrics()
+
+
+class GradioTarget:
+    def __init__(self, cache: bool = False):
+        """
+        Drive WhisperGradioApp.transcribe_audio in process, as the Gradio server would.
+
+        Args:
+            cache (bool): Keep the audio and encoder caches (repeated test files would hit them)
+        """
+        from whisper_gradio_app import WhisperGradioApp
+        self.app = WhisperGradioApp()
+        if not cache:
+            self.app.audio_cache = AudioCache(max_mb=0)
+            self.app.encoder_cache = EncoderCache(max_mb=0)
+
+    def request(self, client: str, audio_path: str, model_name: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        first_output, text = None, ""
+        for text, info, _ in self.app.transcribe_audio(
+            audio_path, model_name, "transcribe", "Détection automatique", 0.0, False,
+            request=SimpleNamespace(session_hash=client)
+        ):
+            if first_output is None and info.startswith("⏳ Transcription"):
+                first_output = time.perf_counter() - start
+        if text.startswith("⏳ Requête refusée"):
+            raise AdmissionError(text)
+        if text.startswith("Erreur"):
+            raise RuntimeError(text)
+        return {"model": model_name, "queue_wait": None, "first_output": first_output}
+
+    def metrics(self) -> Dict[str, Any]:
+        return self.app.scheduler.metrics()
+
+
+class HttpTarget:
+    def __init__(self, url: str):
+        """
+        Call a running Gradio application (local or on the LAN) through gradio_client.
+
+        Args:
+            url (str): Application URL, e.g. http://127.0.0.1:7860
+        """
+        self.url = url
+        self._local = threading.local()
+
+    def _client(self):
+        if not hasattr(self._local, "client"):
+            from gradio_client import Client
+            self._local.client = Client(self.url, verbose=False)
+        return self._local.client
+
+    def request(self, client: str, audio_path: str, model_name: str) -> Dict[str, Any]:
+        try:
+            from gradio_client import handle_file
+            audio = handle_file(audio_path)
+        except ImportError:
+            audio = audio_path
+        text = self._client().predict(
+            audio, model_name, "transcribe", "Détection automatique", 0.0, False, False,
+            api_name="/transcribe_audio"
+        )[0]
+        if text.startswith("⏳ Requête refusée"):
+            raise AdmissionError(text)
+        if text.startswith("Erreur"):
+            raise RuntimeError(text)
+        return {"model": model_name, "queue_wait": None, "first_output": None}
+
+    def metrics(self) -> Optional[Dict[str, Any]]:
+        return None
+
+
+class JobsTarget:
+    def __init__(self, load_model: Callable[[str], Any], poll_interval: float = 0.2):
+        """
+        Submit files to the Streamlit app's background job queue, in process.
+
+        Args:
+            load_model (callable): Returns a loaded model for a model name
+            poll_interval (float): Seconds between job status polls
+        """
+        from whisper_jobs import JobManager, JobStore
+        self.load_model = load_model
+        self.models = {}
+        self._lock = threading.Lock()
+        self.manager = JobManager(JobStore(tempfile.mkdtemp(prefix="whisper_loadtest_jobs_")),
+                                  self._model, poll_interval=poll_interval)
+        self.manager.start()
+        self.poll_interval = poll_interval
+
+    def _model(self, model_name: str):
+        with self._lock:
+            if model_name not in self.models:
+                self.models[model_name] = self.load_model(model_name)
+            return self.models[model_name]
+
+    def request(self, client: str, audio_path: str, model_name: str) -> Dict[str, Any]:
+        with open(audio_path, 'rb') as f:
+            job_id = self.manager.submit(client, os.path.basename(audio_path), f.read(), model_name)
+        while True:
+            job = next(job for job in self.manager.store.jobs(client) if job["id"] == job_id)
+            if job["status"] not in ("pending", "running"):
+                break
+            time.sleep(self.poll_interval)
+        if job["status"] != "done":
+            raise RuntimeError(job["error"] or job["status"])
+        return {"model": job["model_name"], "queue_wait": job["started_at"] - job["created_at"], "first_output": None}
+
+    def metrics(self) -> Dict[str, Any]:
+        return self.manager.scheduler.metrics()
+
+
+class LoadTest:
+    def __init__(self, target, clips: Dict[float, str], durations: List[Tuple[float, float]],
+                 models: List[Tuple[str, float]], clients: int = 4, requests_per_client: int = 5,
+                 think_time: float = 0.0, sample_interval: float = 1.0, server_pid: Optional[int] = None,
+                 seed: int = 0):
+        """
+        Initialize a closed-loop load test.
+
+        Each simulated client sends its requests one after the other, waiting
+        `think_time` seconds (exponentially distributed) between them, with a
+        file duration and a model drawn from the weighted mixes. A sampler
+        records the server's RSS and the number of requests in flight over time.
+
+        Args:
+            target: ServiceTarget, GradioTarget, HttpTarget or JobsTarget
+            clips (dict): Audio file per duration
+            durations (list): (duration, weight) mix
+            models (list): (model name, weight) mix
+            clients (int): Concurrent clients
+            requests_per_client (int): Requests sent by each client
+            think_time (float): Mean pause between a client's requests, in seconds
+            sample_interval (float): Seconds between RSS samples
+            server_pid (int): Server process to sample (default: this process)
+            seed (int): Random seed of the request mix
+        """
+        self.target = target
+        self.clips = clips
+        self.durations = durations
+        self.models = models
+        self.clients = clients
+        self.requests_per_client = requests_per_client
+        self.think_time = think_time
+        self.sample_interval = sample_interval
+        self.server_pid = server_pid
+        self.seed = seed
+        self.records: List[Dict[str, Any]] = []
+        self.timeline: List[Dict[str, Any]] = []
+        self._inflight = 0
+        self._lock = threading.Lock()
+
+    def _client(self, index: int, start: float):
+        rng = random.Random(self.seed * 1000 + index)
+        client = f"loadtest-{index}"
+        for _ in range(self.requests_per_client):
+            duration = rng.choices([d for d, _ in self.durations], [w for _, w in self.durations])[0]
+            model_name = rng.choices([m for m, _ in self.models], [w for _, w in self.models])[0]
+            record = {"client": client, "duration": duration, "model": model_name,
+                      "sent": round(time.perf_counter() - start, 3)}
+            with self._lock:
+                self._inflight += 1
+            sent = time.perf_counter()
+            try:
+                record.update(self.target.request(client, self.clips[duration], model_name))
+                record["status"] = "ok"
+            except AdmissionError as e:
+                record.update(status="rejected", error=str(e))
+            except Exception as e:
+                record.update(status="error", error=str(e))
+            record["latency"] = time.perf_counter() - sent
+            with self._lock:
+                self._inflight -= 1
+                self.records.append(record)
+            if self.think_time > 0:
+                time.sleep(rng.expovariate(1.0 / self.think_time))
+
+    def _sample(self, start: float, done: threading.Event):
+        while True:
+            rss = rss_bytes(self.server_pid)
+            with self._lock:
+                self.timeline.append({
+                    "t": round(time.perf_counter() - start, 2),
+                    "rss_mb": round(rss / 2 ** 20, 1) if rss is not None else None,
+                    "inflight": self._inflight,
+                    "completed": len(self.records)
+                })
+            if done.wait(self.sample_interval):
+                return
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Run the clients to completion and summarize.
+
+        Returns:
+            dict: Summary, breakdowns per model and per duration, scheduler
+                metrics (in-process targets), RSS timeline and per-request records
+        """
+        start = time.perf_counter()
+        done = threading.Event()
+        sampler = threading.Thread(target=self._sample, args=(start, done), daemon=True)
+        sampler.start()
+        threads = [threading.Thread(target=self._client, args=(i, start)) for i in range(self.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+        done.set()
+        sampler.join()
+
+        return {
+            "summary": self.summarize(self.records, wall),
+            "by_model": {
+                model_name: self.summarize([r for r in self.records if r["model"] == model_name], wall)
+                for model_name in sorted({r["model"] for r in self.records})
+            },
+            "by_duration": {
+                f"{duration:g}s": self.summarize([r for r in self.records if r["duration"] == duration], wall)
+                for duration in sorted({r["duration"] for r in self.records})
+            },
+            "scheduler": self.target.metrics(),
+            "timeline": self.timeline,
+            "requests": self.records
+        }
+
+    def summarize(self, records: List[Dict[str, Any]], wall: float) -> Dict[str, Any]:
+        """Latency, queue wait, throughput, error and rejection rates, and peak RSS of a set of requests."""
+        ok = [r for r in records if r["status"] == "ok"]
+        rss = [sample["rss_mb"] for sample in self.timeline if sample["rss_mb"] is not None]
+        return {
+            "requests": len(records),
+            "ok": len(ok),
+            "errors": sum(1 for r in records if r["status"] == "error"),
+            "rejected": sum(1 for r in records if r["status"] == "rejected"),
+            "error_rate": round(sum(1 for r in records if r["status"] == "error") / len(records), 4) if records else None,
+            "rejection_rate": round(sum(1 for r in records if r["status"] == "rejected") / len(records), 4) if records else None,
+            "wall_seconds": round(wall, 2),
+            "throughput_rps": round(len(ok) / wall, 4) if wall else None,
+            "audio_seconds_per_second": round(sum(r["duration"] for r in ok) / wall, 3) if wall else None,
+            "latency_seconds": percentiles([r["latency"] for r in ok]),
+            "queue_wait_seconds": percentiles([r["queue_wait"] for r in ok if r.get("queue_wait") is not None]),
+            "first_output_seconds": percentiles([r["first_output"] for r in ok if r.get("first_output") is not None]),
+            "peak_rss_mb": max(rss) if rss else None
+        }
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any]) -> List[Tuple[str, Any, Any, Optional[float]]]:
+    """
+    Compare the summaries of two saved runs.
+
+    Returns:
+        list: (metric, baseline value, candidate value, relative change) rows
+    """
+    rows = []
+    for key in ("throughput_rps", "audio_seconds_per_second", "error_rate", "rejection_rate", "peak_rss_mb"):
+        rows.append((key, baseline["summary"][key], candidate["summary"][key]))
+    for group in ("latency_seconds", "queue_wait_seconds", "first_output_seconds"):
+        for stat in ("p50", "p95", "p99"):
+            rows.append((f"{group}.{stat}", baseline["summary"][group][stat], candidate["summary"][group][stat]))
+    return [
+        (metric, before, after, round((after - before) / before, 4) if before and after is not None else None)
+        for metric, before, after in rows
+    ]
+
+
+def main():
+    """Command-line interface for load tests."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load test the Whisper web application paths")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Run a load test")
+    run.add_argument("--target", default="service", choices=TARGETS,
+                     help="service: in-process request path of the web apps; gradio: WhisperGradioApp in process; "
+                          "http: running Gradio app; jobs: Streamlit background job queue in process")
+    run.add_argument("--audio", nargs="+", required=True, metavar="audio_file", help="Source recording(s)")
+    run.add_argument("--durations", default=None,
+                     help="Weighted clip durations cut from the sources, e.g. '10:3,60:1,600:0.2' "
+                          "(default: the source files as they are)")
+    run.add_argument("--models", default="base", help="Weighted model mix, e.g. 'tiny:1,base:2,auto:1'")
+    run.add_argument("--clients", type=int, default=4, help="Concurrent clients")
+    run.add_argument("--requests", type=int, default=5, help="Requests per client")
+    run.add_argument("--think", type=float, default=0.0, help="Mean pause between a client's requests (seconds)")
+    run.add_argument("--url", default="http://127.0.0.1:7860", help="Application URL (http target)")
+    run.add_argument("--server-pid", type=int, default=None, help="Process whose RSS is sampled (http target)")
+    run.add_argument("--cache", action="store_true", help="Keep the audio and encoder caches")
+    run.add_argument("--sample-interval", type=float, default=1.0, help="Seconds between RSS samples")
+    run.add_argument("--seed", type=int, default=0, help="Random seed of the request mix")
+    run.add_argument("--output", default="loadtest.json", help="JSON results file")
+
+    comparison = subparsers.add_parser("compare", help="Compare two saved runs")
+    comparison.add_argument("baseline", help="Baseline results JSON")
+    comparison.add_argument("candidate", help="Candidate results JSON")
+
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        with open(args.candidate, 'r', encoding='utf-8') as f:
+            candidate = json.load(f)
+        print(f"{'metric':32} {'baseline':>12} {'candidate':>12} {'change':>8}")
+        for metric, before, after, change in compare(baseline, candidate):
+            change = f"{change:+.1%}" if change is not None else ""
+            print(f"{metric:32} {str(before):>12} {str(after):>12} {change:>8}")
+        return
+
+    if args.durations:
+        durations = parse_mix(args.durations, float)
+        clips = prepare_clips(args.audio, [d for d, _ in durations], tempfile.mkdtemp(prefix="whisper_loadtest_"))
+    else:
+        clips = {round(probe_audio(path)["duration"], 1): path for path in args.audio}
+        durations = [(duration, 1.0) for duration in clips]
+    models = parse_mix(args.models)
+
+    import whisper
+    if args.target == "service":
+        target = ServiceTarget(whisper.load_model, cache=args.cache)
+    elif args.target == "gradio":
+        target = GradioTarget(cache=args.cache)
+    elif args.target == "http":
+        target = HttpTarget(args.url)
+    else:
+        target = JobsTarget(whisper.load_model)
+
+    print(f"🚀 {args.clients} clients x {args.requests} requests against {args.target}")
+    results = LoadTest(
+        target, clips, durations, models, clients=args.clients, requests_per_client=args.requests,
+        think_time=args.think, sample_interval=args.sample_interval, server_pid=args.server_pid, seed=args.seed
+    ).run()
+    results["config"] = {**vars(args), "clips": {f"{d:g}s": path for d, path in clips.items()}}
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+    summary = results["summary"]
+    print(f"✅ {summary['ok']}/{summary['requests']} ok, {summary['errors']} errors, {summary['rejected']} rejected "
+          f"in {summary['wall_seconds']}s ({summary['throughput_rps']} req/s)")
+    print(f"Latency p50/p95/p99: {summary['latency_seconds']['p50']} / {summary['latency_seconds']['p95']} / "
+          f"{summary['latency_seconds']['p99']} s, peak RSS {summary['peak_rss_mb']} MB")
+    print(f"Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
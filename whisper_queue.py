@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Whisper Distributed Work Queue
+SQLite job queue shared by worker processes on one or several hosts.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, Any
+from whisper_batch import atomic_write, transcript_path
+from whisper_index import TranscriptIndex
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    audio_file TEXT NOT NULL UNIQUE,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    audio_seconds REAL,
+    output_path TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+
+def default_worker_id() -> str:
+    """Return a worker id unique across hosts sharing the queue."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    def __init__(self, path: str, lease_seconds: float = 600.0, max_attempts: int = 3):
+        """
+        Initialize a job queue stored in a SQLite database.
+
+        Workers claim jobs inside an immediate transaction, so two workers
+        never get the same job. A claimed job holds a lease that the worker
+        renews while it runs; when a worker dies the lease expires and the job
+        goes back to pending on the next claim, until `max_attempts` is reached.
+
+        The database may live on a filesystem shared by several hosts as long
+        as it supports POSIX locks (NFSv4 with locking enabled, for example).
+
+        Args:
+            path (str): SQLite database path
+            lease_seconds (float): Time a claimed job stays reserved without a heartbeat
+            max_attempts (int): Claims before a job is marked failed for good
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # Rollback journal rather than WAL: WAL needs shared memory, which
+        # does not work across hosts
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Run statements in a write transaction taken up front."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, audio_files: list, **options) -> int:
+        """
+        Add files to the queue; files already queued are left untouched.
+
+        Args:
+            audio_files (list): List of audio file paths (visible to every worker)
+            **options: Transcription options stored with each job
+
+        Returns:
+            int: Number of jobs added
+        """
+        now = time.time()
+        payload = json.dumps(options, sort_keys=True)
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (audio_file, options, enqueued_at) VALUES (?, ?, ?)",
+                [(os.path.abspath(path), payload, now) for path in audio_files]
+            )
+            return conn.total_changes - before
+
+    def requeue_expired(self, conn=None) -> int:
+        """
+        Return jobs whose lease expired to the queue (or fail them after max_attempts).
+
+        Returns:
+            int: Number of jobs requeued or failed
+        """
+        if conn is None:
+            with self._transaction() as conn:
+                return self.requeue_expired(conn)
+
+        now = time.time()
+        before = conn.total_changes
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = 'lease expired', finished_at = ? "
+            "WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+            (now, now, self.max_attempts)
+        )
+        conn.execute(
+            "UPDATE jobs SET status = 'pending', worker = NULL, lease_expires = NULL "
+            "WHERE status = 'running' AND lease_expires < ?",
+            (now,)
+        )
+        return conn.total_changes - before
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """
+        Reserve the oldest pending job for a worker.
+
+        Args:
+            worker (str): Worker id
+
+        Returns:
+            dict: Job (id, audio_file, options, attempts), or None when nothing is pending
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            self.requeue_expired(conn)
+            row = conn.execute(
+                "SELECT id, audio_file, options, attempts FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, lease_expires = ?, "
+                "attempts = attempts + 1, started_at = ? WHERE id = ?",
+                (worker, now + self.lease_seconds, now, row["id"])
+            )
+        return {
+            "id": row["id"],
+            "audio_file": row["audio_file"],
+            "options": json.loads(row["options"]),
+            "attempts": row["attempts"] + 1
+        }
+
+    def heartbeat(self, job_id: int, worker: str) -> bool:
+        """
+        Extend the lease of a running job.
+
+        Returns:
+            bool: False if the job was taken away from this worker
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time() + self.lease_seconds, job_id, worker)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker: str, output_path: str, audio_seconds: Optional[float] = None) -> bool:
+        """Mark a job done; ignored if its lease was lost to another worker."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', finished_at = ?, output_path = ?, audio_seconds = ?, "
+                "lease_expires = NULL, error = NULL WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time(), output_path, audio_seconds, job_id, worker)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker: str, error: str) -> bool:
+        """Record a failed attempt; the job is retried until max_attempts."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "finished_at = ?, error = ?, lease_expires = NULL "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (self.max_attempts, time.time(), error, job_id, worker)
+            )
+            return cursor.rowcount == 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Summarize the queue and the throughput of each worker.
+
+        Returns:
+            dict: Job counts per status and, per worker, files done, failures,
+                busy time, audio duration, files per minute and real-time factor
+        """
+        with self._connect() as conn:
+            counts = {row["status"]: row["n"] for row in conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+            )}
+            workers = {}
+            for row in conn.execute(
+                "SELECT worker, "
+                "SUM(status = 'done') AS done, SUM(status = 'failed') AS failed, "
+                "SUM(CASE WHEN status = 'done' THEN finished_at - started_at END) AS busy, "
+                "SUM(CASE WHEN status = 'done' THEN audio_seconds END) AS audio, "
+                "MIN(started_at) AS first, MAX(finished_at) AS last "
+                "FROM jobs WHERE worker IS NOT NULL GROUP BY worker ORDER BY worker"
+            ):
+                busy = row["busy"] or 0.0
+                span = (row["last"] or 0.0) - (row["first"] or 0.0)
+                workers[row["worker"]] = {
+                    "done": row["done"] or 0,
+                    "failed": row["failed"] or 0,
+                    "busy_seconds": round(busy, 2),
+                    "audio_seconds": round(row["audio"] or 0.0, 2),
+                    "files_per_minute": round(60.0 * (row["done"] or 0) / span, 2) if span > 0 else None,
+                    "real_time_factor": round(busy / row["audio"], 4) if row["audio"] else None
+                }
+        return {"jobs": counts, "workers": workers}
+
+
+def run_worker(transcriber, work_queue: WorkQueue, output_dir: str = "transcriptions",
+               worker_id: Optional[str] = None, wait: bool = False, poll_interval: float = 5.0,
+               transcript_index: Optional[TranscriptIndex] = None) -> Dict[str, int]:
+    """
+    Claim and transcribe jobs until the queue is empty.
+
+    Args:
+        transcriber (AdvancedWhisperTranscriber): Transcriber with the loaded model
+        work_queue (WorkQueue): Shared queue
+        output_dir (str): Output directory for transcriptions (shared by all workers)
+        worker_id (str): Worker id (default: hostname:pid)
+        wait (bool): Keep polling for new jobs instead of exiting when the queue is empty
+        poll_interval (float): Seconds between polls when waiting
+        transcript_index (TranscriptIndex): Search index updated as each job completes
+
+    Returns:
+        dict: Number of jobs done and failed by this worker
+    """
+    worker_id = worker_id or default_worker_id()
+    os.makedirs(output_dir, exist_ok=True)
+    counts = {"done": 0, "failed": 0}
+    print(f"🛠️ Worker {worker_id} started on {work_queue.path}")
+
+    while True:
+        job = work_queue.claim(worker_id)
+        if job is None:
+            if not wait:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        audio_file = job["audio_file"]
+        print(f"\n[{worker_id}] Job {job['id']} (attempt {job['attempts']}): {audio_file}")
+
+        # Renew the lease while the model is busy
+        done = threading.Event()
+
+        def renew():
+            while not done.wait(work_queue.lease_seconds / 3):
+                if not work_queue.heartbeat(job["id"], worker_id):
+                    print(f"⚠️ Lease on job {job['id']} lost")
+                    return
+
+        heartbeat = threading.Thread(target=renew, daemon=True)
+        heartbeat.start()
+        try:
+            result = transcriber.transcribe_with_options(audio_file, **job["options"])
+            # Jobs hold absolute paths: their directories are mirrored under output_dir
+            output_path = transcript_path(output_dir, audio_file)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            atomic_write(output_path, result["text"])
+        except Exception as e:
+            done.set()
+            heartbeat.join()
+            work_queue.fail(job["id"], worker_id, str(e))
+            counts["failed"] += 1
+            print(f"❌ Error processing {audio_file}: {e}")
+            continue
+        done.set()
+        heartbeat.join()
+
+        # The transcript is written: from here on the job completes whatever happens
+        if transcript_index is not None:
+            try:
+                transcript_index.add(audio_file, result)
+            except Exception as e:
+                print(f"❌ Error indexing {audio_file}: {e}")
+        audio_seconds = result["segments"][-1]["end"] if result["segments"] else 0.0
+        if work_queue.complete(job["id"], worker_id, output_path, audio_seconds):
+            counts["done"] += 1
+            print(f"✅ Completed: {output_path}")
+
+    print(f"🏁 Worker {worker_id} finished: {counts['done']} done, {counts['failed']} failed")
+    return counts
+
+
+def main():
+    """Command-line interface for the shared work queue."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Distributed Whisper batch transcription")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = subparsers.add_parser("enqueue", help="Add audio files to the queue")
+    enqueue.add_argument("queue", help="Queue database path")
+    enqueue.add_argument("audio_files", nargs="+", metavar="audio_file", help="Path to the audio file(s)")
+    enqueue.add_argument("--task", default="transcribe", choices=["transcribe", "translate"],
+                         help="Task to perform")
+    enqueue.add_argument("--language", default=None, help="Language code (auto-detect if not specified)")
+
+    work = subparsers.add_parser("work", help="Run a worker until the queue is empty")
+    work.add_argument("queue", help="Queue database path")
+    work.add_argument("--model", default="base", choices=["tiny", "base", "small", "medium", "large"],
+                      help="Whisper model size")
+    work.add_argument("--device", default=None, choices=["cpu", "cuda", "mps"], help="Device to use")
+    work.add_argument("--output-dir", default="transcriptions", help="Output directory")
+    work.add_argument("--worker-id", default=None, help="Worker id (default: hostname:pid)")
+    work.add_argument("--lease", type=float, default=600.0, help="Lease timeout in seconds")
+    work.add_argument("--wait", action="store_true", help="Keep waiting for new jobs")
+    work.add_argument("--index", metavar="DB", default=None, help="Add each transcript to this search index")
+
+    stats = subparsers.add_parser("stats", help="Show queue and per-worker throughput")
+    stats.add_argument("queue", help="Queue database path")
+
+    args = parser.parse_args()
+
+    if args.command == "enqueue":
+        added = WorkQueue(args.queue).enqueue(args.audio_files, task=args.task, language=args.language)
+        print(f"📥 Enqueued {added} new jobs ({len(args.audio_files) - added} already queued)")
+
+    elif args.command == "work":
+        from whisper_advanced import AdvancedWhisperTranscriber
+        transcriber = AdvancedWhisperTranscriber(model_name=args.model, device=args.device)
+        run_worker(transcriber, WorkQueue(args.queue, lease_seconds=args.lease),
+                   args.output_dir, worker_id=args.worker_id, wait=args.wait,
+                   transcript_index=TranscriptIndex(args.index) if args.index else None)
+
+    elif args.command == "stats":
+        print(json.dumps(WorkQueue(args.queue).stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Whisper Shared-Memory Ring Buffers
+Lock-free single-producer/single-consumer audio rings for live lines captured in other processes.
+"""
+
+import threading
+import time
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional, Callable, Dict, Any
+from whisper_audio import SAMPLE_RATE
+from whisper_stream import PROMPT_CHARS
+
+MAGIC = 0x57485350524E4731  # "WHSPRNG1"
+DTYPES = {1: np.dtype(np.float32), 2: np.dtype(np.int16)}
+HEADER_BYTES = 512
+CHUNK_SECONDS = 5.0
+
+# Header slots (uint64). Producer and consumer fields sit on separate
+# 64-byte cache lines so the two sides never write to the same line.
+_MAGIC, _CAPACITY, _DTYPE, _SAMPLE_RATE = 0, 1, 2, 3
+_WRITE_SEQ, _DROPPED, _OVERRUNS, _LAST_WRITE_NS, _CLOSED = 8, 9, 10, 11, 12
+_READ_SEQ, _MAX_FILL = 16, 17
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing segment without letting this process unlink it at exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: the resource tracker would destroy the segment when
+        # the attaching process exits, so unregister it
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class RingBuffer:
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool = False):
+        """
+        Wrap a shared-memory segment laid out as a ring buffer.
+
+        Use RingBuffer.create() or RingBuffer.attach() rather than this
+        constructor. The segment starts with a 512-byte header holding the
+        capacity, the sample format and two monotonic 64-bit sequence counters
+        (frames written, frames read); the frames follow. Only the producer
+        moves the write counter and only the consumer moves the read counter,
+        so no lock is needed: the producer copies frames in before publishing
+        the new write counter, and the consumer releases frames only once it
+        is done with them.
+
+        A producer never overwrites unread frames. When the consumer falls
+        behind and a write does not fit, the whole write is dropped and
+        counted as an overrun, so the consumer always sees a gap-free stream
+        and the capture process never blocks.
+
+        Args:
+            shm (SharedMemory): Segment holding the header and the frames
+            owner (bool): Whether close() also unlinks the segment
+        """
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((HEADER_BYTES // 8,), dtype=np.uint64, buffer=shm.buf)
+        if int(self.header[_MAGIC]) != MAGIC:
+            raise ValueError(f"Shared memory segment {shm.name} is not a Whisper ring buffer")
+        self.capacity = int(self.header[_CAPACITY])
+        self.dtype = DTYPES[int(self.header[_DTYPE])]
+        self.sample_rate = int(self.header[_SAMPLE_RATE])
+        self.frames = np.ndarray((self.capacity,), dtype=self.dtype, buffer=shm.buf, offset=HEADER_BYTES)
+
+    @classmethod
+    def create(cls, name: str, seconds: float = 60.0, dtype: str = "float32",
+               sample_rate: int = SAMPLE_RATE) -> "RingBuffer":
+        """
+        Create a named ring buffer.
+
+        Args:
+            name (str): Shared memory name, used by the other side to attach
+            seconds (float): Capacity in seconds of audio
+            dtype (str): Frame format, 'float32' or 'int16'
+            sample_rate (int): Sample rate of the mono frames
+
+        Returns:
+            RingBuffer: Ring that unlinks the segment when closed
+        """
+        codes = {value: key for key, value in DTYPES.items()}
+        if np.dtype(dtype) not in codes:
+            raise ValueError(f"Unsupported frame format: {dtype} (use float32 or int16)")
+        code = codes[np.dtype(dtype)]
+        capacity = int(seconds * sample_rate)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER_BYTES + capacity * DTYPES[code].itemsize)
+        header = np.ndarray((HEADER_BYTES // 8,), dtype=np.uint64, buffer=shm.buf)
+        header[:] = 0
+        header[_CAPACITY] = capacity
+        header[_DTYPE] = code
+        header[_SAMPLE_RATE] = sample_rate
+        header[_MAGIC] = MAGIC
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "RingBuffer":
+        """Attach to a ring buffer created by another process."""
+        return cls(_attach_shared_memory(name))
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def write_seq(self) -> int:
+        return int(self.header[_WRITE_SEQ])
+
+    @property
+    def read_seq(self) -> int:
+        return int(self.header[_READ_SEQ])
+
+    @property
+    def closed(self) -> bool:
+        """Whether the producer has finished writing."""
+        return bool(self.header[_CLOSED])
+
+    def available(self) -> int:
+        """Return the number of frames written but not yet released by the consumer."""
+        return self.write_seq - self.read_seq
+
+    # Producer side
+
+    def write(self, frames: np.ndarray) -> bool:
+        """
+        Append frames (producer only).
+
+        Args:
+            frames (np.ndarray): Mono frames, converted to the ring's format if needed
+
+        Returns:
+            bool: False if the frames were dropped because the consumer is too far behind
+        """
+        frames = np.asarray(frames, dtype=self.dtype).ravel()
+        n = len(frames)
+        write_seq = self.write_seq
+        if n > self.capacity - (write_seq - self.read_seq):
+            self.header[_DROPPED] += np.uint64(n)
+            self.header[_OVERRUNS] += np.uint64(1)
+            return False
+
+        start = write_seq % self.capacity
+        first = min(n, self.capacity - start)
+        self.frames[start:start + first] = frames[:first]
+        self.frames[:n - first] = frames[first:]
+        self.header[_LAST_WRITE_NS] = time.time_ns()
+        # Publish only once the frames are in place
+        self.header[_WRITE_SEQ] = write_seq + n
+        return True
+
+    def close_stream(self):
+        """Mark the end of the stream (producer only); the consumer drains what is left."""
+        self.header[_CLOSED] = 1
+
+    # Consumer side
+
+    def acquire(self, max_frames: int) -> np.ndarray:
+        """
+        Return up to `max_frames` unread frames without copying them (consumer only).
+
+        The view stays valid until release() is called: the producer does not
+        overwrite frames that have not been released. The view stops at the
+        end of the buffer, so with a capacity that is a multiple of the read
+        size every read is a single contiguous view.
+
+        Args:
+            max_frames (int): Maximum number of frames
+
+        Returns:
+            np.ndarray: View of the oldest unread frames
+        """
+        read_seq = self.read_seq
+        fill = self.write_seq - read_seq
+        if fill > int(self.header[_MAX_FILL]):
+            self.header[_MAX_FILL] = fill
+        start = read_seq % self.capacity
+        return self.frames[start:start + min(max_frames, fill, self.capacity - start)]
+
+    def release(self, n: int):
+        """Give `n` frames back to the producer (consumer only)."""
+        self.header[_READ_SEQ] = self.read_seq + n
+
+    def read(self, n: int) -> Optional[np.ndarray]:
+        """
+        Read exactly `n` frames as 16 kHz float32 audio, or None if fewer are available.
+
+        float32 frames are returned as a view when they do not wrap around the
+        end of the buffer; call release(n) once done with them.
+        """
+        if self.available() < n:
+            return None
+        first = self.acquire(n)
+        if len(first) < n:
+            # Wraps around: the only case that needs a copy
+            first = np.concatenate([first, self.frames[:n - len(first)]])
+        if self.dtype == np.int16:
+            return first.astype(np.float32) / 32768.0
+        return first
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the counters of the stream.
+
+        Returns:
+            dict: Frames written, read and dropped, overruns, current and
+                maximum fill (frames and seconds), and seconds since the last write
+        """
+        last_write_ns = int(self.header[_LAST_WRITE_NS])
+        fill = self.available()
+        return {
+            "name": self.name,
+            "written": self.write_seq,
+            "read": self.read_seq,
+            "dropped": int(self.header[_DROPPED]),
+            "overruns": int(self.header[_OVERRUNS]),
+            "fill": fill,
+            "fill_seconds": round(fill / self.sample_rate, 3),
+            "max_fill_seconds": round(max(fill, int(self.header[_MAX_FILL])) / self.sample_rate, 3),
+            "capacity_seconds": round(self.capacity / self.sample_rate, 3),
+            "idle_seconds": round((time.time_ns() - last_write_ns) / 1e9, 3) if last_write_ns else None,
+            "closed": self.closed
+        }
+
+    def close(self):
+        """Detach from the segment (and unlink it if this side created it)."""
+        self.header = self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class RingBufferTranscriber:
+    def __init__(self, model, callback: Callable[[str, str], None], chunk_seconds: float = CHUNK_SECONDS,
+                 poll_interval: float = 0.05, **options):
+        """
+        Initialize a transcriber serving many live lines from shared-memory rings.
+
+        One thread owns the model and transcribes the lines in turn, one chunk
+        of each line that has a full chunk buffered (or its final tail once the
+        producer has closed the stream). Each chunk is passed to the model as a view of
+        the shared memory (float32 rings) and released once transcribed. The
+        tail of each line's text is its prompt for the next chunk.
+
+        Args:
+            model: Loaded Whisper model
+            callback (callable): Called with (line name, text) for each transcribed chunk
+            chunk_seconds (float): Seconds of audio per transcription
+            poll_interval (float): Seconds to sleep when no line has a full chunk
+            **options: Options passed to model.transcribe
+        """
+        self.model = model
+        self.callback = callback
+        self.chunk_seconds = chunk_seconds
+        self.poll_interval = poll_interval
+        self.options = options
+        self.rings: Dict[str, RingBuffer] = {}
+        self.prompts: Dict[str, str] = {}
+        self._turn = 0
+        self.counters: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_stream(self, name: str) -> RingBuffer:
+        """Attach to the ring buffer of a live line."""
+        ring = RingBuffer.attach(name)
+        if ring.sample_rate != SAMPLE_RATE:
+            ring.close()
+            raise ValueError(f"Ring {name} carries {ring.sample_rate} Hz audio, expected {SAMPLE_RATE} Hz")
+        with self._lock:
+            self.rings[name] = ring
+            self.counters[name] = {"chunks": 0, "audio_seconds": 0.0, "busy_seconds": 0.0}
+        return ring
+
+    def remove_stream(self, name: str):
+        """Detach from a line."""
+        with self._lock:
+            ring = self.rings.pop(name, None)
+            self.prompts.pop(name, None)
+        if ring is not None:
+            ring.close()
+
+    def _next(self) -> Optional[tuple]:
+        """Pick the next line, in turn, that has a full chunk (or a final tail) ready."""
+        chunk = int(self.chunk_seconds * SAMPLE_RATE)
+        with self._lock:
+            lines = list(self.rings.items())
+        for i in range(len(lines)):
+            name, ring = lines[(self._turn + i) % len(lines)]
+            # closed before available: the producer closes after its last write, so a
+            # ring seen closed and then empty is drained (the other order loses the tail)
+            closed = ring.closed
+            available = ring.available()
+            if available >= chunk or closed:
+                self._turn = (self._turn + i + 1) % len(lines)
+                return name, ring, min(available, chunk)
+        return None
+
+    def step(self) -> bool:
+        """
+        Transcribe one chunk of one line.
+
+        Returns:
+            bool: False when no line had audio ready
+        """
+        picked = self._next()
+        if picked is None:
+            return False
+        name, ring, n = picked
+        if n == 0:
+            # Producer finished and everything was transcribed
+            self.remove_stream(name)
+            return True
+
+        audio = ring.read(n)
+        start = time.perf_counter()
+        try:
+            result = self.model.transcribe(audio, initial_prompt=self.prompts.get(name), **self.options)
+        finally:
+            ring.release(n)
+        counters = self.counters[name]
+        counters["chunks"] += 1
+        counters["audio_seconds"] += n / SAMPLE_RATE
+        counters["busy_seconds"] += time.perf_counter() - start
+
+        text = result["text"].strip()
+        if text:
+            self.prompts[name] = (self.prompts.get(name, "") + " " + text)[-PROMPT_CHARS:]
+            self.callback(name, text)
+        return True
+
+    def run(self):
+        """Serve the lines until stop() is called."""
+        while not self._stop.is_set():
+            try:
+                if not self.step():
+                    self._stop.wait(self.poll_interval)
+            except Exception as e:
+                print(f"Error in ring buffer transcription: {e}")
+
+    def start(self):
+        """Serve the lines on a background thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving and detach from all lines."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        for name in list(self.rings):
+            self.remove_stream(name)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return per-line statistics.
+
+        Returns:
+            dict: Per line, the ring counters (see RingBuffer.stats()) plus chunks
+                transcribed, audio seconds and real-time factor
+        """
+        with self._lock:
+            lines = dict(self.rings)
+        stats = {}
+        for name, ring in lines.items():
+            counters = self.counters[name]
+            stats[name] = {
+                **ring.stats(),
+                "chunks": counters["chunks"],
+                "audio_seconds": round(counters["audio_seconds"], 2),
+                "real_time_factor": round(counters["busy_seconds"] / counters["audio_seconds"], 4)
+                if counters["audio_seconds"] else None
+            }
+        return stats
+
+
+def feed(name: str, audio_path: str, speed: float = 1.0, block_seconds: float = 0.1,
+         buffer_seconds: float = 60.0, dtype: str = "float32") -> Dict[str, Any]:
+    """
+    Play an audio file into a new ring buffer at real-time pace, like a capture process.
+
+    Args:
+        name (str): Ring buffer name
+        audio_path (str): Path to audio file
+        speed (float): Playback speed (1.0 = real time)
+        block_seconds (float): Seconds per write
+        buffer_seconds (float): Ring capacity in seconds
+        dtype (str): Frame format, 'float32' or 'int16'
+
+    Returns:
+        dict: Ring statistics once the file has been played and drained
+    """
+    from whisper_audio import stream_audio
+
+    ring = RingBuffer.create(name, buffer_seconds, dtype)
+    try:
+        start = time.monotonic()
+        played = 0
+        for block in stream_audio(audio_path, block_seconds=block_seconds):
+            if dtype == "int16":
+                block = np.clip(block * 32768.0, -32768, 32767)
+            ring.write(block)
+            played += len(block)
+            time.sleep(max(0.0, start + played / SAMPLE_RATE / speed - time.monotonic()))
+        ring.close_stream()
+        # Keep the segment alive until the consumer has read everything
+        while ring.available() > 0:
+            time.sleep(0.1)
+        return ring.stats()
+    finally:
+        ring.close()
+
+
+def main():
+    """Command-line interface for shared-memory live lines."""
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Live transcription from shared-memory ring buffers")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve = subparsers.add_parser("serve", help="Transcribe live lines")
+    serve.add_argument("names", nargs="+", metavar="name", help="Ring buffer name(s)")
+    serve.add_argument("--model", default="base", choices=["tiny", "base", "small", "medium", "large"],
+                       help="Whisper model size")
+    serve.add_argument("--language", default=None, help="Language code (auto-detect if not specified)")
+    serve.add_argument("--chunk", type=float, default=CHUNK_SECONDS, help="Seconds of audio per transcription")
+    serve.add_argument("--stats-interval", type=float, default=30.0, help="Seconds between statistics reports")
+
+    play = subparsers.add_parser("feed", help="Play an audio file into a ring buffer at real-time pace")
+    play.add_argument("name", help="Ring buffer name")
+    play.add_argument("audio_file", help="Path to the audio file")
+    play.add_argument("--speed", type=float, default=1.0, help="Playback speed")
+    play.add_argument("--buffer", type=float, default=60.0, help="Ring capacity in seconds")
+    play.add_argument("--dtype", default="float32", choices=["float32", "int16"], help="Frame format")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        import whisper
+        model = whisper.load_model(args.model)
+        transcriber = RingBufferTranscriber(
+            model, lambda name, text: print(f"[{name}] {text}"),
+            chunk_seconds=args.chunk, language=args.language
+        )
+        for name in args.names:
+            # Wait for the capture process to create the ring
+            while True:
+                try:
+                    transcriber.add_stream(name)
+                    break
+                except FileNotFoundError:
+                    time.sleep(0.5)
+        transcriber.start()
+        print(f"🎤 Serving {len(args.names)} line(s). Press Ctrl+C to stop.")
+        last_report = time.monotonic()
+        try:
+            while transcriber.rings:
+                time.sleep(0.5)
+                if time.monotonic() - last_report >= args.stats_interval:
+                    print(json.dumps(transcriber.stats(), indent=2))
+                    last_report = time.monotonic()
+        except KeyboardInterrupt:
+            pass
+        transcriber.stop()
+        print("🛑 Stopped.")
+
+    elif args.command == "feed":
+        stats = feed(args.name, args.audio_file, speed=args.speed, buffer_seconds=args.buffer, dtype=args.dtype)
+        print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Whisper Model Router
+Picks the largest model that finishes a request within a latency deadline.
+"""
+
+import json
+import os
+import threading
+import time
+import torch
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Iterable
+from whisper_audio import probe_audio
+from whisper_batch import atomic_write
+from whisper_cancel import CancellationToken
+from whisper_cache import DEFAULT_CACHE_DIR
+
+MODEL_SIZES = ["tiny", "base", "small", "medium", "large"]
+DEFAULT_DEADLINE = float(os.environ.get("WHISPER_DEADLINE_SECONDS", 60))
+
+# Rough CPU real-time factors (processing seconds per audio second) and load
+# times, used until real jobs have been measured
+PRIOR_RTF = {"tiny": 0.06, "base": 0.12, "small": 0.35, "medium": 1.0, "large": 2.0}
+PRIOR_LOAD_SECONDS = {"tiny": 1.0, "base": 2.0, "small": 5.0, "medium": 12.0, "large": 25.0}
+GPU_SPEEDUP = 10.0
+
+
+class ModelRouter:
+    def __init__(self, deadline: float = DEFAULT_DEADLINE, models: Iterable[str] = MODEL_SIZES,
+                 device: Optional[str] = None, calibration_path: Optional[str] = None, alpha: float = 0.2,
+                 scheduler=None):
+        """
+        Initialize the model router.
+
+        The processing time of a request is estimated as the work already
+        queued plus the audio duration times the real-time factor of the
+        model, plus the load time if the model is not loaded yet. With a
+        scheduler, the queued work is the scheduler's (waiting and running
+        jobs, spread over its slots); otherwise it is the requests inside
+        track(). Real-time factors and load times are exponentially weighted
+        averages of measured jobs, per model, device and thread count,
+        persisted across restarts.
+
+        Args:
+            deadline (float): Default latency target in seconds
+            models (list): Candidate models, from smallest to largest
+            device (str): Device the models run on
+            calibration_path (str): JSON calibration file (default: $WHISPER_CACHE_DIR/router.json)
+            alpha (float): Weight of each new measurement in the averages
+            scheduler (Scheduler): Scheduler the requests wait in
+        """
+        self.deadline = deadline
+        self.models = list(models)
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.calibration_path = calibration_path or os.path.join(DEFAULT_CACHE_DIR, "router.json")
+        self.alpha = alpha
+        self.scheduler = scheduler
+        self._lock = threading.Lock()
+        self._pending: Dict[int, float] = {}  # ticket -> estimated seconds
+        self._next_ticket = 0
+        self.calibration: Dict[str, Dict[str, float]] = {}
+        self.loaded = set()  # models whose load was recorded
+
+        if os.path.exists(self.calibration_path):
+            try:
+                with open(self.calibration_path, 'r', encoding='utf-8') as f:
+                    self.calibration = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self.calibration = {}
+
+    def _key(self, model_name: str) -> str:
+        return f"{model_name}:{self.device}:{torch.get_num_threads()}"
+
+    def rtf(self, model_name: str) -> float:
+        """Return the calibrated (or prior) real-time factor of a model."""
+        entry = self.calibration.get(self._key(model_name), {})
+        if "rtf" in entry:
+            return entry["rtf"]
+        prior = PRIOR_RTF.get(model_name, 1.0)
+        return prior / GPU_SPEEDUP if self.device == "cuda" else prior
+
+    def load_seconds(self, model_name: str) -> float:
+        """Return the calibrated (or prior) load time of a model."""
+        entry = self.calibration.get(self._key(model_name), {})
+        return entry.get("load_seconds", PRIOR_LOAD_SECONDS.get(model_name, 10.0))
+
+    def backlog(self) -> float:
+        """Return the estimated seconds of work admitted and not finished yet."""
+        if self.scheduler is not None:
+            return self.scheduler.backlog() / self.scheduler.slots
+        with self._lock:
+            return sum(self._pending.values())
+
+    def estimate(self, model_name: str, duration: float, loaded: Iterable[str] = ()) -> float:
+        """
+        Estimate the latency of a request.
+
+        Args:
+            model_name (str): Model
+            duration (float): Audio duration in seconds
+            loaded (list): Models already loaded
+
+        Returns:
+            float: Estimated seconds until the result is ready
+        """
+        seconds = self.backlog() + duration * self.rtf(model_name)
+        if model_name not in loaded:
+            seconds += self.load_seconds(model_name)
+        return seconds
+
+    def choose(self, audio, deadline: Optional[float] = None,
+               loaded: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Pick the largest model expected to meet the deadline.
+
+        Args:
+            audio: Audio file path, or duration in seconds
+            deadline (float): Latency target in seconds (default: router deadline)
+            loaded (list): Models already loaded (default: models whose load was recorded)
+
+        Returns:
+            dict: Chosen model, audio duration, estimated seconds and whether the deadline is met
+                (the smallest model is returned when none meets it)
+        """
+        duration = audio if isinstance(audio, (int, float)) else probe_audio(audio)["duration"]
+        deadline = self.deadline if deadline is None else deadline
+        loaded = self.loaded if loaded is None else set(loaded)
+
+        for model_name in reversed(self.models):
+            estimate = self.estimate(model_name, duration, loaded)
+            if estimate <= deadline:
+                return {"model": model_name, "duration": duration, "estimate": round(estimate, 2), "meets_deadline": True}
+
+        model_name = self.models[0]
+        estimate = self.estimate(model_name, duration, loaded)
+        return {"model": model_name, "duration": duration, "estimate": round(estimate, 2), "meets_deadline": False}
+
+    def _update(self, model_name: str, field: str, value: float):
+        """Fold a measurement into the rolling calibration and persist it."""
+        with self._lock:
+            entry = self.calibration.setdefault(self._key(model_name), {})
+            entry[field] = value if field not in entry else (1 - self.alpha) * entry[field] + self.alpha * value
+            entry[f"{field}_samples"] = entry.get(f"{field}_samples", 0) + 1
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.calibration_path)), exist_ok=True)
+                atomic_write(self.calibration_path, json.dumps(self.calibration, indent=2))
+            except OSError as e:
+                print(f"❌ Error saving router calibration: {e}")
+
+    def record_load(self, model_name: str, seconds: float):
+        """Record a measured model load time."""
+        self.loaded.add(model_name)
+        self._update(model_name, "load_seconds", seconds)
+
+    @contextmanager
+    def track(self, model_name: str, duration: float, cancel: Optional[CancellationToken] = None, job=None):
+        """
+        Count a request in the backlog while it runs and calibrate from its processing time.
+
+        Enter it around the transcription only (after the model is loaded,
+        before the result is saved), so the time measured is decoding time.
+
+        Args:
+            model_name (str): Model running the request
+            duration (float): Audio duration in seconds
+            cancel (CancellationToken): Token of the request; a cancelled run stopped
+                before the end of the audio and does not calibrate
+            job (Job): Scheduler job of the request; the time it spent preempted is not counted
+        """
+        with self._lock:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._pending[ticket] = duration * self.rtf(model_name)
+
+        start = time.perf_counter()
+        preempted = job.preempted if job is not None else 0.0
+        try:
+            yield
+            elapsed = time.perf_counter() - start
+            if job is not None:
+                elapsed -= job.preempted - preempted
+        finally:
+            with self._lock:
+                del self._pending[ticket]
+
+        # Only jobs that ran to the end calibrate the real-time factor
+        if duration > 0 and (cancel is None or cancel.reason is None):
+            self._update(model_name, "rtf", elapsed / duration)
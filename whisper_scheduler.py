@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Whisper Request Scheduler
+Shortest-job-first scheduling with aging, per-user limits and admission control.
+"""
+
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List
+from whisper_cancel import CancellationToken, TranscriptionCancelled
+
+DEFAULT_MAX_WAIT = float(os.environ.get("WHISPER_MAX_WAIT_SECONDS", "600"))
+DEFAULT_MAX_JOBS_PER_USER = int(os.environ.get("WHISPER_MAX_JOBS_PER_USER", "3"))
+SHORT_JOB_SECONDS = float(os.environ.get("WHISPER_SHORT_JOB_SECONDS", "10"))
+
+
+class AdmissionError(RuntimeError):
+    """Raised when a request is rejected because the queue is too long."""
+
+
+class Job:
+    def __init__(self, scheduler: "Scheduler", job_id: int, user: str, cost: float,
+                 cancel: Optional[CancellationToken] = None):
+        """
+        Initialize a scheduled request.
+
+        Args:
+            scheduler (Scheduler): Owning scheduler
+            job_id (int): Sequence number
+            user (str): User or session id
+            cost (float): Estimated processing seconds
+            cancel (CancellationToken): Token that withdraws the job while it waits
+        """
+        self.scheduler = scheduler
+        self.id = job_id
+        self.user = user
+        self.cost = cost
+        self.cancel = cancel
+        self.preemptible = cost > scheduler.short_job_seconds
+        self.enqueued = time.monotonic()
+        self.started: Optional[float] = None
+        self.ran = 0.0  # processing seconds in previous slices
+        self.preempted = 0.0  # seconds spent waiting for the slot back after preemptions
+
+    def remaining(self, now: float) -> float:
+        """Estimated processing seconds left."""
+        running = now - self.started if self.started is not None else 0.0
+        return max(0.0, self.cost - self.ran - running)
+
+    def priority(self, now: float) -> float:
+        """Remaining cost minus the aging credit; lower runs first."""
+        return self.remaining(now) - self.scheduler.aging * (now - self.enqueued)
+
+    def checkpoint(self):
+        """
+        Give the slot to a waiting job with a better priority, then wait for it back.
+
+        Raises:
+            TranscriptionCancelled: If the job was cancelled while preempted
+        """
+        self.scheduler._checkpoint(self)
+
+
+class Scheduler:
+    def __init__(self, slots: int = 1, max_jobs_per_user: int = DEFAULT_MAX_JOBS_PER_USER,
+                 max_running_per_user: int = 1, max_wait: float = DEFAULT_MAX_WAIT,
+                 aging: float = 0.1, short_job_seconds: float = SHORT_JOB_SECONDS):
+        """
+        Initialize the request scheduler.
+
+        Each request is admitted with an estimated cost (processing seconds)
+        and waits for one of `slots` model slots. Free slots go to the waiting
+        job with the lowest remaining cost minus `aging` times its waiting
+        time, so short requests overtake long ones without starving them.
+
+        Jobs costlier than `short_job_seconds` are preemptible: they should be
+        processed in 30-second windows and call `checkpoint()` between
+        windows, which hands the model to any waiting job with a better
+        priority. A voicemail uploaded behind a 2-hour recording then waits
+        for one window instead of the whole recording.
+
+        Args:
+            slots (int): Jobs running at once (one per model instance)
+            max_jobs_per_user (int): Queued and running jobs allowed per user
+            max_running_per_user (int): Running jobs allowed per user
+            max_wait (float): Predicted queue time above which requests are rejected
+            aging (float): Priority credit per second of waiting
+            short_job_seconds (float): Cost above which jobs are preemptible
+        """
+        self.slots = slots
+        self.max_jobs_per_user = max_jobs_per_user
+        self.max_running_per_user = max_running_per_user
+        self.max_wait = max_wait
+        self.aging = aging
+        self.short_job_seconds = short_job_seconds
+
+        self._cond = threading.Condition()
+        self._ids = itertools.count()
+        self._waiting: List[Job] = []
+        self._running: List[Job] = []
+        self._counters = {"submitted": 0, "admitted": 0, "rejected": 0, "completed": 0, "failed": 0,
+                          "cancelled": 0, "preemptions": 0}
+        self._waits = {"short": deque(maxlen=500), "long": deque(maxlen=500)}
+        self._turnarounds = {"short": deque(maxlen=500), "long": deque(maxlen=500)}
+
+    def backlog(self) -> float:
+        """Return the estimated processing seconds of the queued and running jobs."""
+        with self._cond:
+            now = time.monotonic()
+            return sum(job.remaining(now) for job in self._waiting + self._running)
+
+    def _user_jobs(self, user: str, jobs: List[Job]) -> int:
+        return sum(1 for job in jobs if job.user == user)
+
+    def predicted_wait(self, cost: float) -> float:
+        """
+        Predict the queue time of a new job of the given cost.
+
+        Waiting jobs that would run first and non-preemptible running jobs
+        count fully; a preemptible running job only delays the new job if it
+        has a better priority.
+        """
+        with self._cond:
+            now = time.monotonic()
+            ahead = sum(job.remaining(now) for job in self._waiting if job.priority(now) <= cost)
+            ahead += sum(
+                job.remaining(now) for job in self._running
+                if not job.preemptible or job.priority(now) <= cost
+            )
+            return ahead / self.slots
+
+    def submit(self, user: str, cost: float, cancel: Optional[CancellationToken] = None) -> Job:
+        """
+        Admit a job to the queue.
+
+        Args:
+            user (str): User or session id
+            cost (float): Estimated processing seconds
+            cancel (CancellationToken): Token that withdraws the job while it waits
+
+        Returns:
+            Job: Queued job
+
+        Raises:
+            AdmissionError: If the user has too many jobs or the predicted wait is too long
+        """
+        wait = self.predicted_wait(cost)
+        with self._cond:
+            self._counters["submitted"] += 1
+            if self._user_jobs(user, self._waiting + self._running) >= self.max_jobs_per_user:
+                self._counters["rejected"] += 1
+                raise AdmissionError(f"Too many jobs in progress for this user (limit: {self.max_jobs_per_user})")
+            if wait > self.max_wait:
+                self._counters["rejected"] += 1
+                raise AdmissionError(f"Queue too long: estimated wait {wait:.0f}s (limit: {self.max_wait:.0f}s)")
+
+            job = Job(self, next(self._ids), user, cost, cancel)
+            self._waiting.append(job)
+            self._counters["admitted"] += 1
+            self._cond.notify_all()
+            return job
+
+    def _next_job(self, now: float) -> Optional[Job]:
+        """Return the waiting job that should get the next free slot."""
+        eligible = [
+            job for job in self._waiting
+            if self._user_jobs(job.user, self._running) < self.max_running_per_user
+        ]
+        return min(eligible, key=lambda job: (job.priority(now), job.id)) if eligible else None
+
+    def _acquire(self, job: Job):
+        """Block until the job gets a slot, or withdraw it if it is cancelled meanwhile."""
+        with self._cond:
+            while len(self._running) >= self.slots or self._next_job(time.monotonic()) is not job:
+                if job.cancel is not None and job.cancel.cancelled:
+                    self._waiting.remove(job)
+                    self._cond.notify_all()
+                    raise TranscriptionCancelled(job.cancel.reason)
+                self._cond.wait(timeout=1.0)  # aging changes priorities over time, tokens fire
+            self._waiting.remove(job)
+            self._running.append(job)
+            job.started = time.monotonic()
+
+    def _release(self, job: Job):
+        """Free the job's slot (a job withdrawn while preempted has none)."""
+        with self._cond:
+            if job not in self._running:
+                return
+            self._running.remove(job)
+            job.ran += time.monotonic() - job.started
+            job.started = None
+            self._cond.notify_all()
+
+    def _checkpoint(self, job: Job):
+        with self._cond:
+            now = time.monotonic()
+            challenger = self._next_job(now)
+            if challenger is None or challenger.priority(now) >= job.priority(now):
+                return
+            self._counters["preemptions"] += 1
+            self._running.remove(job)
+            job.ran += now - job.started
+            job.started = None
+            self._waiting.append(job)
+            self._cond.notify_all()
+        try:
+            self._acquire(job)
+        finally:
+            job.preempted += time.monotonic() - now
+
+    @contextmanager
+    def job(self, user: str, cost: float, cancel: Optional[CancellationToken] = None):
+        """
+        Admit a job, wait for its slot and free the slot when the block exits.
+
+        Args:
+            user (str): User or session id
+            cost (float): Estimated processing seconds
+            cancel (CancellationToken): Token that withdraws the job while it waits
+
+        Yields:
+            Job: Running job (call checkpoint() between windows when preemptible)
+
+        Raises:
+            AdmissionError: If the job is rejected
+            TranscriptionCancelled: If the job is cancelled before it gets a slot
+        """
+        job = self.submit(user, cost, cancel)
+        kind = "long" if job.preemptible else "short"
+        try:
+            self._acquire(job)
+        except BaseException:
+            with self._cond:
+                if job in self._waiting:
+                    self._waiting.remove(job)
+                self._counters["cancelled" if job.cancel is not None and job.cancel.cancelled else "failed"] += 1
+                self._cond.notify_all()
+            raise
+        self._waits[kind].append(time.monotonic() - job.enqueued)
+
+        ok = False
+        try:
+            yield job
+            ok = True
+        finally:
+            self._release(job)
+            with self._cond:
+                if job.cancel is not None and job.cancel.reason is not None:
+                    self._counters["cancelled"] += 1
+                else:
+                    self._counters["completed" if ok else "failed"] += 1
+                self._turnarounds[kind].append(time.monotonic() - job.enqueued)
+
+    @staticmethod
+    def _percentiles(values) -> Dict[str, Optional[float]]:
+        ordered = sorted(values)
+        if not ordered:
+            return {"p50": None, "p95": None}
+        return {
+            "p50": round(ordered[len(ordered) // 2], 2),
+            "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2)
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Return queue metrics.
+
+        Returns:
+            dict: Counters, queued and running jobs, backlog seconds, and
+                wait and turnaround percentiles for short and long jobs
+        """
+        with self._cond:
+            return {
+                **self._counters,
+                "queued": len(self._waiting),
+                "running": len(self._running),
+                "backlog_seconds": round(self.backlog(), 1),
+                "wait_seconds": {kind: self._percentiles(values) for kind, values in self._waits.items()},
+                "turnaround_seconds": {kind: self._percentiles(values) for kind, values in self._turnarounds.items()}
+            }
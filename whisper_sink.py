@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Whisper Sharded Output Sink
+Appends transcripts to size-rotated JSONL (or gzip) shards with an offset index for random access.
+"""
+
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Iterator
+
+SHARD_BYTES = int(os.environ.get("WHISPER_SHARD_BYTES", str(256 * 1024 * 1024)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    audio_file TEXT PRIMARY KEY,
+    shard TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    written_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_shard ON records (shard, offset);
+"""
+
+
+class TranscriptSink:
+    def __init__(self, directory: str, compress: bool = False, max_shard_bytes: int = SHARD_BYTES):
+        """
+        Initialize a sink writing many transcripts into a few large files.
+
+        Each result is appended as one record (a JSON line, or a gzip member
+        holding one JSON line) to the current shard, which is rotated once it
+        reaches `max_shard_bytes`. An index (`index.db`) maps each input path
+        to its shard, offset and length, so a record is read back with one
+        seek, and a whole shard is read sequentially with plain `zcat`/`cat`.
+
+        Writing a file again appends a new record and points the index at it.
+        Only one process may write to a directory at a time; any number of
+        processes can read it. Records written after the last indexed one
+        (from a writer killed mid-record) are cut off when writing resumes.
+
+        Args:
+            directory (str): Sink directory (shards and index)
+            compress (bool): Gzip new shards
+            max_shard_bytes (int): Size at which a new shard is started
+        """
+        self.directory = directory
+        self.compress = compress
+        self.max_shard_bytes = max_shard_bytes
+        self.index_path = os.path.join(directory, "index.db")
+        self._lock = threading.Lock()
+        self._shard = None  # name of the shard being appended to
+        self._file = None
+
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.index_path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _key(audio_file: str) -> str:
+        return os.path.abspath(audio_file)
+
+    def shards(self) -> list:
+        """Return the shard file names in write order."""
+        return sorted(name for name in os.listdir(self.directory) if name.startswith("shard-"))
+
+    def _open_shard(self):
+        """Open the last shard for appending, cut back to its last indexed record."""
+        shards = self.shards()
+        if not shards:
+            self._new_shard(0)
+            return
+
+        name = shards[-1]
+        with self._connect() as conn:
+            end = conn.execute(
+                "SELECT COALESCE(MAX(offset + length), 0) FROM records WHERE shard = ?", (name,)
+            ).fetchone()[0]
+        self._file = open(os.path.join(self.directory, name), 'r+b')
+        self._file.truncate(end)
+        self._file.seek(end)
+        self._shard = name
+
+    def _new_shard(self, number: int):
+        if self._file is not None:
+            self._file.close()
+        self._shard = f"shard-{number:05d}.jsonl" + (".gz" if self.compress else "")
+        self._file = open(os.path.join(self.directory, self._shard), 'ab')
+
+    def _encode(self, record: Dict[str, Any]) -> bytes:
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+        return gzip.compress(line, mtime=0) if self._shard.endswith(".gz") else line
+
+    def write(self, audio_file: str, result: Dict[str, Any], **metadata) -> str:
+        """
+        Append a transcription result.
+
+        Args:
+            audio_file (str): Path to the audio file (the lookup key)
+            result (dict): Transcription result (text, segments, language)
+            **metadata: Extra fields stored with the record
+
+        Returns:
+            str: Path of the shard the record was written to
+        """
+        record = {
+            "audio_file": self._key(audio_file),
+            "text": result["text"],
+            "language": result.get("language"),
+            "segments": result.get("segments", []),
+            **metadata
+        }
+        with self._lock:
+            if self._file is None:
+                self._open_shard()
+            data = self._encode(record)
+            if self._file.tell() > 0 and self._file.tell() + len(data) > self.max_shard_bytes:
+                self._new_shard(int(self._shard.split("-")[1].split(".")[0]) + 1)
+                data = self._encode(record)
+
+            # The record is on disk before the index points at it
+            offset = self._file.tell()
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO records (audio_file, shard, offset, length, written_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (record["audio_file"], self._shard, offset, len(data), time.time())
+                )
+            return os.path.join(self.directory, self._shard)
+
+    @staticmethod
+    def _decode(shard: str, data: bytes) -> Dict[str, Any]:
+        if shard.endswith(".gz"):
+            data = gzip.decompress(data)
+        return json.loads(data)
+
+    def get(self, audio_file: str) -> Optional[Dict[str, Any]]:
+        """
+        Read the latest record of an input file.
+
+        Args:
+            audio_file (str): Path to the audio file
+
+        Returns:
+            dict: The record, or None if the file was never written
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT shard, offset, length FROM records WHERE audio_file = ?", (self._key(audio_file),)
+            ).fetchone()
+        if row is None:
+            return None
+        with open(os.path.join(self.directory, row["shard"]), 'rb') as f:
+            f.seek(row["offset"])
+            return self._decode(row["shard"], f.read(row["length"]))
+
+    def __contains__(self, audio_file: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute("SELECT 1 FROM records WHERE audio_file = ?", (self._key(audio_file),)).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """
+        Read the latest record of every input, shard by shard in file order.
+
+        Each shard is opened once and read front to back; records superseded
+        by a later write of the same file are skipped.
+        """
+        for shard in self.shards():
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT offset, length FROM records WHERE shard = ? ORDER BY offset", (shard,)
+                ).fetchall()
+            if not rows:
+                continue
+            with open(os.path.join(self.directory, shard), 'rb') as f:
+                for row in rows:
+                    if f.tell() != row["offset"]:
+                        f.seek(row["offset"])
+                    yield self._decode(shard, f.read(row["length"]))
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of records and shards, and their total size."""
+        shards = self.shards()
+        return {
+            "records": len(self),
+            "shards": len(shards),
+            "size_bytes": sum(os.path.getsize(os.path.join(self.directory, name)) for name in shards)
+        }
+
+    def close(self):
+        """Close the current shard."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def main():
+    """Command-line interface for reading a sink."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Read transcripts from a sharded Whisper output sink")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    get = subparsers.add_parser("get", help="Print the record of one input file")
+    get.add_argument("sink", help="Sink directory")
+    get.add_argument("audio_file", help="Path of the transcribed audio file")
+    get.add_argument("--text", action="store_true", help="Print only the transcript text")
+
+    export = subparsers.add_parser("export", help="Print every record as one JSON line")
+    export.add_argument("sink", help="Sink directory")
+
+    stats = subparsers.add_parser("stats", help="Show record and shard counts")
+    stats.add_argument("sink", help="Sink directory")
+
+    args = parser.parse_args()
+    sink = TranscriptSink(args.sink)
+
+    if args.command == "get":
+        record = sink.get(args.audio_file)
+        if record is None:
+            print(f"❌ Not in sink: {args.audio_file}")
+            raise SystemExit(1)
+        print(record["text"] if args.text else json.dumps(record, indent=2, ensure_ascii=False))
+
+    elif args.command == "export":
+        for record in sink:
+            print(json.dumps(record, ensure_ascii=False))
+
+    elif args.command == "stats":
+        print(json.dumps(sink.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Whisper Streaming Transcription
+Window-by-window transcription with bounded memory for multi-hour recordings.
+"""
+
+import numpy as np
+import whisper
+from typing import Union, Iterable, Iterator, Callable, Optional, Dict, Any, List
+from whisper_audio import SAMPLE_RATE, stream_audio
+from whisper_cancel import CancellationToken, TranscriptionCancelled
+
+N_SAMPLES = whisper.audio.N_SAMPLES
+LOOKAHEAD_SECONDS = 2.0
+PROMPT_CHARS = 200
+MIN_ADVANCE_SECONDS = 5.0
+
+
+def _blocks(audio: Union[str, np.ndarray, Iterable[np.ndarray]]) -> Iterator[np.ndarray]:
+    """Turn a path, a waveform or an iterable of blocks into an iterator of blocks."""
+    if isinstance(audio, str):
+        return stream_audio(audio)
+    if isinstance(audio, np.ndarray):
+        return (audio[i:i + N_SAMPLES] for i in range(0, len(audio), N_SAMPLES))
+    return iter(audio)
+
+
+def _shift(segment: Dict[str, Any], offset: float, segment_id: int) -> Dict[str, Any]:
+    """Move a window-relative segment to the absolute timeline."""
+    segment = dict(segment)
+    segment["id"] = segment_id
+    segment["seek"] = segment["seek"] + int(offset * SAMPLE_RATE / whisper.audio.HOP_LENGTH)
+    segment["start"] = round(segment["start"] + offset, 3)
+    segment["end"] = round(segment["end"] + offset, 3)
+    if "words" in segment:
+        segment["words"] = [
+            {**word, "start": round(word["start"] + offset, 3), "end": round(word["end"] + offset, 3)}
+            for word in segment["words"]
+        ]
+    return segment
+
+
+def iter_transcribe(model, audio: Union[str, np.ndarray, Iterable[np.ndarray]],
+                    lookahead: float = LOOKAHEAD_SECONDS, checkpoint: Optional[Callable[[], None]] = None,
+                    cancel: Optional[CancellationToken] = None, **options) -> Iterator[Dict[str, Any]]:
+    """
+    Transcribe audio one 30-second window at a time, yielding segments as they are decoded.
+    
+    Audio is pulled from a soundfile reader or an ffmpeg pipe block by block and
+    the log-mel spectrogram is computed per window, so at most one window plus
+    the lookahead is held in memory whatever the duration of the recording. A
+    segment running into the end of a window is dropped and decoded again at
+    the start of the next window, so words are never cut at window edges.
+    
+    Args:
+        model: Loaded Whisper model
+        audio: Path to audio file, waveform, or iterable of 16 kHz mono float32 blocks
+        lookahead (float): Seconds read past the window to detect the final window
+        checkpoint (callable): Called between windows, while the model is idle
+            (a scheduler can hand the model to another request there)
+        cancel (CancellationToken): Checked before each window; once it fires,
+            iteration stops after the segments already yielded
+        **options: Options passed to model.transcribe for each window
+    
+    Yields:
+        dict: Segment with absolute timestamps (language in the "language" key)
+    """
+    options = dict(options)
+    verbose = options.pop("verbose", None)
+    initial_prompt = options.pop("initial_prompt", None)
+    condition_on_previous_text = options.get("condition_on_previous_text", True)
+    language = options.pop("language", None)
+    
+    blocks = _blocks(audio)
+    lookahead_samples = int(lookahead * SAMPLE_RATE)
+    buffer = np.zeros(0, dtype=np.float32)
+    offset = 0  # samples consumed before buffer[0]
+    exhausted = False
+    prompt = initial_prompt
+    segment_id = 0
+    
+    while cancel is None or not cancel.cancelled:
+        while not exhausted and len(buffer) < N_SAMPLES + lookahead_samples:
+            try:
+                buffer = np.concatenate([buffer, np.asarray(next(blocks), dtype=np.float32)])
+            except StopIteration:
+                exhausted = True
+        if len(buffer) == 0:
+            break
+        
+        window = buffer[:N_SAMPLES]
+        final = exhausted and len(buffer) <= N_SAMPLES
+        result = model.transcribe(window, language=language, initial_prompt=prompt, verbose=None, **options)
+        language = language or result["language"]
+        
+        # Whisper may keep seeking into the zero padding past the window: ignore that part
+        duration = len(window) / SAMPLE_RATE
+        segments = [
+            {**segment, "end": min(segment["end"], duration)}
+            for segment in result["segments"] if segment["start"] < duration
+        ]
+        advance = len(window)
+        if not final and len(segments) > 1 and segments[-2]["end"] >= MIN_ADVANCE_SECONDS:
+            # The last segment may be cut by the window edge: decode it again next time
+            # (unless that would move the window by only a few seconds, or not at all)
+            segments = segments[:-1]
+            advance = min(len(window), int(segments[-1]["end"] * SAMPLE_RATE))
+        
+        for segment in segments:
+            segment = _shift(segment, offset / SAMPLE_RATE, segment_id)
+            segment["language"] = language
+            segment_id += 1
+            if verbose:
+                start = whisper.utils.format_timestamp(segment["start"])
+                end = whisper.utils.format_timestamp(segment["end"])
+                print(f"[{start} --> {end}] {segment['text'].strip()}")
+            yield segment
+        
+        text = "".join(segment["text"] for segment in segments).strip()
+        if text:
+            prompt = text[-PROMPT_CHARS:] if condition_on_previous_text else initial_prompt
+        
+        buffer = buffer[advance:]
+        offset += advance
+        if final and len(buffer) == 0:
+            break
+        if checkpoint is not None:
+            try:
+                checkpoint()
+            except TranscriptionCancelled:
+                break
+
+
+def transcribe_windowed(model, audio: Union[str, np.ndarray, Iterable[np.ndarray]],
+                        **options) -> Dict[str, Any]:
+    """
+    Transcribe audio window by window and collect the result like model.transcribe.
+    
+    When the `cancel` token fires, the segments decoded so far are returned
+    with "cancelled" set to the token's reason.
+    
+    Args:
+        model: Loaded Whisper model
+        audio: Path to audio file, waveform, or iterable of 16 kHz mono float32 blocks
+        **options: Options passed to iter_transcribe
+    
+    Returns:
+        dict: Transcription result with text, segments, language and cancelled
+    """
+    cancel = options.get("cancel")
+    segments: List[Dict[str, Any]] = []
+    language = options.get("language")
+    for segment in iter_transcribe(model, audio, **options):
+        language = segment.pop("language")
+        segments.append(segment)
+    
+    return build_result(segments, language, cancel)
+
+
+def build_result(segments: List[Dict[str, Any]], language: Optional[str],
+                 cancel: Optional[CancellationToken] = None) -> Dict[str, Any]:
+    """
+    Assemble segments collected from iter_transcribe into a model.transcribe-like result.
+    
+    Args:
+        segments (list): Segments, without their "language" key
+        language (str): Language of the recording
+        cancel (CancellationToken): Token the segments were transcribed with
+    
+    Returns:
+        dict: Transcription result with text, segments, language and cancelled
+    """
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": language,
+        "cancelled": cancel.reason if cancel is not None else None
+    }
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Whisper Warm-up
+Background model preloading, warm-up passes and persistent example outputs for the web apps.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Callable, Dict, Any, Iterable
+import numpy as np
+import whisper
+from whisper_audio import load_audio
+from whisper_batch import atomic_write, options_hash
+from whisper_cache import DEFAULT_CACHE_DIR, file_digest
+
+WARMUP_MODELS = [name for name in os.environ.get("WHISPER_WARMUP_MODELS", "base").split(",") if name]
+READY_PORT = int(os.environ.get("WHISPER_READY_PORT", "8502"))
+
+
+def warm_up_model(model):
+    """
+    Run one encoder pass and a few decoder steps of a model on silence.
+
+    The first pass of a model allocates its buffers (CUDA caching allocator,
+    key/value cache) and selects its kernels; doing it here keeps that cost
+    out of the first real request.
+
+    Args:
+        model: Loaded Whisper model
+    """
+    silence = np.zeros(whisper.audio.N_SAMPLES, dtype=np.float32)
+    mel = whisper.log_mel_spectrogram(silence, model.dims.n_mels).to(model.device)
+    options = whisper.DecodingOptions(
+        language="en", sample_len=8, without_timestamps=True, fp16=model.device.type == "cuda"
+    )
+    whisper.decode(model, mel, options)
+
+
+class ExampleCache:
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize a persistent store of example outputs.
+
+        Results are keyed by the content hash of the example file, the model
+        and the transcription options, so they survive restarts and are
+        recomputed only when one of them changes. A lookup hashes the file
+        only when its size matches a stored example.
+
+        Args:
+            path (str): JSON file (default: $WHISPER_CACHE_DIR/examples.json)
+        """
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "examples.json")
+        self._lock = threading.Lock()
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.results = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self.results = {}
+        self.sizes = {entry["size"] for entry in self.results.values()}
+
+    @staticmethod
+    def key(audio_path: str, model_name: str, options: Dict[str, Any]) -> str:
+        return f"{file_digest(audio_path)}:{options_hash(model_name, options)}"
+
+    def get(self, audio_path: str, model_name: str, options: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Return the stored output of an example, if this file was one.
+
+        Args:
+            audio_path (str): Path to the audio file (any copy of the example)
+            model_name (str): Whisper model name
+            options (dict): Transcription options
+
+        Returns:
+            dict: Transcription result, or None
+        """
+        if not os.path.exists(audio_path) or os.path.getsize(audio_path) not in self.sizes:
+            return None
+        entry = self.results.get(self.key(audio_path, model_name, options))
+        return entry["result"] if entry is not None else None
+
+    def put(self, audio_path: str, model_name: str, options: Dict[str, Any], result: Dict[str, Any]):
+        """Store the output of an example and save the cache."""
+        with self._lock:
+            self.results[self.key(audio_path, model_name, options)] = {
+                "size": os.path.getsize(audio_path),
+                "result": result
+            }
+            self.sizes.add(os.path.getsize(audio_path))
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            atomic_write(self.path, json.dumps(self.results, ensure_ascii=False))
+
+
+class Warmup:
+    def __init__(self, load_model: Callable[[str], Any], models: Iterable[str] = WARMUP_MODELS,
+                 scheduler=None, examples: Iterable = (), example_cache: Optional[ExampleCache] = None):
+        """
+        Initialize the warm-up stage of a web app.
+
+        Once started (after the server is listening), a background thread
+        loads each model of `models` with the app's own loader, so it lands in
+        the app's model cache, and runs it once on silence. It then computes
+        the outputs of the examples that are not in the example cache yet.
+        With a scheduler, each step runs as a scheduler job, so it never uses
+        a model at the same time as a request, and requests arriving meanwhile
+        go between two steps.
+
+        Args:
+            load_model (callable): Function returning the loaded model for a model name
+            models (iterable): Models to preload
+            scheduler (Scheduler): Request scheduler of the app
+            examples (iterable): (audio_path, model_name, options) tuples; missing files are ignored
+            example_cache (ExampleCache): Store of example outputs
+        """
+        self.load_model = load_model
+        self.models = list(models)
+        self.scheduler = scheduler
+        self.examples = [example for example in examples if os.path.exists(example[0])]
+        self.example_cache = example_cache or ExampleCache()
+        self.state = {model_name: "pending" for model_name in self.models}
+        self.started_at = None
+        self.ready_after = None
+        self.done = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        """True once every model is loaded and warmed up."""
+        return self.done.is_set() and all(state == "ready" for state in self.state.values())
+
+    def start(self) -> "Warmup":
+        """Start warming up in the background (only the first call does)."""
+        if self._thread is None:
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name="whisper-warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the warm-up to finish; return readiness."""
+        self.done.wait(timeout)
+        return self.ready
+
+    def _slot(self):
+        return self.scheduler.job("warmup", 0.0) if self.scheduler is not None else nullcontext()
+
+    def _run(self):
+        for model_name in self.models:
+            self.state[model_name] = "loading"
+            try:
+                start = time.perf_counter()
+                with self._slot():
+                    warm_up_model(self.load_model(model_name))
+                self.state[model_name] = "ready"
+                print(f"✅ {model_name} model warmed up in {time.perf_counter() - start:.1f}s")
+            except Exception as e:
+                self.state[model_name] = f"error: {e}"
+                print(f"❌ Warm-up of {model_name} failed: {e}")
+
+        for audio_path, model_name, options in self.examples:
+            if self.example_cache.get(audio_path, model_name, options) is not None:
+                continue
+            try:
+                with self._slot():
+                    model = self.load_model(model_name)
+                    result = model.transcribe(load_audio(audio_path), verbose=None, **options)
+                self.example_cache.put(audio_path, model_name, options, result)
+                print(f"✅ Example output cached: {audio_path} ({model_name})")
+            except Exception as e:
+                print(f"❌ Example {audio_path} failed: {e}")
+
+        self.ready_after = time.time() - self.started_at
+        self.done.set()
+
+    def status(self) -> Dict[str, Any]:
+        """Return readiness, the state of each model and the number of cached examples."""
+        return {
+            "ready": self.ready,
+            "models": dict(self.state),
+            "examples": sum(
+                self.example_cache.get(audio_path, model_name, options) is not None
+                for audio_path, model_name, options in self.examples
+            ),
+            "ready_after": round(self.ready_after, 2) if self.ready_after is not None else None
+        }
+
+    def _response(self):
+        return self.status(), 200 if self.ready else 503
+
+    def add_route(self, app, path: str = "/ready"):
+        """
+        Add a readiness route to a FastAPI app (such as the one Gradio serves).
+
+        The route answers 200 once ready and 503 before, with the status as JSON.
+
+        Args:
+            app: FastAPI application
+            path (str): Route path
+        """
+        from fastapi.responses import JSONResponse
+
+        def ready():
+            status, code = self._response()
+            return JSONResponse(status, status_code=code)
+
+        app.add_api_route(path, ready, methods=["GET"])
+
+    def serve(self, port: int = READY_PORT, host: str = "0.0.0.0") -> Optional[ThreadingHTTPServer]:
+        """
+        Serve GET /ready on a separate port, for servers without custom routes (Streamlit).
+
+        Args:
+            port (int): Port of the readiness server
+            host (str): Interface to bind
+
+        Returns:
+            ThreadingHTTPServer: The server, or None if the port is unavailable
+        """
+        warmup = self
+
+        class ReadyHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0].rstrip("/") != "/ready":
+                    self.send_error(404)
+                    return
+                status, code = warmup._response()
+                body = json.dumps(status).encode('utf-8')
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            server = ThreadingHTTPServer((host, port), ReadyHandler)
+        except OSError as e:
+            print(f"❌ Readiness endpoint unavailable on port {port}: {e}")
+            return None
+        threading.Thread(target=server.serve_forever, name="whisper-ready", daemon=True).start()
+        print(f"✅ Readiness endpoint: http://{host}:{port}/ready")
+        return server
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Whisper Watch Folder
+Long-running ingestion of new recordings dropped into a directory.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, Any
+from whisper_audio import is_native
+from whisper_batch import BatchManifest, atomic_write, options_hash, transcript_path
+
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".m4a", ".flac", ".ogg", ".opus", ".aac", ".wma", ".webm", ".mp4"}
+MAX_ATTEMPTS = 4
+RETRY_SECONDS = 30.0
+
+
+class FolderWatcher:
+    def __init__(self, transcriber, watch_dir: str, output_dir: str = "transcriptions",
+                 poll_interval: float = 1.0, stable_seconds: float = 2.0, num_workers: int = 2,
+                 state_dir: Optional[str] = None, sink=None, **options):
+        """
+        Initialize the watch-folder ingestion daemon.
+
+        Directories are polled by mtime: only a directory whose mtime changed
+        is listed again, so an idle tree costs one stat per directory per poll.
+        New files are tracked until their size and mtime stop changing for
+        `stable_seconds`, then decoded by a pool of workers and transcribed one
+        at a time by the transcriber's single warm model.
+
+        Processed files are recorded in a manifest, and directory mtimes and
+        not-yet-stable files are persisted, so a restart neither rescans the
+        whole tree nor loses files that arrived while it was down.
+
+        A file whose transcription fails is retried after RETRY_SECONDS,
+        doubling the delay each time. After MAX_ATTEMPTS it is set aside in
+        the state file and retried when the watcher restarts.
+
+        Args:
+            transcriber (AdvancedWhisperTranscriber): Transcriber with the loaded model
+            watch_dir (str): Drop directory to watch (recursively)
+            output_dir (str): Output directory for transcriptions
+            poll_interval (float): Seconds between polls
+            stable_seconds (float): Seconds a file must stop growing before it is processed
+            num_workers (int): Decoding workers feeding the model
+            state_dir (str): Directory of the manifest and watch state (default: output_dir)
+            sink (TranscriptSink): Sharded output sink (default: one text file per input)
+            **options: Transcription options
+        """
+        self.transcriber = transcriber
+        self.watch_dir = os.path.abspath(watch_dir)
+        self.output_dir = output_dir
+        self.poll_interval = poll_interval
+        self.stable_seconds = stable_seconds
+        self.sink = sink
+        self.options = options
+
+        state_dir = state_dir or output_dir
+        os.makedirs(state_dir, exist_ok=True)
+        self.state_path = os.path.join(state_dir, "watch_state.json")
+        self.manifest = BatchManifest(os.path.join(state_dir, "watch_manifest.jsonl"))
+        self.opts_hash = options_hash(transcriber.model_name, transcriber._default_options(**options))
+
+        self.dir_mtimes: Dict[str, int] = {}
+        self.children: Dict[str, set] = {}  # directory -> subdirectories found by its last listing
+        self.candidates: Dict[str, Dict[str, Any]] = {}  # path -> size, mtime, since (, attempts, retry_at)
+        self.in_flight = set()
+        self.in_flight_attempts: Dict[str, int] = {}  # path -> failed attempts so far
+        self.failed: Dict[str, str] = {}  # path -> last error, after MAX_ATTEMPTS
+        self.failures: queue.Queue = queue.Queue()  # (path, error) from the inference thread
+        self._load_state()
+
+        self.decoders = ThreadPoolExecutor(max_workers=num_workers)
+        self.ready: queue.Queue = queue.Queue()  # (path, arrival time)
+        self.stop_event = threading.Event()
+        self.stats = {"processed": 0, "failed": 0, "retried": 0, "latency_total": 0.0}
+
+    def _load_state(self):
+        """Restore directory mtimes and pending files (failed ones included) from the previous run."""
+        if not os.path.exists(self.state_path):
+            return
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        self.dir_mtimes = state.get("dirs", {})
+        for directory in self.dir_mtimes:
+            if directory != self.watch_dir:
+                self.children.setdefault(os.path.dirname(directory), set()).add(directory)
+        for path in state.get("pending", []) + list(state.get("failed", {})):
+            if self.manifest.get(path, self.opts_hash) is not None:
+                continue
+            self.candidates[path] = {"size": -1, "mtime": -1, "since": time.time()}
+
+    def _save_state(self):
+        """Persist directory mtimes and files not yet transcribed."""
+        pending = sorted(set(self.candidates) | self.in_flight)
+        atomic_write(self.state_path, json.dumps({"dirs": self.dir_mtimes, "pending": pending, "failed": self.failed}))
+
+    def _requeue_failed(self) -> bool:
+        """Schedule a retry of the files whose transcription failed, with exponential backoff."""
+        changed = False
+        while True:
+            try:
+                path, error = self.failures.get_nowait()
+            except queue.Empty:
+                return changed
+            changed = True
+            attempts = self.in_flight_attempts.pop(path, 0) + 1
+            self.in_flight.discard(path)
+            if attempts >= MAX_ATTEMPTS:
+                self.failed[path] = error
+                print(f"❌ Giving up on {path} after {attempts} attempts (retried on restart)")
+                continue
+            delay = RETRY_SECONDS * 2 ** (attempts - 1)
+            self.candidates[path] = {
+                "size": -1, "mtime": -1, "since": time.time(),
+                "attempts": attempts, "retry_at": time.time() + delay
+            }
+            self.stats["retried"] += 1
+            print(f"🔁 Retrying {path} in {delay:.0f}s (attempt {attempts + 1}/{MAX_ATTEMPTS})")
+
+    def _forget(self, directory: str):
+        """Drop a directory that disappeared, and everything known below it."""
+        self.children.get(os.path.dirname(directory), set()).discard(directory)
+        stack = [directory]
+        while stack:
+            directory = stack.pop()
+            self.dir_mtimes.pop(directory, None)
+            stack.extend(self.children.pop(directory, ()))
+
+    def _scan(self) -> bool:
+        """List the directories whose mtime changed and collect new audio files."""
+        changed = False
+        stack = [self.watch_dir]
+        while stack:
+            directory = stack.pop()
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except FileNotFoundError:
+                self._forget(directory)
+                changed = True
+                continue
+
+            if self.dir_mtimes.get(directory) == mtime:
+                stack.extend(self.children.get(directory, ()))
+                continue
+
+            self.dir_mtimes[directory] = mtime
+            changed = True
+            subdirs = set()
+            for entry in os.scandir(directory):
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.add(entry.path)
+                elif (entry.is_file() and Path(entry.name).suffix.lower() in AUDIO_EXTENSIONS
+                      and not entry.name.startswith(".")
+                      and entry.path not in self.candidates and entry.path not in self.in_flight
+                      and entry.path not in self.failed
+                      and self.manifest.get(entry.path, self.opts_hash) is None):
+                    self.candidates[entry.path] = {"size": -1, "mtime": -1, "since": time.time()}
+            for lost in self.children.get(directory, set()) - subdirs:
+                self._forget(lost)
+            self.children[directory] = subdirs
+            stack.extend(subdirs)
+        return changed
+
+    def _check_stable(self) -> bool:
+        """Hand over candidates that stopped growing to the decoding workers."""
+        changed = False
+        now = time.time()
+        for path, seen in list(self.candidates.items()):
+            if seen.get("retry_at", 0) > now:
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                del self.candidates[path]
+                changed = True
+                continue
+
+            if (stat.st_size, stat.st_mtime_ns) != (seen["size"], seen["mtime"]):
+                self.candidates[path] = {**seen, "size": stat.st_size, "mtime": stat.st_mtime_ns, "since": now}
+            elif now - seen["since"] >= self.stable_seconds:
+                del self.candidates[path]
+                self.in_flight.add(path)
+                self.in_flight_attempts[path] = seen.get("attempts", 0)
+                self.decoders.submit(self._decode, path, seen["since"])
+                changed = True
+        return changed
+
+    def _decode(self, path: str, arrived: float):
+        """Decode a file into the audio cache, off the inference thread."""
+        try:
+            # Without a cache to fill (cache disabled, or a 16 kHz mono file read
+            # as is), decoding here would only be repeated by the inference thread
+            if self.transcriber.audio_cache.enabled and not is_native(path):
+                self.transcriber.load_audio(path)
+        except Exception as e:
+            print(f"❌ Error decoding {path}: {e}")
+        self.ready.put((path, arrived))
+
+    def _output_path(self, path: str) -> str:
+        return transcript_path(self.output_dir, path, root=self.watch_dir)
+
+    def _inference_loop(self):
+        """Transcribe decoded files one at a time with the warm model."""
+        while not self.stop_event.is_set():
+            try:
+                path, arrived = self.ready.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            failed = False
+            try:
+                result = self.transcriber.transcribe_with_options(path, **self.options)
+                if self.sink is not None:
+                    output_path = self.sink.write(path, result, options_hash=self.opts_hash)
+                else:
+                    output_path = self._output_path(path)
+                    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                    atomic_write(output_path, result["text"])
+                self.manifest.record(
+                    path, self.opts_hash, output_path, output="sink" if self.sink is not None else "file",
+                    language=result["language"]
+                )
+
+                latency = time.time() - arrived
+                self.stats["processed"] += 1
+                self.stats["latency_total"] += latency
+                print(f"✅ {path} -> {output_path} ({latency:.1f}s after arrival)")
+            except Exception as e:
+                failed = True
+                self.stats["failed"] += 1
+                print(f"❌ Error processing {path}: {e}")
+                # The polling thread schedules the retry; the file stays in flight until then
+                self.failures.put((path, str(e)))
+            finally:
+                if not failed:
+                    self.in_flight_attempts.pop(path, None)
+                    self.in_flight.discard(path)
+
+    def run(self):
+        """Watch the directory until interrupted."""
+        print(f"👀 Watching {self.watch_dir} (poll every {self.poll_interval}s)...")
+        inference = threading.Thread(target=self._inference_loop, daemon=True)
+        inference.start()
+
+        try:
+            while not self.stop_event.is_set():
+                scanned = self._scan()
+                requeued = self._requeue_failed()
+                handed_over = self._check_stable()
+                if scanned or requeued or handed_over:
+                    self._save_state()
+                self.stop_event.wait(self.poll_interval)
+        except KeyboardInterrupt:
+            print("🛑 Stopping watcher...")
+        finally:
+            self.stop()
+            inference.join()
+            self._save_state()
+
+    def stop(self):
+        """Stop polling; the file being transcribed is finished first."""
+        self.stop_event.set()
+        self.decoders.shutdown(wait=False, cancel_futures=True)
@@ -9,10 +9,19 @@ import whisper
 import tempfile
 import os
 import time
+import uuid
 from pathlib import Path
 import io
 import base64
 from typing import Dict, Any
+from whisper_cancel import CancellationToken, TranscriptionCancelled
+from whisper_cache import file_digest, get_audio_cache, get_encoder_cache
+from whisper_decoding import BEST_OF, batched_fallback, fallback_temperatures
+from whisper_jobs import EXPORT_FORMATS, JobManager, JobStore
+from whisper_router import ModelRouter
+from whisper_scheduler import AdmissionError, Scheduler
+from whisper_stream import build_result, iter_transcribe
+from whisper_warmup import READY_PORT, WARMUP_MODELS, Warmup
 
 # Configuration de la page
 st.set_page_config(
@@ -121,34 +130,150 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 @st.cache_resource
+def get_router() -> ModelRouter:
+    """Routeur de modèles partagé par toutes les sessions (file d'attente et calibration communes)."""
+    return ModelRouter(scheduler=get_scheduler())
+
+@st.cache_resource
+def get_scheduler() -> Scheduler:
+    """Ordonnanceur partagé : les sessions se partagent les mêmes modèles en cache."""
+    return Scheduler()
+
+def current_session_id() -> str:
+    """Identifiant de la session Streamlit courante (limites par utilisateur)."""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "anonyme"
+
+def session_token(session_id: str) -> CancellationToken:
+    """Jeton annulé dès que la session se ferme (onglet fermé ou navigateur déconnecté)."""
+    from streamlit import runtime
+    if not runtime.exists():
+        return CancellationToken()
+    instance = runtime.get_instance()
+    return CancellationToken(predicate=lambda: not instance.is_active_session(session_id))
+
+@st.cache_resource(show_spinner=False)
+def get_whisper_model(model_name: str):
+    """Modèle Whisper partagé par les sessions et les tâches en arrière-plan."""
+    start = time.perf_counter()
+    model = whisper.load_model(model_name)
+    get_router().record_load(model_name, time.perf_counter() - start)
+    return model
+
 def load_whisper_model(model_name: str = "base"):
     """Charger le modèle Whisper avec mise en cache."""
     with st.spinner(f"Chargement du modèle {model_name}..."):
-        model = whisper.load_model(model_name)
-    return model
+        return get_whisper_model(model_name)
+
+@st.cache_resource
+def get_warmup() -> Warmup:
+    """Préchauffage des modèles en arrière-plan, lancé une seule fois par serveur (prêt sur /ready)."""
+    warmup = Warmup(get_whisper_model, WARMUP_MODELS, scheduler=get_scheduler()).start()
+    warmup.serve(READY_PORT)
+    return warmup
 
-def transcribe_audio(model, audio_file, options: Dict[str, Any]) -> Dict[str, Any]:
-    """Transcrire un fichier audio avec les options données."""
+@st.cache_resource
+def get_job_manager() -> JobManager:
+    """Workers en arrière-plan partagés par toutes les sessions, indépendants des relances du script."""
+    manager = JobManager(JobStore(), get_whisper_model, get_scheduler(), get_router())
+    manager.start()
+    return manager
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def job_archive(job_ids: tuple, formats: tuple) -> bytes:
+    """Archive ZIP des transcriptions (mise en cache : les résultats terminés ne changent plus)."""
+    return get_job_manager().store.archive(list(job_ids), list(formats))
+
+def current_workspace() -> str:
+    """Espace de travail des tâches, conservé dans l'URL (rechargement de la page, favoris, partage)."""
+    if "espace" not in st.query_params:
+        st.query_params["espace"] = uuid.uuid4().hex[:12]
+    return st.query_params["espace"]
+
+def transcribe_audio(model, audio_file, options: Dict[str, Any], model_name: str = "base",
+                     batch_fallback: bool = False) -> Dict[str, Any]:
+    """
+    Transcrire un fichier audio avec les options données.
+    
+    Les segments s'affichent au fur et à mesure que chaque fenêtre de 30 secondes
+    est décodée, avec une barre de progression sur la durée du fichier.
+    """
+    tmp_path = None
     try:
         # Sauvegarder le fichier uploadé temporairement
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
-            tmp_file.write(audio_file.read())
+        # (avec son extension d'origine pour choisir le bon décodeur)
+        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(audio_file.name).suffix) as tmp_file:
+            tmp_file.write(audio_file.getvalue())
             tmp_path = tmp_file.name
         
-        # Transcrire
-        result = model.transcribe(tmp_path, **options)
+        # Mode automatique : le plus grand modèle qui respecte le délai cible,
+        # compte tenu de la durée du fichier et de la charge actuelle
+        router = get_router()
+        routing = router.choose(tmp_path)
+        if model_name == "auto":
+            model_name = routing["model"]
+            model = load_whisper_model(model_name)
+            st.info(f"🤖 Modèle choisi automatiquement : {model_name} (estimation : {routing['estimate']:.0f} s)")
         
-        # Nettoyer
-        os.unlink(tmp_path)
+        # Ordonnancement : les requêtes courtes passent avant les longues, qui
+        # cèdent le modèle entre deux fenêtres de 30 secondes
+        cost = router.rtf(model_name) * routing["duration"]
+        session_id = current_session_id()
+        token = session_token(session_id)
+        progress_bar = st.progress(0.0, text="⏳ En attente du modèle...")
+        live_text = st.empty()
+        with get_scheduler().job(session_id, cost, cancel=token) as job:
+            # Repli par lots : toutes les températures de repli d'un segment difficile
+            # sont échantillonnées en une seule passe du décodeur
+            if batch_fallback:
+                options = {**options, "temperature": fallback_temperatures(options["temperature"]), "best_of": BEST_OF}
+            
+            # Transcrire fenêtre par fenêtre en affichant les segments au fil de l'eau
+            # (l'audio décodé et les sorties de l'encodeur sont mis en cache entre les relances)
+            audio = get_audio_cache().load(tmp_path)
+            segments, language = [], options.get("language")
+            with router.track(model_name, routing["duration"], cancel=token, job=job), \
+                    get_encoder_cache().attach(model, model_name, file_digest(tmp_path)) as model:
+                if batch_fallback:
+                    model = batched_fallback(model, options["temperature"], BEST_OF)
+                for segment in iter_transcribe(
+                    model, audio, cancel=token,
+                    checkpoint=job.checkpoint if job.preemptible else None, **options
+                ):
+                    language = segment.pop("language")
+                    segments.append(segment)
+                    progress = min(1.0, segment["end"] / routing["duration"]) if routing["duration"] else 1.0
+                    progress_bar.progress(
+                        progress,
+                        text=f"Transcription : {progress:.0%} ({segment['end']:.0f} / {routing['duration']:.0f} s)"
+                    )
+                    live_text.markdown("".join(s["text"] for s in segments).strip())
+            result = build_result(segments, language, token)
+        
+        progress_bar.empty()
+        live_text.empty()
         
         return result
+    except AdmissionError as e:
+        st.warning(f"⏳ Requête refusée, réessayez plus tard : {e}")
+        return None
+    except TranscriptionCancelled:
+        return None
     except Exception as e:
         st.error(f"Erreur lors de la transcription : {e}")
         return None
+    finally:
+        # Nettoyer, y compris après une erreur, un refus ou une annulation
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
 
 def main():
     """Fonction principale de l'application."""
     
+    # Précharger les modèles sans bloquer l'affichage de la page
+    warmup = get_warmup()
+    
     # En-tête
     st.markdown('<h1 class="main-header">🎤 Application de Transcription Whisper</h1>', unsafe_allow_html=True)
     st.markdown('<p class="sub-header">Déposez vos fichiers audio et obtenez des transcriptions précises avec OpenAI Whisper</p>', unsafe_allow_html=True)
@@ -163,7 +288,8 @@ def main():
         "base": "Base (74 MB) - Équilibré", 
         "small": "Small (244 MB) - Meilleur",
         "medium": "Medium (769 MB) - Élevé",
-        "large": "Large (1550 MB) - Maximum"
+        "large": "Large (1550 MB) - Maximum",
+        "auto": "Auto - Selon la durée et la charge"
     }
     
     selected_model = st.sidebar.selectbox(
@@ -216,11 +342,25 @@ def main():
         word_timestamps = st.checkbox("Horodatage au niveau des mots", False,
                                     help="Inclure les horodatages pour chaque mot")
         
+        batch_fallback = st.checkbox("Repli par lots", False,
+                                   help="Essayer toutes les températures de repli d'un segment difficile en une seule passe (GPU)")
+        
         initial_prompt = st.text_area("Invite initiale", "",
                                      help="Fournir du contexte pour améliorer la transcription")
     
-    # Charger le modèle
-    model = load_whisper_model(selected_model)
+    with st.sidebar.expander("📈 File d'attente"):
+        st.json({**get_scheduler().metrics(), "warmup": warmup.status()})
+    
+    # Options de transcription
+    options = {
+        "task": task,
+        "temperature": temperature,
+        "word_timestamps": word_timestamps,
+        "initial_prompt": initial_prompt if initial_prompt else None
+    }
+    
+    if selected_language != "Auto-detect":
+        options["language"] = selected_language
     
     # Zone principale de contenu
     col1, col2 = st.columns([2, 1])
@@ -257,21 +397,12 @@ def main():
             for key, value in file_details.items():
                 st.write(f"**{key}:** {value}")
             
-            # Options de transcription
-            options = {
-                "task": task,
-                "temperature": temperature,
-                "word_timestamps": word_timestamps,
-                "initial_prompt": initial_prompt if initial_prompt else None
-            }
-            
-            if selected_language != "Auto-detect":
-                options["language"] = selected_language
-            
             # Bouton de transcription
             if st.button("🎯 Commencer la Transcription", type="primary"):
-                with st.spinner("Transcription en cours..."):
-                    result = transcribe_audio(model, uploaded_file, options)
+                # Charger le modèle (préchargé le plus souvent ; en mode automatique,
+                # il est choisi à chaque transcription)
+                model = load_whisper_model(selected_model) if selected_model != "auto" else None
+                result = transcribe_audio(model, uploaded_file, options, selected_model, batch_fallback)
                 
                 if result:
                     st.success("✅ Transcription terminée !")
@@ -370,8 +501,90 @@ def main():
         
         # Statut du modèle
         st.info("📊 Statut")
-        st.write(f"✅ Modèle {selected_model} chargé")
+        if selected_model == "auto":
+            st.write("🤖 Modèle choisi à chaque transcription")
+        elif selected_model in get_router().loaded:
+            st.write(f"✅ Modèle {selected_model} chargé")
+        elif selected_model in warmup.state:
+            st.write(f"⏳ Modèle {selected_model} en préchauffage")
+        else:
+            st.write(f"⏳ Modèle {selected_model} chargé à la première transcription")
         st.write("🟢 Prêt pour la transcription")
+    
+    show_job_queue(options, selected_model, batch_fallback)
+
+def show_job_queue(options: Dict[str, Any], model_name: str, batch_fallback: bool):
+    """Dépôt de plusieurs fichiers, transcrits en arrière-plan avec les options courantes."""
+    st.header("📚 File de Traitement")
+    st.write("Déposez plusieurs fichiers : ils sont transcrits en arrière-plan, même si la page est "
+             "rechargée ou fermée. Gardez l'adresse de la page pour retrouver vos tâches.")
+    
+    manager = get_job_manager()
+    workspace = current_workspace()
+    
+    # La clé change après chaque ajout pour vider le sélecteur de fichiers
+    upload_round = st.session_state.setdefault("job_upload_round", 0)
+    uploaded_files = st.file_uploader(
+        "Choisir des fichiers audio",
+        type=['wav', 'mp3', 'm4a', 'flac', 'ogg'],
+        accept_multiple_files=True,
+        key=f"job_uploads_{upload_round}"
+    )
+    
+    if uploaded_files and st.button(f"📥 Ajouter {len(uploaded_files)} fichier(s) à la file", type="primary"):
+        for uploaded_file in uploaded_files:
+            manager.submit(workspace, uploaded_file.name, uploaded_file.getvalue(), model_name,
+                           batch_fallback=batch_fallback, **options)
+        st.session_state["job_upload_round"] = upload_round + 1
+        st.rerun()
+    
+    show_jobs(workspace)
+
+@st.fragment(run_every=2)
+def show_jobs(workspace: str):
+    """État des tâches de l'espace de travail, actualisé toutes les 2 secondes sans relancer la page."""
+    manager = get_job_manager()
+    jobs = manager.store.jobs(workspace)
+    if not jobs:
+        st.caption("Aucune tâche pour le moment.")
+        return
+    
+    for job in jobs:
+        col_name, col_status, col_action = st.columns([3, 3, 1])
+        col_name.write(f"**{job['name']}** ({job['model_name']})")
+        if job["status"] == "pending":
+            col_status.progress(0.0, text="🕒 En attente")
+        elif job["status"] == "running":
+            col_status.progress(job["progress"], text=f"⏳ Transcription : {job['progress']:.0%}")
+        elif job["status"] == "done":
+            col_status.progress(1.0, text="✅ Terminée")
+        elif job["status"] == "cancelled":
+            partial = " (résultat partiel)" if job["result_path"] else ""
+            col_status.progress(job["progress"], text=f"⏹️ Annulée{partial}")
+        else:
+            col_status.error(f"❌ {job['error']}")
+        
+        if job["status"] in ("pending", "running"):
+            col_action.button("⏹️", key=f"cancel_job_{job['id']}", help="Annuler",
+                              on_click=manager.cancel, args=([job["id"]],))
+    
+    # Téléchargement groupé des transcriptions disponibles
+    finished = [job["id"] for job in jobs if job["status"] not in ("pending", "running")]
+    with_result = tuple(job["id"] for job in jobs if job["result_path"])
+    formats = st.multiselect("Formats", EXPORT_FORMATS, default=["txt", "srt"], key="job_formats")
+    
+    col_zip, col_clear = st.columns(2)
+    with col_zip:
+        st.download_button(
+            label=f"📦 Télécharger {len(with_result)} transcription(s) (ZIP)",
+            data=job_archive(with_result, tuple(formats)) if with_result and formats else b"",
+            file_name="transcriptions.zip",
+            mime="application/zip",
+            disabled=not with_result or not formats
+        )
+    with col_clear:
+        st.button("🗑️ Effacer les tâches terminées", disabled=not finished,
+                  on_click=manager.store.remove, args=(finished,))
 
 def format_time(seconds):
     """Formater les secondes en timestamp SRT."""